@@ -0,0 +1,273 @@
+import argparse         # pour analyser les arguments de la ligne de commande
+import contextlib       # pour faire taire les print des etapes mesurees
+import datetime         # pour dater les resultats
+import io
+import json             # pour des resultats lisibles par une machine
+import os               # pour la manipulation des fichiers et des repertoires
+import platform
+import random           # pour generer des inventaires realistes
+import subprocess       # pour mesurer chaque script dans son propre processus
+import sys
+import tempfile
+import time
+
+try:
+    import resource     # pour la memoire maximale (RSS), absent sous Windows
+except ImportError:
+    resource = None
+
+
+# repertoire des scripts mesures
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# largeur des colonnes DisplayName, DisplayVersion et Publisher (col_specs de txt2xls-v2.py)
+COLUMN_WIDTHS = (62, 17, 29)
+COLUMN_NAMES = ('DisplayName', 'DisplayVersion', 'Publisher', 'InstallDate')
+COL_SPECS = [(0, 63), (63, 81), (81, 111), (111, None)]
+
+PUBLISHERS = [
+    'Microsoft Corporation', 'Google LLC', 'Adobe Inc.', 'Oracle Corporation', 'Mozilla',
+    'Intel Corporation', 'NVIDIA Corporation', 'Igor Pavlov', 'Don HO don.h@free.fr',
+    'Société Générale', 'Dassault Systèmes', 'VideoLAN', 'Python Software Foundation', '',
+]
+PRODUCTS = [
+    'Microsoft Visual C++ 2015-2022 Redistributable (x64)', 'Google Chrome', 'Adobe Acrobat Reader DC',
+    'Java 8 Update 401', 'Mozilla Firefox (x64 fr)', 'Intel(R) Management Engine Components',
+    'NVIDIA Pilote graphique', '7-Zip 23.01 (x64)', 'Notepad++ (64-bit x64)', 'Logiciel de gestion comptable',
+    'SOLIDWORKS Électrique', 'VLC media player', 'Python 3.11.7 (64-bit)', 'Microsoft Edge', 'Mise à jour KB5034441',
+]
+
+
+def format_line(cells):
+    '''
+    Met une ligne en forme comme 'Format-Table -AutoSize' : colonnes de largeur fixe
+    separees par un espace, une valeur trop longue est tronquee avec '...'
+    '''
+    parts = []
+    for value, width in zip(cells, COLUMN_WIDTHS):
+        if len(value) > width:
+            value = value[:width - 3] + '...'
+        parts.append(value.ljust(width))
+    parts.append(cells[-1])
+    return ' '.join(parts).rstrip()
+
+
+def iter_inventory_lines(nb_rows, bad_dates=0.1, long_names=0.05, seed=0):
+    '''
+    Genere les lignes d'une sortie de
+    'Get-ItemProperty ... | Select-Object DisplayName, DisplayVersion, Publisher, InstallDate | Format-Table -AutoSize'
+
+    Arguments:
+        nb_rows    -- le nombre de programmes
+        bad_dates  -- la proportion de dates vides ou mal formees
+        long_names -- la proportion de DisplayName plus longs que la colonne
+        seed       -- la graine du generateur aleatoire
+
+    Retourne:
+        un generateur sur les lignes (sans fin de ligne)
+    '''
+    rng = random.Random(seed)
+    yield ''
+    yield format_line(COLUMN_NAMES)
+    yield format_line(['-' * len(name) for name in COLUMN_NAMES])
+
+    for _ in range(nb_rows):
+        name = rng.choice(PRODUCTS)
+        if rng.random() < long_names:
+            name = f"{name} - {rng.choice(PRODUCTS)} - {rng.choice(PRODUCTS)}"
+        version = '.'.join(str(rng.randint(0, 120)) for _ in range(rng.randint(1, 4)))
+
+        if rng.random() < bad_dates:
+            date = rng.choice(['', '', '2023', '31/02/2021', '20231345', 'n/a', '15/03/2021'])
+        else:
+            date = f"{rng.randint(2010, 2024)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+
+        # PowerShell complete les lignes jusqu'a la largeur de la derniere colonne
+        yield format_line([name, version, rng.choice(PUBLISHERS), date]).ljust(sum(COLUMN_WIDTHS) + 3 + 11)
+
+    yield ''
+    yield ''
+
+
+def generate_format_table(output_file, nb_rows, encoding='utf-16', bad_dates=0.1, long_names=0.05, seed=0):
+    '''
+    Ecrit un fichier d'inventaire synthetique, bloc par bloc pour rester en memoire constante.
+    'utf-16' ecrit de l'UTF-16LE avec BOM, comme une redirection '>' de PowerShell
+
+    Retourne:
+        la taille du fichier en octets
+    '''
+    codec = 'utf-16-le' if encoding == 'utf-16' else encoding
+    with open(output_file, 'wb') as f:
+        if encoding == 'utf-16':
+            f.write(b'\xff\xfe')
+
+        block = []
+        for line in iter_inventory_lines(nb_rows, bad_dates, long_names, seed):
+            block.append(line)
+            if len(block) >= 10000:
+                f.write(('\r\n'.join(block) + '\r\n').encode(codec, errors='replace'))
+                block = []
+        if block:
+            f.write(('\r\n'.join(block) + '\r\n').encode(codec, errors='replace'))
+
+    return os.path.getsize(output_file)
+
+
+def peak_rss_kb():
+    '''
+    Memoire maximale (RSS) atteinte jusqu'ici par le processus, en Ko
+    '''
+    if resource is None:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS donne des octets, Linux des Ko
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_stages(input_file, nb_rows, workdir):
+    '''
+    Mesure chaque etape de txt2xls-v2.py sur un fichier : duree, debit
+    et memoire maximale atteinte a la fin de l'etape (valeur cumulee du processus)
+
+    Retourne:
+        la liste des mesures par etape
+    '''
+    import txt2xls_core     # importe ici : le generateur seul n'en a pas besoin
+    # un cache vierge pour mesurer la vraie detection de l'encodage
+    txt2xls_core.ENCODING_CACHE_FILE = os.path.join(workdir, 'encodings.jsonl')
+    txt2xls_core._encoding_cache.clear()
+
+    size = os.path.getsize(input_file)
+    col_files = [os.path.join(workdir, f"col{i+1}.txt") for i in range(len(COL_SPECS))]
+    csv_file = os.path.join(workdir, 'fichier.csv')
+    state = {}
+
+    def merge_csv():
+        txt2xls_core.save_columns_to_files(state['columns'], col_files)
+        txt2xls_core.merge_columns_to_csv(csv_file, col_files, '\t')
+
+    stages = [
+        ('detect_encoding', lambda: txt2xls_core.detect_encoding(input_file)),
+        ('extract_columns', lambda: state.__setitem__('columns', txt2xls_core.extract_columns(input_file, COL_SPECS))),
+        ('normalize_dates_in_column', lambda: state['columns'].__setitem__(-1, txt2xls_core.normalize_dates_in_column(state['columns'][-1]))),
+        ('csv_merge', merge_csv),
+        ('xlsx_write', lambda: txt2xls_core.convert_csv_to_excel(csv_file, os.path.join(workdir, 'v2.xlsx'), '\t', date_column=-1)),
+        ('stream', lambda: txt2xls_core.convert_text_to_excel_stream(input_file, os.path.join(workdir, 'stream.xlsx'), COL_SPECS)),
+    ]
+
+    measures = []
+    for name, stage in stages:
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage()
+        seconds = time.perf_counter() - start
+        measures.append({
+            'stage': name,
+            'seconds': seconds,
+            'cpu_seconds': time.process_time() - cpu_start,
+            'rows_per_second': nb_rows / seconds if seconds else None,
+            'mb_per_second': size / 2**20 / seconds if seconds else None,
+            'peak_rss_kb': peak_rss_kb(),
+        })
+
+    return measures
+
+
+def run_script(script, input_file, nb_rows, workdir):
+    '''
+    Mesure un script complet dans son propre processus : duree,
+    code de retour et memoire maximale de ce seul processus
+    '''
+    os.makedirs(os.path.join(workdir, 'data', 'tmp'), exist_ok=True)
+    command = [sys.executable, os.path.join(PACKAGE_DIR, script), '-i', input_file, '-o', os.path.join(workdir, script + '.xlsx')]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+        process.returncode = returncode
+    else:
+        returncode = process.wait()
+        rss = None
+    seconds = time.perf_counter() - start
+
+    return {
+        'script': script,
+        'seconds': seconds,
+        'returncode': returncode,
+        'rows_per_second': nb_rows / seconds if seconds else None,
+        'peak_rss_kb': rss,
+        'stderr': process.stderr.read().decode(errors='replace')[-500:],
+    }
+
+
+def run_benchmark(row_counts, encodings, scripts, workdir, bad_dates=0.1, long_names=0.05):
+    '''
+    Genere chaque jeu de donnees puis mesure les etapes de txt2xls-v2.py
+    et les scripts complets
+
+    Retourne:
+        le dictionnaire des resultats, pret a etre ecrit en JSON
+    '''
+    results = []
+    for nb_rows in row_counts:
+        for encoding in encodings:
+            input_file = os.path.join(workdir, f"scan-{nb_rows}-{encoding}.txt")
+            start = time.perf_counter()
+            size = generate_format_table(input_file, nb_rows, encoding, bad_dates, long_names)
+            print(f"{nb_rows} lignes {encoding} : {size / 2**20:.1f} Mo generes en {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+            # les etapes sont mesurees dans un processus neuf pour isoler la memoire
+            command = [sys.executable, os.path.abspath(__file__), '--run-stages', input_file, '--rows', str(nb_rows), '--workdir', workdir]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            entry = {'rows': nb_rows, 'encoding': encoding, 'bytes': size, 'stages': json.loads(output)}
+            entry['scripts'] = [run_script(script, input_file, nb_rows, workdir) for script in scripts]
+            results.append(entry)
+
+            os.remove(input_file)
+
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesurer les performances de TxtInExcel.py, txt2xls.py et txt2xls-v2.py")
+    parser.add_argument("--rows", default="1000,100000", help="Nombres de lignes des jeux de données, séparés par des virgules (par défaut: %(default)s)")
+    parser.add_argument("--encodings", default="utf-16,utf-8,cp1252", help="Encodages des jeux de données (par défaut: %(default)s)")
+    parser.add_argument("--scripts", default="txt2xls-v2.py,txt2xls.py,TxtInExcel.py", help="Scripts mesurés de bout en bout (par défaut: %(default)s)")
+    parser.add_argument("--bad-dates", type=float, default=0.1, help="Proportion de dates vides ou mal formées (par défaut: %(default)s)")
+    parser.add_argument("--long-names", type=float, default=0.05, help="Proportion de DisplayName trop longs (par défaut: %(default)s)")
+    parser.add_argument("--workdir", help="Répertoire de travail (par défaut: un répertoire temporaire)")
+    parser.add_argument("-o", "--output", help="Fichier JSON des résultats (par défaut: sortie standard)")
+    parser.add_argument("--generate", metavar="FICHIER", help="Générer seulement un jeu de données (--rows, --encodings: le premier)")
+    parser.add_argument("--run-stages", metavar="FICHIER", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    row_counts = [int(value) for value in args.rows.split(',')]
+    encodings = args.encodings.split(',')
+
+    if args.generate:
+        generate_format_table(args.generate, row_counts[0], encodings[0], args.bad_dates, args.long_names)
+        sys.exit(0)
+
+    if args.run_stages:
+        json.dump(run_stages(args.run_stages, row_counts[0], args.workdir), sys.stdout)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        report = run_benchmark(row_counts, encodings, args.scripts.split(','), workdir, args.bad_dates, args.long_names)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
@@ -0,0 +1,77 @@
+import os               # pour la manipulation des fichiers et des repertoires
+import sys              # pour trouver les modules du depot
+import tempfile         # pour isoler le cache des tests
+
+# les modules sont a la racine du depot ; le cache des tests ne doit pas
+# se meler a celui de l'utilisateur
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['TXT2XLS_CACHE_DIR'] = tempfile.mkdtemp(prefix='txt2xls-tests-')
+
+import pytest           # pour les fixtures partagees
+
+# colonnes par defaut des inventaires et largeurs correspondantes pour 'format_table'
+COL_SPECS = [(0, 63), (63, 81), (81, 111), (111, None)]
+WIDTHS = [63, 18, 30]
+HEADER = ['DisplayName', 'DisplayVersion', 'Publisher', 'InstallDate']
+
+
+def write_file(path, data):
+    '''
+    Ecrit un fichier de test (texte en UTF-8 ou octets) et rend son chemin
+    '''
+    with open(path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+    return str(path)
+
+
+def format_table(widths, header, *rows):
+    '''
+    Met des lignes en forme comme Format-Table : colonnes de largeur fixe ('widths'
+    pour toutes sauf la derniere) et ligne de soulignement '----' sous l'entete
+    '''
+    def line(cells):
+        return ''.join(cell.ljust(width) for cell, width in zip(cells, widths)) + cells[-1]
+
+    underline = line(['-' * len(name) for name in header])
+    return '\n'.join([line(header), underline] + [line(row) for row in rows]) + '\n'
+
+
+def read_sheets(xlsx_file):
+    '''
+    Relit un classeur : {nom de feuille: liste des lignes (listes de valeurs)}
+    '''
+    import openpyxl     # importe a la demande
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True)
+    try:
+        return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook}
+    finally:
+        workbook.close()
+
+
+@pytest.fixture
+def inventory_files(tmp_path):
+    '''
+    Trois inventaires de la meme machine dans les trois formats d'entree,
+    avec des ordres de colonnes et une disposition Format-Table differents
+    '''
+    table = format_table(
+        [21, 15, 13],
+        HEADER,
+        ['Firefox', '115.0', 'Mozilla', '20230704'],
+        ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024'],
+    )
+    csv_text = (
+        '#TYPE Selected.System.Management.Automation.PSCustomObject\n'
+        '"DisplayName";"InstallDate";"DisplayVersion";"Publisher"\n'
+        '"Firefox";"20230704";"115.0";"Mozilla"\n'
+        '"7-Zip";"01/02/2024";"23.01";"Igor Pavlov"\n'
+    )
+    json_text = (
+        '[{"Publisher": "Mozilla", "InstallDate": "20230704", "DisplayName": "Firefox", "DisplayVersion": "115.0"},\n'
+        ' {"Publisher": "Igor Pavlov", "InstallDate": "01/02/2024", "DisplayName": "7-Zip", "DisplayVersion": "23.01"}]\n'
+    )
+    return {
+        'table': write_file(tmp_path / 'pc-table.txt', table),
+        'csv': write_file(tmp_path / 'pc-csv.csv', csv_text),
+        'json': write_file(tmp_path / 'pc-json.json', json_text),
+    }
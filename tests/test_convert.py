@@ -0,0 +1,79 @@
+import io               # pour les conversions en memoire
+from datetime import datetime   # pour les dates attendues
+
+import pytest
+
+import txt2xls_core
+from conftest import HEADER, WIDTHS, format_table, read_sheets, write_file
+
+
+ROWS = [['Firefox', '115.0', 'Mozilla', '20230704'], ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024']]
+
+
+@pytest.fixture
+def inventory_text():
+    return format_table(WIDTHS, HEADER, *ROWS)
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-16', 'cp1252'])
+def test_bytes_path_and_lines_give_the_same_csv(tmp_path, inventory_text, encoding):
+    data = inventory_text.encode(encoding)
+    input_file = write_file(tmp_path / 'scanpc.txt', data)
+
+    from_bytes = txt2xls_core.convert(data, output_format='csv')
+    assert txt2xls_core.convert(input_file, output_format='csv') == from_bytes
+    assert txt2xls_core.convert(inventory_text.splitlines(), output_format='csv') == from_bytes
+    assert from_bytes.decode().splitlines() == [
+        ','.join(HEADER),
+        'Firefox,115.0,Mozilla,04/07/2023',
+        '7-Zip,23.01,Igor Pavlov,01/02/2024',
+    ]
+
+
+def test_convert_to_a_caller_buffer(tmp_path, inventory_text):
+    buffer = io.BytesIO()
+    assert txt2xls_core.convert(io.BytesIO(inventory_text.encode()), buffer) == 2
+    sheet = read_sheets(write_file(tmp_path / 'out.xlsx', buffer.getvalue()))['Inventaire']
+    assert sheet == [HEADER, ['Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)],
+                     ['7-Zip', '23.01', 'Igor Pavlov', datetime(2024, 2, 1)]]
+
+
+
+def test_dates_before_1900_are_written_as_text(tmp_path):
+    # Excel ne connait pas de date avant le 01/01/1900 : une date serie serait invalide
+    rows = [['Ancien', '1.0', 'Editeur', '00010101'], ['Veille', '1.0', 'Editeur', '18991231'],
+            ['Mars', '1.0', 'Editeur', '19000301']]
+    output_file = str(tmp_path / 'dates.xlsx')
+    txt2xls_core.convert(format_table(WIDTHS, HEADER, *rows).encode(), output_file)
+    sheet = read_sheets(output_file)['Inventaire']
+    assert [row[3] for row in sheet[1:]] == ['01/01/0001', '31/12/1899', datetime(1900, 3, 1)]
+
+def test_csv_to_a_text_stream(inventory_text):
+    output = io.StringIO()
+    assert txt2xls_core.convert(inventory_text.encode(), output, output_format='csv', delimiter=';') == 2
+    assert output.getvalue().splitlines()[1] == 'Firefox;115.0;Mozilla;04/07/2023'
+
+
+def test_convert_rejects_unknown_output_format_and_source():
+    with pytest.raises(ValueError):
+        txt2xls_core.convert(b'', output_format='ods')
+    with pytest.raises(TypeError):
+        txt2xls_core.convert(None)
+
+
+def test_digest_only_for_the_cache_or_the_journal(tmp_path, inventory_text, monkeypatch):
+    input_file = write_file(tmp_path / 'pc1.txt', inventory_text)
+    digests = []
+    file_digest = txt2xls_core.file_digest
+    monkeypatch.setattr(txt2xls_core, 'file_digest', lambda path: digests.append(path) or file_digest(path))
+
+    # sans cache ni journal, le fichier n'est lu qu'une fois, pour etre converti
+    result = txt2xls_core.convert_file(input_file, str(tmp_path / 'pc1.xlsx'), txt2xls_core.DEFAULT_COL_SPECS, use_cache=False)
+    assert result['status'] == 'ok' and result['digest'] == ''
+    assert digests == []
+
+    journal_file = str(tmp_path / 'journal.jsonl')
+    results = txt2xls_core.convert_batch([input_file], str(tmp_path / 'sortie'), txt2xls_core.DEFAULT_COL_SPECS, jobs=1,
+                                         use_cache=False, journal_file=journal_file)
+    assert results[0]['digest'] == file_digest(input_file)
+    assert digests == [input_file]
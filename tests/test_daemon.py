@@ -0,0 +1,126 @@
+import os               # pour tuer un processus du pool
+import signal           # pour SIGKILL
+import threading        # pour faire tourner le serveur pendant le test
+import time             # pour attendre que le pool soit casse
+import multiprocessing  # pour un processus fils qui n'est pas au pool
+
+import pytest
+
+import txt2xls_daemon
+from conftest import HEADER, WIDTHS, format_table, read_sheets, write_file
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    return write_file(tmp_path / 'pc1.txt', format_table(WIDTHS, HEADER, ['Firefox', '115.0', 'Mozilla', '20230704'],
+                                                         ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024']))
+
+
+def start_server(socket_path):
+    '''
+    Un serveur de conversion de deux processus, servi par un thread
+    '''
+    server = txt2xls_daemon.ConversionServer(socket_path, jobs=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = start_server(str(tmp_path / 'txt2xls.sock'))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def call(server, header, payload=b''):
+    return txt2xls_daemon.request(server.server_address, header, payload, timeout=60)
+
+
+def kill_a_worker(server):
+    '''
+    Tue brutalement un processus du pool (comme le ferait le manque de memoire)
+    et attend que le pool soit casse
+    '''
+    server.executor.submit(os.getpid).result()    # les processus du pool ne sont lances qu'a la premiere tache
+    os.kill(next(iter(server.executor._processes)), signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not txt2xls_daemon.is_pool_broken(server.executor):
+        assert time.monotonic() < deadline, "le pool n'a pas vu le processus tue"
+        time.sleep(0.05)
+
+
+def test_health_reports_the_pool(server):
+    response, _ = call(server, {'op': 'health'})
+    assert response['status'] == 'ok'
+    assert response['pool'] == 'ok'
+    assert response['pool_restarts'] == 0
+
+
+def test_convert_path_and_inline(server, inventory, tmp_path):
+    output_file = str(tmp_path / 'pc1.xlsx')
+    options = {'format': 'xlsx', 'use_cache': False}
+    result, _ = call(server, {'op': 'convert', 'input': inventory, 'output': output_file, 'options': options})
+    assert result['status'] == 'ok' and result['rows'] == 2
+
+    with open(inventory, 'rb') as f:
+        result, content = call(server, {'op': 'convert', 'options': dict(options, name='pc1.txt')}, f.read())
+    assert result['status'] == 'ok'
+    assert read_sheets(write_file(tmp_path / 'inline.xlsx', content)) == read_sheets(output_file)
+
+
+def test_columns_are_sent_with_the_request(server, tmp_path):
+    options = {'format': 'csv', 'use_cache': False, 'col_specs': [[0, 7], [7, 15], [15, None]]}
+    result, content = call(server, {'op': 'convert', 'options': options}, b'Name   Version Date\nfoo    1.0     01/02/2020\n')
+    assert result['status'] == 'ok'
+    assert content.decode().splitlines() == ['Name,Version,Date', 'foo,1.0,01/02/2020']
+
+
+
+def test_columns_follow_the_underline_by_default(server):
+    text = format_table([12, 8], ['DisplayName', 'Version', 'InstallDate'], ['Firefox', '115.0', '20230704'])
+    result, content = call(server, {'op': 'convert', 'options': {'format': 'csv', 'use_cache': False}}, text.encode())
+    assert result['status'] == 'ok'
+    assert content.decode().splitlines() == ['DisplayName,Version,InstallDate', 'Firefox,115.0,04/07/2023']
+
+def test_pool_is_restarted_after_a_worker_is_killed(server, inventory, tmp_path):
+    kill_a_worker(server)
+
+    # la conversion suivante est confiee a un nouveau pool
+    header = {'op': 'convert', 'input': inventory, 'output': str(tmp_path / 'pc1.xlsx'), 'options': {'use_cache': False}}
+    result, _ = call(server, header)
+    assert result['status'] == 'ok'
+    assert result['rows'] == 2
+
+    response, _ = call(server, {'op': 'stats'})
+    assert response['pool_restarts'] == 1
+
+
+def test_health_restarts_a_broken_pool(server):
+    kill_a_worker(server)
+    response, _ = call(server, {'op': 'health'})
+    assert response['status'] == 'ok'
+    assert response['pool'] == 'relance'
+    assert response['pool_restarts'] == 1
+    assert not txt2xls_daemon.is_pool_broken(server.executor)
+
+
+def test_close_stops_only_the_pool(tmp_path):
+    other = multiprocessing.Process(target=time.sleep, args=(30,))
+    other.start()
+    try:
+        server = start_server(str(tmp_path / 'txt2xls.sock'))
+        kill_a_worker(server)
+        workers = list(server.executor._processes.values())
+
+        # un pool casse n'est pas attendu ; les processus qui ne sont pas au pool continuent
+        start = time.monotonic()
+        server.shutdown()
+        server.server_close()
+        assert time.monotonic() - start < 5
+        assert not os.path.exists(server.server_address)
+        assert not any(process.is_alive() for process in workers)
+        assert other.is_alive()
+    finally:
+        other.terminate()
+        other.join()
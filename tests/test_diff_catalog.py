@@ -0,0 +1,103 @@
+import os               # pour les repertoires des releves
+import sqlite3          # pour relire les differences en base
+from datetime import datetime   # pour les dates attendues
+
+import txt2xls_core
+from conftest import HEADER, WIDTHS, format_table, read_sheets, write_file
+
+
+def write_inventory(path, *rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return write_file(path, format_table(WIDTHS, HEADER, *rows))
+
+
+def test_diff_finds_added_removed_and_updated_software(tmp_path):
+    old = write_inventory(str(tmp_path / 'janvier' / 'pc1.txt'),
+                          ['Firefox', '115.0', 'Mozilla', '20230704'],
+                          ['7-Zip', '23.01', 'Igor Pavlov', '20240201'],
+                          ['WinRAR', '6.0', 'RARLAB', '20200101'])
+    new = write_inventory(str(tmp_path / 'fevrier' / 'pc1.txt'),
+                          ['Firefox', '128.0', 'Mozilla', '20240801'],
+                          ['7-Zip', '23.01', 'Igor Pavlov', '20240201'],
+                          ['VLC', '3.0.20', 'VideoLAN', '20240315'])
+    output_file = str(tmp_path / 'changements.xlsx')
+    results, counts, skipped = txt2xls_core.diff_inventories([old], [new], output_file, None)
+
+    assert [result['status'] for result in results] == ['ok', 'ok']
+    assert counts == {'ajoute': 1, 'supprime': 1, 'modifie': 1}
+    assert skipped == []
+    sheet = read_sheets(output_file)['Differences']
+    assert sheet[0] == [txt2xls_core.HOST_COLUMN, txt2xls_core.DIFF_CHANGE_COLUMN] + HEADER + [txt2xls_core.DIFF_OLD_VERSION_COLUMN]
+    assert sorted(sheet[1:], key=lambda row: row[2]) == [
+        ['pc1', 'modifie', 'Firefox', '128.0', 'Mozilla', datetime(2024, 8, 1), '115.0'],
+        ['pc1', 'ajoute', 'VLC', '3.0.20', 'VideoLAN', datetime(2024, 3, 15), None],
+        ['pc1', 'supprime', 'WinRAR', '6.0', 'RARLAB', datetime(2020, 1, 1), '6.0'],
+    ]
+
+
+def test_diff_of_batches_skips_hosts_missing_on_one_side(tmp_path):
+    row = ['Firefox', '115.0', 'Mozilla', '20230704']
+    old = [write_inventory(str(tmp_path / 'old' / name), row) for name in ('pc1.txt', 'pc2.txt')]
+    new = [write_inventory(str(tmp_path / 'new' / name), ['Firefox', '128.0', 'Mozilla', '20240801'])
+           for name in ('pc1.txt', 'pc3.txt')]
+    output_file = str(tmp_path / 'changements.db')
+    results, counts, skipped = txt2xls_core.diff_inventories(old, new, output_file, None)
+
+    assert counts == {'ajoute': 0, 'supprime': 0, 'modifie': 1}
+    assert skipped == ['pc2', 'pc3']
+    with sqlite3.connect(output_file) as connection:
+        rows = connection.execute(f"SELECT * FROM {txt2xls_core.DIFF_TABLE}").fetchall()
+    assert rows == [('pc1', 'modifie', 'Firefox', '128.0', 'Mozilla', '2024-08-01', '115.0')]
+
+
+def test_diff_compares_formats_with_other_column_orders(tmp_path, inventory_files):
+    new = write_file(tmp_path / 'pc-json.json',
+                     '[{"Publisher": "Mozilla", "InstallDate": "20240801", "DisplayName": "Firefox", "DisplayVersion": "128.0"}]')
+    output_file = str(tmp_path / 'changements.xlsx')
+    results, counts, skipped = txt2xls_core.diff_inventories([inventory_files['csv']], [new], output_file, None)
+
+    assert counts == {'ajoute': 0, 'supprime': 1, 'modifie': 1}
+    sheet = read_sheets(output_file)['Differences']
+    # les colonnes sont celles du premier fichier (le csv), les lignes du JSON y sont remises
+    assert sheet[0][2:6] == ['DisplayName', 'InstallDate', 'DisplayVersion', 'Publisher']
+    assert ['pc-json', 'modifie', 'Firefox', datetime(2024, 8, 1), '128.0', 'Mozilla', '115.0'] in sheet
+
+
+def test_catalog_aggregates_the_fleet(tmp_path, inventory_files):
+    inputs = [
+        write_inventory(str(tmp_path / 'pc1.txt'),
+                        ['Firefox', '115.0', 'Mozilla', '20230704'],
+                        ['Firefox', '115.0', 'Mozilla', '20230901'],
+                        ['7-Zip', '23.01', 'Igor Pavlov', '']),
+        write_inventory(str(tmp_path / 'pc2.txt'),
+                        ['Firefox', '115.0', 'Mozilla', '20230601'],
+                        ['Firefox', '128.0', 'Mozilla', '20240801']),
+        inventory_files['json'],
+    ]
+    output_file = str(tmp_path / 'catalogue.xlsx')
+    results = txt2xls_core.build_catalog(inputs, output_file, None, jobs=2)
+
+    assert [result['status'] for result in results] == ['ok'] * 3
+    assert [result['rows'] for result in results] == [3, 2, 2]
+    sheets = read_sheets(output_file)
+    assert sheets['Catalogue'] == [
+        txt2xls_core.CATALOG_HEADER,
+        ['7-Zip', '23.01', 'Igor Pavlov', 2, 2, datetime(2024, 2, 1), datetime(2024, 2, 1), 'pc-json, pc1'],
+        ['Firefox', '115.0', 'Mozilla', 3, 4, datetime(2023, 6, 1), datetime(2023, 9, 1), 'pc-json, pc1, pc2'],
+        ['Firefox', '128.0', 'Mozilla', 1, 1, datetime(2024, 8, 1), datetime(2024, 8, 1), 'pc2'],
+    ]
+    assert sheets['Editeurs'] == [
+        txt2xls_core.PUBLISHER_HEADER,
+        ['Igor Pavlov', 1, 1, 2, 2, datetime(2024, 2, 1), datetime(2024, 2, 1)],
+        ['Mozilla', 1, 2, 3, 5, datetime(2023, 6, 1), datetime(2024, 8, 1)],
+    ]
+
+
+def test_catalog_reports_a_file_without_key_columns(tmp_path):
+    other = write_file(tmp_path / 'pc9.csv', '"DisplayName","InstallDate"\n"Firefox","20230704"\n')
+    output_file = str(tmp_path / 'catalogue.xlsx')
+    results = txt2xls_core.build_catalog([other], output_file, None, jobs=1)
+
+    assert results[0]['status'] == 'erreur'
+    assert 'DisplayVersion' in results[0]['error']
+    assert read_sheets(output_file)['Catalogue'] == [txt2xls_core.CATALOG_HEADER]
@@ -0,0 +1,22 @@
+import io               # pour les flux en memoire
+
+import txt2xls_core
+
+
+SAMPLE_SIZE = 4096
+
+
+def test_non_ascii_after_an_ascii_head_is_found():
+    data = b'DisplayName\n' * 2000 + 'Édition française, société générale\n'.encode('cp1252') * 50
+    assert txt2xls_core.detect_stream_encoding(io.BytesIO(data), SAMPLE_SIZE) != 'ascii'
+
+
+def test_ascii_skip_is_bounded():
+    f = io.BytesIO(b'DisplayName\n' * 100000 + 'é\n'.encode('utf-8'))
+    assert txt2xls_core.detect_stream_encoding(f, SAMPLE_SIZE) == 'utf-8'
+    # quelques echantillons sont lus, pas le fichier entier
+    assert f.tell() <= (txt2xls_core.ENCODING_ASCII_SKIP_SAMPLES + 2) * SAMPLE_SIZE
+
+
+def test_ascii_file_is_read_to_the_end():
+    assert txt2xls_core.detect_stream_encoding(io.BytesIO(b'DisplayName\n' * 1000), SAMPLE_SIZE) == 'ascii'
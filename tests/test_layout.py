@@ -0,0 +1,63 @@
+from datetime import datetime   # pour les dates attendues
+
+import txt2xls_core
+from conftest import format_table, write_file
+
+
+def test_layout_follows_the_underline():
+    lines = format_table(
+        [12, 8],
+        ['DisplayName', 'Version', 'InstallDate'],
+        ['Firefox', '115.0', '20230704'],
+    ).splitlines()
+    assert txt2xls_core.detect_layout(lines) == [(0, 12), (12, 20), (20, None)]
+
+
+def test_layout_widens_a_column_to_a_right_aligned_value():
+    # Format-Table aligne les nombres a droite : la valeur deborde a gauche du soulignement
+    lines = [
+        'DisplayName    Size InstallDate',
+        '-----------    ---- -----------',
+        'Firefox      123456 20230704',
+    ]
+    assert txt2xls_core.detect_layout(lines) == [(0, 13), (13, 20), (20, None)]
+
+
+def test_layout_without_underline_is_unknown():
+    assert txt2xls_core.detect_layout(['DisplayName Version', 'Firefox     115.0']) is None
+
+
+def test_files_with_different_layouts_give_the_same_rows(tmp_path):
+    rows = [['Firefox', '115.0', 'Mozilla', '20230704'], ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024']]
+    header = ['DisplayName', 'DisplayVersion', 'Publisher', 'InstallDate']
+    narrow = write_file(tmp_path / 'narrow.txt', format_table([12, 15, 12], header, *rows))
+    wide = write_file(tmp_path / 'wide.txt', format_table([40, 20, 30], header, *rows))
+
+    expected = [header] + [row[:3] + [txt2xls_core.parse_date(row[3])] for row in rows]
+    assert list(txt2xls_core.iter_inventory_rows(narrow, None)) == expected
+    assert list(txt2xls_core.iter_inventory_rows(wide, None)) == expected
+
+
+def test_file_without_underline_uses_default_columns(tmp_path):
+    line = 'Firefox'.ljust(63) + '115.0'.ljust(18) + 'Mozilla'.ljust(30) + '20230704'
+    input_file = write_file(tmp_path / 'old.txt', line + '\n' + line + '\n')
+    encoding = txt2xls_core.detect_encoding(input_file)
+    assert txt2xls_core.resolve_col_specs(input_file, encoding, None) == txt2xls_core.DEFAULT_COL_SPECS
+    assert list(txt2xls_core.iter_inventory_rows(input_file, None))[1] == ['Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)]
+
+
+def test_explicit_columns_override_the_underline(tmp_path):
+    text = format_table([12, 8], ['DisplayName', 'Version', 'InstallDate'], ['Firefox', '115.0', '20230704'])
+    input_file = write_file(tmp_path / 'scanpc.txt', text)
+    rows = list(txt2xls_core.iter_inventory_rows(input_file, [(0, 12), (12, None)]))
+    assert rows[0] == ['DisplayName', 'Version InstallDate']
+    # la derniere colonne imposee n'est pas une date
+    assert rows[1] == ['Firefox', None]
+
+
+def test_explicit_columns_apply_to_in_memory_sources():
+    text = 'Name   Version Date\nfoo    1.0     01/02/2020\n'
+    rows = list(txt2xls_core.iter_source_rows(text.encode(), [(0, 7), (7, 15), (15, None)]))
+    assert rows == [['Name', 'Version', 'Date'], ['foo', '1.0', datetime(2020, 2, 1)]]
+    # les memes lignes passees en texte
+    assert list(txt2xls_core.iter_source_rows(text.splitlines(), [(0, 7), (7, 15), (15, None)])) == rows
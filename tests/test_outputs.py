@@ -0,0 +1,138 @@
+import codecs           # pour le BOM de l'inventaire illisible
+import os               # pour les repertoires des machines
+import sqlite3          # pour relire la base produite
+from datetime import datetime   # pour les dates attendues
+
+import pytest
+
+import txt2xls_core
+from conftest import COL_SPECS, HEADER, WIDTHS, format_table, read_sheets, write_file
+
+
+@pytest.fixture(scope='module')
+def broken_inventory(tmp_path_factory):
+    '''
+    Un inventaire UTF-8 (avec BOM) dont la derniere ligne n'est pas de l'UTF-8 : des
+    dizaines de milliers de lignes sont lues avant que le decodage n'echoue
+    '''
+    rows = [[f"Logiciel {i}", f"1.{i}", 'Editeur', '20230704'] for i in range(30000)]
+    data = codecs.BOM_UTF8 + format_table(WIDTHS, HEADER, *rows).encode() + b'\xff\xfe\n'
+    return write_file(tmp_path_factory.mktemp('illisible') / 'illisible.txt', data)
+
+
+@pytest.fixture
+def good_inventory(tmp_path):
+    return write_file(tmp_path / 'pc1.txt', format_table(WIDTHS, HEADER, ['Firefox', '115.0', 'Mozilla', '20230704']))
+
+
+def write_inventory(path, *rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return write_file(path, format_table(WIDTHS, HEADER, *rows))
+
+
+def test_merge_names_hosts_after_their_directory(tmp_path):
+    inputs = [write_inventory(str(tmp_path / host / 'scanpc.txt'), ['Firefox', '115.0', 'Mozilla', '20230704'])
+              for host in ('pc1', 'pc2')]
+    output_file = str(tmp_path / 'parc.xlsx')
+    results = txt2xls_core.merge_to_excel(inputs, output_file, COL_SPECS)
+
+    assert [result['rows'] for result in results] == [1, 1]
+    assert read_sheets(output_file)['Inventaire'] == [
+        [txt2xls_core.HOST_COLUMN] + HEADER,
+        ['pc1', 'Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)],
+        ['pc2', 'Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)],
+    ]
+
+
+@pytest.mark.parametrize('sheet_per_host', [False, True])
+def test_merge_leaves_no_rows_of_a_failed_file(tmp_path, good_inventory, broken_inventory, sheet_per_host):
+    output_file = str(tmp_path / 'parc.xlsx')
+    results = txt2xls_core.merge_to_excel([good_inventory, broken_inventory], output_file, COL_SPECS,
+                                     sheet_per_host=sheet_per_host)
+
+    assert [result['status'] for result in results] == ['ok', 'erreur']
+    assert results[1]['error'].startswith('UnicodeDecodeError')
+    assert results[1]['rows'] == 0
+    sheets = read_sheets(output_file)
+    if sheet_per_host:
+        assert list(sheets) == ['pc1']
+        assert sheets['pc1'][1:] == [['Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)]]
+    else:
+        assert sheets['Inventaire'][1:] == [['pc1', 'Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)]]
+
+
+def sqlite_rows(database):
+    with sqlite3.connect(database) as connection:
+        return connection.execute(f"SELECT * FROM {txt2xls_core.SQLITE_TABLE}").fetchall()
+
+
+def test_sqlite_rolls_back_a_failed_file(tmp_path, good_inventory, broken_inventory):
+    other = write_inventory(str(tmp_path / 'pc2' / 'pc2.txt'), ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024'])
+    database = str(tmp_path / 'parc.db')
+    results = txt2xls_core.load_to_sqlite([good_inventory, broken_inventory, other], database, COL_SPECS)
+
+    assert [result['status'] for result in results] == ['ok', 'erreur', 'ok']
+    assert results[1]['error'].startswith('UnicodeDecodeError')
+    assert results[1]['rows'] == 0
+    assert [row[0] for row in sqlite_rows(database)] == ['pc1', 'pc2']
+
+
+def test_sqlite_first_file_failing_leaves_a_usable_table(tmp_path, good_inventory, broken_inventory):
+    database = str(tmp_path / 'parc.db')
+    results = txt2xls_core.load_to_sqlite([broken_inventory, good_inventory], database, COL_SPECS)
+
+    assert [result['status'] for result in results] == ['erreur', 'ok']
+    assert sqlite_rows(database) == [('pc1', good_inventory, 'Firefox', '115.0', 'Mozilla', '2023-07-04')]
+
+
+def test_sqlite_aligns_columns_by_name(tmp_path, inventory_files):
+    database = str(tmp_path / 'parc.db')
+    inputs = [inventory_files['table'], inventory_files['csv'], inventory_files['json']]
+    results = txt2xls_core.load_to_sqlite(inputs, database, None)
+
+    assert [result['status'] for result in results] == ['ok'] * 3
+    rows = sqlite_rows(database)
+    assert {row[2:] for row in rows} == {('Firefox', '115.0', 'Mozilla', '2023-07-04'), ('7-Zip', '23.01', 'Igor Pavlov', '2024-02-01')}
+    assert len(rows) == 6
+
+
+def test_merge_aligns_columns_by_name(tmp_path, inventory_files):
+    output_file = str(tmp_path / 'parc.xlsx')
+    inputs = [inventory_files['table'], inventory_files['csv'], inventory_files['json']]
+    results = txt2xls_core.merge_to_excel(inputs, output_file, None, use_cache=False)
+
+    assert [result['status'] for result in results] == ['ok'] * 3
+    sheet = read_sheets(output_file)['Inventaire']
+    assert sheet[0] == [txt2xls_core.HOST_COLUMN] + HEADER
+    for row in sheet[1:]:
+        assert row[1:] in (['Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)],
+                           ['7-Zip', '23.01', 'Igor Pavlov', datetime(2024, 2, 1)])
+
+
+def test_merge_rejects_a_file_with_other_columns(tmp_path, good_inventory):
+    other = write_file(tmp_path / 'pc2.csv', '"DisplayName","DisplayVersion","InstallDate"\n"7-Zip","23.01","20240201"\n')
+    output_file = str(tmp_path / 'parc.xlsx')
+    results = txt2xls_core.merge_to_excel([good_inventory, other], output_file, None, use_cache=False)
+
+    assert results[1]['status'] == 'erreur'
+    assert 'Publisher' in results[1]['error']
+    assert len(read_sheets(output_file)['Inventaire']) == 2
+
+
+def test_header_aligner():
+    assert txt2xls_core.header_aligner(['a', 'b'], ['a', 'b']) is None
+    assert txt2xls_core.header_aligner(['a', 'b', 'c'], ['c', 'a', 'b'])([3, 1, 2]) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        txt2xls_core.header_aligner(['a', 'b'], ['a', 'c'])
+
+
+def test_csv_short_rows_reach_every_output(tmp_path):
+    short = write_file(tmp_path / 'pc1.csv', '"DisplayName","DisplayVersion","Publisher","InstallDate"\n'
+                                             '"Firefox","115.0","Mozilla","20230704"\n"7-Zip","23.01"\n')
+    database = str(tmp_path / 'parc.db')
+    assert txt2xls_core.load_to_sqlite([short], database, None)[0]['status'] == 'ok'
+    assert sqlite_rows(database)[1] == ('pc1', short, '7-Zip', '23.01', '', None)
+
+    output_file = str(tmp_path / 'parc.xlsx')
+    assert txt2xls_core.merge_to_excel([short], output_file, None, use_cache=False)[0]['status'] == 'ok'
+    assert read_sheets(output_file)['Inventaire'][2] == ['pc1', '7-Zip', '23.01', None, None]
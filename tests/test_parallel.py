@@ -0,0 +1,79 @@
+import os               # pour les chemins des sorties
+import functools        # pour reduire la taille minimale des plages
+
+import pytest
+
+import txt2xls_core
+from conftest import COL_SPECS, HEADER, WIDTHS, format_table, read_sheets, write_file
+
+
+# les plages des tests sont petites : un fichier de quelques Mo en donne des dizaines
+MIN_RANGE_SIZE = 64 * 1024
+LARGE_ROWS = 20000
+
+
+@pytest.fixture(autouse=True)
+def small_ranges(monkeypatch):
+    monkeypatch.setattr(txt2xls_core, 'split_byte_ranges',
+                        functools.partial(txt2xls_core.split_byte_ranges, min_size=MIN_RANGE_SIZE))
+
+
+@pytest.fixture(scope='module', params=['utf-8', 'utf-16'])
+def large_inventory(request, tmp_path_factory):
+    '''
+    Un inventaire Format-Table de quelques Mo, avec des lignes vides et des dates
+    dans les deux formats, assez grand pour etre analyse en plusieurs plages
+    '''
+    rows = []
+    for i in range(LARGE_ROWS):
+        date = f"2023{i % 12 + 1:02d}{i % 28 + 1:02d}" if i % 3 else f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/2022"
+        rows.append([f"Logiciel {i % 5000}", f"{i % 7}.{i % 11}.{i}", f"Editeur {i % 97}", date if i % 17 else ''])
+    text = format_table(WIDTHS, HEADER, *rows).replace('\nLogiciel 10 ', '\n\nLogiciel 10 ')
+    return write_file(tmp_path_factory.mktemp('parallel') / 'large.txt', text.encode(request.param))
+
+
+def serial_rows(input_file):
+    encoding = txt2xls_core.detect_encoding(input_file)
+    return list(txt2xls_core.iter_table_rows(txt2xls_core.iter_fixed_width_rows(input_file, encoding, COL_SPECS)))
+
+
+def test_large_inventory_is_split(large_inventory):
+    encoding = txt2xls_core.detect_encoding(large_inventory)
+    ranges = txt2xls_core.split_byte_ranges(large_inventory, encoding, 8)
+    assert len(ranges) == 8
+    # la premiere plage commence apres le BOM de l'UTF-16
+    assert ranges[0][0] == (2 if encoding.startswith('utf-16') else 0)
+    assert ranges[-1][1] == os.path.getsize(large_inventory)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize('jobs', [2, 3, 8])
+def test_parallel_rows_equal_serial_rows(large_inventory, jobs):
+    serial = serial_rows(large_inventory)
+    encoding = txt2xls_core.detect_encoding(large_inventory)
+    parallel = list(txt2xls_core.iter_parallel_rows(large_inventory, encoding, COL_SPECS, jobs))
+    assert len(serial) == LARGE_ROWS + 1
+    assert parallel == serial
+
+
+def test_parallel_conversion_writes_the_same_rows(large_inventory, tmp_path):
+    serial = txt2xls_core.convert_file(large_inventory, str(tmp_path / 'serial.xlsx'), COL_SPECS, use_cache=False, jobs=1)
+    parallel = txt2xls_core.convert_file(large_inventory, str(tmp_path / 'parallel.xlsx'), COL_SPECS, use_cache=False, jobs=2)
+    assert serial['status'] == parallel['status'] == 'ok'
+    assert serial['rows'] == parallel['rows'] == LARGE_ROWS
+    assert read_sheets(serial['output']) == read_sheets(parallel['output'])
+
+
+def test_batch_with_a_pool_equals_serial_batch(tmp_path):
+    inputs = [
+        write_file(tmp_path / f"pc{i}.txt", format_table(WIDTHS, HEADER, ['Firefox', f"11{i}.0", 'Mozilla', '20230704'],
+                                                         ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024']))
+        for i in range(3)
+    ]
+    serial = txt2xls_core.convert_batch(inputs, str(tmp_path / 'serial'), COL_SPECS, jobs=1, use_cache=False)
+    parallel = txt2xls_core.convert_batch(inputs, str(tmp_path / 'parallel'), COL_SPECS, jobs=3, use_cache=False)
+
+    assert [result['status'] for result in serial] == [result['status'] for result in parallel] == ['ok'] * 3
+    for serial_result, parallel_result in zip(serial, parallel):
+        assert os.path.basename(serial_result['output']) == os.path.basename(parallel_result['output'])
+        assert read_sheets(serial_result['output']) == read_sheets(parallel_result['output'])
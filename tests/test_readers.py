@@ -0,0 +1,111 @@
+import io               # pour les conversions en memoire
+from datetime import datetime   # pour les dates attendues
+
+import pytest
+
+import txt2xls_core
+from conftest import read_sheets, write_file
+
+
+EXPECTED = [
+    ['Firefox', '115.0', 'Mozilla', datetime(2023, 7, 4)],
+    ['7-Zip', '23.01', 'Igor Pavlov', datetime(2024, 2, 1)],
+]
+
+
+def by_name(rows):
+    '''
+    Les lignes d'un inventaire dans l'ordre DisplayName, DisplayVersion, Publisher, InstallDate
+    '''
+    header = rows[0]
+    order = [header.index(name) for name in ('DisplayName', 'DisplayVersion', 'Publisher', 'InstallDate')]
+    return [[row[i] for i in order] for row in rows[1:]]
+
+
+@pytest.mark.parametrize('input_format', ['table', 'csv', 'json'])
+def test_formats_are_detected(inventory_files, input_format):
+    input_file = inventory_files[input_format]
+    encoding = txt2xls_core.detect_encoding(input_file)
+    assert txt2xls_core.detect_file_format(input_file, encoding) == input_format
+
+
+@pytest.mark.parametrize('input_format', ['table', 'csv', 'json'])
+def test_three_formats_give_the_same_rows(inventory_files, input_format):
+    rows = list(txt2xls_core.iter_inventory_rows(inventory_files[input_format], None))
+    assert by_name(rows) == EXPECTED
+
+
+def test_csv_keeps_its_column_order_and_parses_install_date_by_name(inventory_files):
+    rows = list(txt2xls_core.iter_inventory_rows(inventory_files['csv'], None))
+    assert rows[0] == ['DisplayName', 'InstallDate', 'DisplayVersion', 'Publisher']
+    # la derniere colonne (Publisher) n'est pas prise pour une date
+    assert rows[1] == ['Firefox', datetime(2023, 7, 4), '115.0', 'Mozilla']
+
+
+def test_json_keeps_its_column_order_and_parses_install_date_by_name(inventory_files):
+    rows = list(txt2xls_core.iter_inventory_rows(inventory_files['json'], None))
+    assert rows[0] == ['Publisher', 'InstallDate', 'DisplayName', 'DisplayVersion']
+    assert rows[2] == ['Igor Pavlov', datetime(2024, 2, 1), '7-Zip', '23.01']
+
+
+def test_keyed_input_without_install_date_has_no_date_column():
+    data = b'[{"DisplayName": "Firefox", "DisplayVersion": "115.0"}]'
+    assert list(txt2xls_core.iter_source_rows(data, None)) == [['DisplayName', 'DisplayVersion'], ['Firefox', '115.0']]
+
+
+def test_csv_short_row_and_empty_date():
+    data = b'"DisplayName","InstallDate","Publisher"\n"Firefox","","Mozilla"\n"7-Zip"\n'
+    rows = list(txt2xls_core.iter_source_rows(data, None))
+    assert rows[1] == ['Firefox', None, 'Mozilla']
+    # une ligne courte est completee a la largeur de l'entete
+    assert rows[2] == ['7-Zip', None, '']
+
+
+def test_csv_long_row():
+    # un separateur en fin de ligne ne donne que des cellules vides en trop
+    data = b'"DisplayName","Publisher"\n"Firefox","Mozilla",\n'
+    assert list(txt2xls_core.iter_source_rows(data, None))[1] == ['Firefox', 'Mozilla']
+    with pytest.raises(ValueError):
+        list(txt2xls_core.iter_source_rows(b'"DisplayName","Publisher"\n"Firefox","Mozilla","115.0"\n', None))
+
+
+def test_json_lines_and_nested_values():
+    data = (b'{"DisplayName": "Firefox", "Tags": ["web", "mozilla"], "InstallDate": "20230704"}\n'
+            b'{"DisplayName": "7-Zip", "Tags": null, "InstallDate": null}\n')
+    rows = list(txt2xls_core.iter_source_rows(data, None))
+    assert rows == [
+        ['DisplayName', 'Tags', 'InstallDate'],
+        ['Firefox', '["web", "mozilla"]', datetime(2023, 7, 4)],
+        ['7-Zip', '', None],
+    ]
+
+
+def test_invalid_json_raises():
+    with pytest.raises(ValueError):
+        list(txt2xls_core.iter_source_rows(b'[{"DisplayName": "Firefox"', None))
+
+
+@pytest.mark.parametrize('input_format', ['table', 'csv', 'json'])
+def test_convert_from_bytes_and_from_path_agree(inventory_files, input_format):
+    input_file = inventory_files[input_format]
+    with open(input_file, 'rb') as f:
+        data = f.read()
+    from_bytes = txt2xls_core.convert(data, output_format='csv')
+    from_path = txt2xls_core.convert(input_file, output_format='csv')
+    assert from_bytes == from_path
+    assert b'04/07/2023' in from_bytes
+
+
+def test_convert_to_a_caller_buffer(tmp_path, inventory_files):
+    buffer = io.BytesIO()
+    with open(inventory_files['csv'], 'rb') as f:
+        assert txt2xls_core.convert(f, buffer) == 2
+    output_file = write_file(tmp_path / 'out.xlsx', buffer.getvalue())
+    sheet = read_sheets(output_file)['Inventaire']
+    assert sheet[0] == ['DisplayName', 'InstallDate', 'DisplayVersion', 'Publisher']
+    assert sheet[1][1] == datetime(2023, 7, 4)
+
+
+def test_convert_rejects_unknown_output_format():
+    with pytest.raises(ValueError):
+        txt2xls_core.convert(b'', output_format='ods')
@@ -0,0 +1,71 @@
+import os               # pour les repertoires de depot et de sortie
+
+import txt2xls_core
+from conftest import HEADER, WIDTHS, format_table, write_file
+
+
+def watch(input_dir, output_dir, expected):
+    '''
+    Surveille le depot jusqu'a 'expected' resultats ; la surveillance s'arrete
+    comme sur Ctrl-C, l'interruption venant de la fonction appelee a chaque resultat
+    '''
+    results = []
+
+    def on_result(result):
+        results.append(result)
+        if len(results) == expected:
+            raise KeyboardInterrupt
+
+    txt2xls_core.watch_directory(input_dir, output_dir, txt2xls_core.DEFAULT_COL_SPECS, jobs=2, use_cache=False,
+                                 settle_time=0, interval=0.05, on_result=on_result)
+    return results
+
+
+def crash_on_purpose(input_file, output_file, col_specs, use_cache=True):
+    '''
+    Conversion qui tue le processus du pool (comme le ferait le manque de memoire)
+    pour les fichiers nommes 'crash*'
+    '''
+    if os.path.basename(input_file).startswith('crash'):
+        os._exit(1)
+    return CONVERT_FILE(input_file, output_file, col_specs, use_cache)
+
+
+CONVERT_FILE = txt2xls_core.convert_file
+
+
+def test_dropped_files_are_converted_and_moved(tmp_path):
+    input_dir = tmp_path / 'depot'
+    input_dir.mkdir()
+    write_file(input_dir / 'pc1.txt', format_table(WIDTHS, HEADER, ['Firefox', '115.0', 'Mozilla', '20230704'],
+                                                   ['7-Zip', '23.01', 'Igor Pavlov', '01/02/2024']))
+    write_file(input_dir / 'vide.txt', '')
+    write_file(input_dir / 'illisible.txt', 'pas un inventaire\n')
+
+    results = {os.path.basename(result['input']): result for result in watch(str(input_dir), str(tmp_path / 'sortie'), 3)}
+
+    assert results['pc1.txt']['status'] == 'ok'
+    assert results['pc1.txt']['rows'] == 2
+    assert os.path.exists(input_dir / txt2xls_core.WATCH_DONE_DIR / 'pc1.txt')
+    # un fichier sans entete ni ligne est en erreur, reste dans le depot et ne produit rien
+    for name in ('vide.txt', 'illisible.txt'):
+        assert results[name]['status'] == 'erreur'
+        assert os.path.exists(input_dir / name)
+    assert sorted(os.listdir(tmp_path / 'sortie')) == ['pc1.xlsx']
+
+
+def test_watch_survives_a_killed_worker(tmp_path, monkeypatch):
+    # les processus du pool sont crees par fork : ils heritent de la conversion remplacee
+    monkeypatch.setattr(txt2xls_core, 'convert_file', crash_on_purpose)
+    input_dir = tmp_path / 'depot'
+    input_dir.mkdir()
+    write_file(input_dir / 'crash.txt', format_table(WIDTHS, HEADER, ['Firefox', '115.0', 'Mozilla', '20230704']))
+
+    results = watch(str(input_dir), str(tmp_path / 'sortie'), txt2xls_core.WATCH_MAX_CRASHES)
+
+    # le fichier est reessaye sur un nouveau pool, puis abandonne dans 'failed'
+    assert [result['status'] for result in results] == ['erreur'] * txt2xls_core.WATCH_MAX_CRASHES
+    assert 'BrokenProcessPool' in results[-1]['error']
+    assert os.path.exists(input_dir / txt2xls_core.WATCH_FAILED_DIR / 'crash.txt')
+    assert not os.path.exists(tmp_path / 'sortie' / 'crash.xlsx')
+
@@ -0,0 +1,81 @@
+import os               # pour la manipulation des fichiers et des repertoires
+import argparse         # pour analyser les arguments de la ligne de commande
+import json             # pour afficher l'etat et les statistiques du serveur
+import sys              # pour le code de retour
+
+# le client ne charge que le protocole : la conversion a lieu dans le serveur
+from txt2xls_daemon import DAEMON_SOCKET, request
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertir un fichier texte en fichier Excel avec le serveur de conversion (txt2xls_daemon.py)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-i", "--input", help="Chemin vers le fichier texte d'entrée")
+    source.add_argument("--health", action="store_true", help="Afficher l'état du serveur")
+    source.add_argument("--stats", action="store_true", help="Afficher la file d'attente et les débits du serveur")
+    parser.add_argument("-o", "--output", help="Chemin vers le fichier Excel de sortie")
+    parser.add_argument("-d", "--delimiter", default=",", help="Délimiteur de la sortie csv (par défaut: virgule)")
+    parser.add_argument("--columns", metavar="DEBUTS", help="Positions de début des colonnes Format-Table séparées par des virgules (ex: 0,63,81,111) ; par défaut le serveur les déduit de la ligne de soulignement '----' de chaque fichier")
+    parser.add_argument("-s", "--stream", action="store_true", help="Accepté pour compatibilité avec txt2xls-v2.py : le serveur convertit toujours en mode flux")
+    parser.add_argument("-f", "--format", choices=["xlsx", "csv"], help="Format de sortie (par défaut: csv si -o se termine par .csv, sinon xlsx)")
+    parser.add_argument("-S", "--socket", default=os.environ.get('TXT2XLS_SOCKET', DAEMON_SOCKET), help="Socket Unix du serveur (par défaut: $TXT2XLS_SOCKET ou %(default)s)")
+    parser.add_argument("--inline", action="store_true", help="Envoyer le contenu du fichier au serveur et recevoir le résultat, pour un serveur qui ne voit pas les mêmes fichiers")
+    parser.add_argument("--no-cache", action="store_true", help="Ne pas utiliser le cache des conversions")
+
+    args = parser.parse_args()
+
+    # sans --columns le serveur les deduit du soulignement de chaque fichier
+    col_specs = None
+    if args.columns:
+        try:
+            starts = sorted({int(start) for start in args.columns.split(',')})
+        except ValueError:
+            parser.error(f"--columns attend des positions entières séparées par des virgules: {args.columns}")
+        col_specs = list(zip(starts, starts[1:] + [None]))
+
+    payload = b''
+    if args.input and args.inline:
+        try:
+            with open(args.input, 'rb') as f:
+                payload = f.read()
+        except OSError as e:
+            print(f"Erreur lors de la conversion: {e}")
+            sys.exit(1)
+
+    try:
+        if args.health or args.stats:
+            response, _ = request(args.socket, {'op': 'health' if args.health else 'stats'}, timeout=5)
+            print(json.dumps(response, indent=2))
+            sys.exit(0 if response.get('status') == 'ok' else 1)
+
+        if not args.output:
+            parser.error("l'argument -o/--output est requis")
+
+        output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'xlsx')
+        options = {'format': output_format, 'delimiter': args.delimiter, 'use_cache': not args.no_cache}
+        if col_specs is not None:
+            options['col_specs'] = col_specs
+
+        # les chemins sont absolus : le serveur ne tourne pas forcement dans le meme repertoire
+        if args.inline:
+            header = {'op': 'convert', 'options': dict(options, name=args.input)}
+            result, content = request(args.socket, header, payload)
+        else:
+            header = {'op': 'convert', 'input': os.path.abspath(args.input), 'output': os.path.abspath(args.output), 'options': options}
+            result, _ = request(args.socket, header)
+    except OSError as e:
+        print(f"Serveur de conversion injoignable sur {args.socket}: {e}")
+        sys.exit(2)
+
+    if result['status'] != 'ok':
+        print(f"Erreur lors de la conversion: {result['error']}")
+        sys.exit(1)
+
+    # en ligne, le resultat revient dans la reponse et est ecrit ici
+    if args.inline:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'wb') as f:
+            f.write(content)
+
+    origin = " (cache)" if result.get('cached') else ""
+    print(f"{result['rows']} lignes insérées dans {args.output}{origin}")
@@ -1,242 +1,183 @@
-import pandas as pd     # pour la manipulation de donnees et la conversion vers Excel
-import os               # pour la manipulation des fichiers et des repertoires
 import argparse         # pour analyser les arguments de la ligne de commande
-import chardet          # pour detecter l'encodage des fichiers texte
-#import shutil           # pour la manipulation des fichiers et des repertoires
-from datetime import datetime
-
-
-def normalize_date(date_str):
-    """
-    Normalise une date au format jj/mm/aaaa.
-    
-    :param date_str: La chaîne de caractères représentant la date.
-    :return: La date normalisée au format jj/mm/aaaa ou une chaîne vide si la date n'est pas valide.
-    """
-    if not date_str.strip():
-        return ""
-
-
-    # Essayer de détecter et convertir les formats connus
-    for fmt in ("%Y%m%d", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(date_str, fmt).strftime("%d/%m/%Y")
-        except ValueError:
-            pass
-    
-    # Si aucun format n'a fonctionné, retourner la chaîne originale
-    return ""
-
-
-def normalize_dates_in_column(column):
-    """
-    Applique la normalisation des dates sur une colonne de données.
-    
-    :param column: La liste des dates à normaliser.
-    :return: La liste des dates normalisées.
-    """
-    colonne = []
-    for i, date in enumerate(column):
-        if i <= 1:                  # donc les 2 premieres lignes
-            colonne.append(date)    # ne sont pas des dates
-        else:
-            colonne.append(normalize_date(date))
-
-    return colonne
-
-
-
-def clear_temp_directory(directory_path):
-    ''' 
-    Cette fonction supprime tous les fichiers du repertoire
-
-    Argument:
-        directory_path -- chemin du repertoire
-    '''
-    try:
-        # si le repertoire existe
-        if os.path.exists(directory_path):
-
-            # on boucle sur tous les fichiers du repertoire
-            for filename in os.listdir(directory_path):
-
-                # on construit le nom de fichier a partir du nom du repertoire
-                file_path = os.path.join(directory_path, filename)
-
-                try:
-                    # si c'est un vrai fichier ou un lien symbolique sur un fichier
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-
-                        # on l'efface
-                        os.unlink(file_path)    
-
-                # si un probleme on leve l'exception
-                except Exception as e:
-                    print(f'Erreur lors de la suppression de {file_path}. Raison: {e}')
-
-        else:
-            print(f'Le répertoire {directory_path} n\'existe pas.')
-
-    except Exception as e:
-        print(f'Erreur lors de la vérification du répertoire {directory_path}. Raison: {e}')
-
-
-def detect_encoding(file_path):
-    ''' 
-    Cette fonction detecte l'encodage d'un fichier en utilisant 'chardet'
-    
-    Argument:
-    file_path -- le chemin du fichier a analyser
-
-    Retourne:
-    l'encodage du fichier
-    '''
-
-    with open(file_path, 'rb') as f:            # Ouvre le fichier binaire en lecture
-        result = chardet.detect(f.read())       # Detecte l'encodage du fichier
-
-    return result['encoding']
-
-
-def read_file_lines(file_path, encoding):
-
-    ''' 
-    Ouvre le fichier en lecture avec le bon encodage et
-    creer une liste avec toutes les lignes
-
-    Argument:
-    --------
-        file_path -- le chemin du fichier a lire
-        encoding  -- l'encodage du fichier
- 
-    Retourne:
-    --------
-        une liste de lignes lu dans le fichier
-    '''
-
-    with open(file_path, 'r', encoding=encoding) as f:
-        lines = f.readlines()       
-
-    return lines
-
-
-def extract_columns(input_file, col_specs):
-    ''' 
-    Cette fonction extrait des colonnes specifiques du fichier texte
-
-    Arguments:
-        input_file --  le chemin vers le fichier texte
-        col_specs  --  numero de la colonne a extraire
-
-    Retourne:
-        la liste des colonnes extraites
-    '''
-    
-    # on recupere l'encodage du fichier texte
-    encoding = detect_encoding(input_file)          
-
-    # on recupere la liste des lignes a partir du fichier texte
-    lines = read_file_lines(input_file, encoding)   
-    
-    # creation d'une liste de sous liste vide qu'il y a d'elements dans col_specs
-    cols = [[] for _ in col_specs]
-
-    # pour chaque ligne dans la liste lignes sauf la second ligne
-    for i, line in enumerate(lines):
-
-        # if i == 1:      # on n evalue pas la seconde ligne du fichier
-        #     continue
-
-        # Pour chacune des 4 colonnes on extrait debut et fin
-        for j, (start, end) in enumerate(col_specs):
-            cols[j].append(line[start:end].strip())
-
-    return cols
-
-
-
-
-
-def save_columns_to_files(columns, output_files):
-    ''' 
-    Cette fonction enregistre dans des fichiers temporaires les colonnes,
-    un fichier par colonne en lisant une ligne dans chaque fichier grace a zip
-
-    Arguments:
-        columns     -- la liste des colonnes
-        output_file -- la liste des noms de fichiers colonne
-    ''' 
-    for col, output_file in zip(columns, output_files):
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(col) + '\n')
-
-
-def merge_columns_to_csv(output_file, col_files, delimiter):
-    ''' 
-    Cette fonction reunit dans un fichier les colonnes,
-    en lisant une ligne dans chaque fichier grace a zip
-
-    Arguments:
-        output_file -- la liste des noms de fichiers colonne
-        output_file -- la liste des fichiers colonnes
-        delimiter   -- le separateur de champ
-    ''' 
-
-    col_data = [read_file_lines(col_file, 'utf-8') for col_file in col_files]
-    with open(output_file, 'w', encoding='utf-8') as f_out:
-        for row in zip(*col_data):
-            f_out.write(delimiter.join(cell.strip() for cell in row) + '\n')
-
-
-def convert_csv_to_excel(input_file, output_file, delimiter="\t"):
-    try:
-        df = pd.read_csv(input_file, delimiter=delimiter, engine='python')
-        df.to_excel(output_file, index=False, engine='xlsxwriter')
-        print(f"Données insérées dans {output_file}")
-    except Exception as e:
-        print(f"Erreur lors de la conversion: {e}")
+import os               # pour distinguer un fichier d'un lot et placer le journal
+import sys              # pour le code de retour
+import time             # pour mesurer la duree des conversions
+
+# toute la conversion est dans le module importable txt2xls_core,
+# ce script n'en est que la ligne de commande
+from txt2xls_core import (
+    ARCHIVE_EXTENSION, BATCH_JOURNAL_NAME, CONVERSION_CACHE_DIR, CONVERSION_CACHE_MAX_SIZE, HOST_COLUMN,
+    NULL_METRICS, SORT_MEMORY_BUDGET, SQLITE_EXTENSIONS, SQLITE_INDEX_COLUMNS, WATCH_DONE_DIR, WATCH_FAILED_DIR,
+    WATCH_SETTLE_TIME, PipelineMetrics, build_catalog, convert_batch, convert_file, convert_text_to_excel_legacy,
+    diff_inventories, evict_conversion_cache, list_batch_inputs, load_to_sqlite, merge_to_excel,
+    print_batch_summary, print_conversion_cache_info, purge_conversion_cache, split_archive_path,
+    watch_directory,
+)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convertir un fichier texte en fichier Excel")
-    parser.add_argument("-i", "--input", required=True, help="Chemin vers le fichier texte d'entrée")
-    parser.add_argument("-o", "--output", required=True, help="Chemin vers le fichier Excel de sortie")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-i", "--input", help="Chemin vers le fichier texte d'entrée")
+    source.add_argument("-b", "--batch", help="Lot de fichiers : répertoire, motif glob ou manifeste (un chemin par ligne)")
+    source.add_argument("-w", "--watch", metavar="REPERTOIRE", help=f"Surveiller un répertoire de dépôt et convertir chaque inventaire qui y arrive (.txt, .csv, .json, éventuellement .gz ou .xz) dans le répertoire -o (originaux déplacés dans {WATCH_DONE_DIR}/ ou {WATCH_FAILED_DIR}/)")
+    source.add_argument("--diff", nargs=2, metavar=("ANCIEN", "NOUVEAU"), help="Comparer deux relevés (un fichier, un répertoire ou un motif glob chacun) et écrire dans -o les logiciels ajoutés, supprimés ou mis à jour sur chaque machine")
+    source.add_argument("--cache-info", action="store_true", help="Afficher le contenu du cache des conversions")
+    source.add_argument("--cache-purge", action="store_true", help="Vider le cache des conversions")
+    parser.add_argument("-o", "--output", help="Chemin vers le fichier Excel de sortie (répertoire de sortie en mode lot)")
     parser.add_argument("-d", "--delimiter", default="\t", help="Délimiteur utilisé dans le fichier texte (par défaut: tabulation)")
+    parser.add_argument("--columns", metavar="DEBUTS", help="Positions de début des colonnes Format-Table séparées par des virgules (ex: 0,63,81,111) ; par défaut elles sont déduites de la ligne de soulignement '----' de chaque fichier")
+    parser.add_argument("-s", "--stream", action="store_true", help="Conversion en une seule passe, sans fichiers temporaires")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Nombre de processus en mode lot, ou pour analyser un seul gros fichier en mode flux (par défaut: nombre de coeurs en mode lot, 1 en mode flux)")
+    parser.add_argument("-m", "--merge", action="store_true", help="En mode lot, réunir tous les inventaires dans un seul classeur -o")
+    parser.add_argument("--resume", action="store_true", help="En mode lot, sauter les fichiers que le journal donne déjà convertis et inchangés")
+    parser.add_argument("--journal", metavar="FICHIER", help=f"Journal du mode lot (par défaut: {BATCH_JOURNAL_NAME} dans le répertoire de sortie)")
+    parser.add_argument("--catalog", action="store_true", help="Construire dans le classeur -o le catalogue logiciel du lot : postes, installations, dates et machines par logiciel, et une feuille par éditeur")
+    parser.add_argument("--sheet-per-host", action="store_true", help="Avec --merge, une feuille par machine au lieu d'une feuille commune")
+    parser.add_argument("--sort", action="store_true", help="Trier les lignes par DisplayName puis DisplayVersion (ordre des versions), avec un tri externe au-delà de --sort-memory")
+    parser.add_argument("--sort-memory", type=int, default=SORT_MEMORY_BUDGET // 2**20, metavar="MO", help="Mémoire du tri en Mo par processus, au-delà les lignes triées sont déversées sur disque (par défaut: %(default)s)")
+    parser.add_argument("-f", "--format", choices=["xlsx", "sqlite"], help="Format de sortie (par défaut: sqlite si -o se termine par .db, .sqlite ou .sqlite3, sinon xlsx)")
+    parser.add_argument("--index", action="store_true", help="En SQLite, indexer les colonnes " + ", ".join((HOST_COLUMN,) + SQLITE_INDEX_COLUMNS))
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_TIME, help="Avec --watch, durée en secondes pendant laquelle un fichier ne doit plus changer avant d'être converti (par défaut: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Ne pas utiliser le cache des conversions")
+    parser.add_argument("--cache-size", type=int, default=CONVERSION_CACHE_MAX_SIZE // 2**20, help="Taille maximale du cache des conversions en Mo (par défaut: %(default)s)")
+    parser.add_argument("--metrics", metavar="FICHIER", help="Écrire les mesures par étape (durée, CPU, octets, lignes, mémoire) dans ce fichier ('-' pour la sortie standard)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default="json", help="Format des mesures (par défaut: %(default)s)")
+    parser.add_argument("--profile", metavar="ETAPE", help="Profiler une étape avec cProfile (slice, normalize, xlsx_write...) dans ETAPE.prof")
     
     args = parser.parse_args()
     
     input_text_file_path = args.input
     output_excel_file_path = args.output
     delimiter = args.delimiter
-    
-    # on cree le repertoire temporaire
-    temp_dir = os.path.join('data', 'tmp')
-    os.makedirs(temp_dir, exist_ok=True)
-
-    # liste de tuples, ou chaque tuple specifie le debut et la fin des positions des colonnes a extraire
-    col_specs = [(0, 63), (63, 81), (81, 111), (111, None)]
-
-    # liste de tuples, ou chaque tuple specifie le nom du fichier colonne temporaire
-    col_files = [os.path.join(temp_dir, f"col{i+1}.txt") for i in range(4)]
-
-    # on sauvegarde la 1er ligne
-    premiere_ligne = None
-    
-    # on extrait les colonnes et on recupere une liste des colonnes
-    columns = extract_columns(input_text_file_path, col_specs)
+    use_cache = not args.no_cache
+    cache_size = args.cache_size * 2**20
 
-    # Normaliser la dernière colonne
-    columns[-1] = normalize_dates_in_column(columns[-1])
-
-    # for column in columns[-1]:
-    #     print(column)
+    # liste de tuples, ou chaque tuple specifie le debut et la fin des positions des colonnes a extraire ;
+    # sans --columns elles sont deduites du soulignement de chaque fichier (None)
+    col_specs = None
+    if args.columns:
+        try:
+            starts = sorted({int(start) for start in args.columns.split(',')})
+        except ValueError:
+            parser.error(f"--columns attend des positions entières séparées par des virgules: {args.columns}")
+        col_specs = list(zip(starts, starts[1:] + [None]))
+
+    if args.cache_info:
+        print_conversion_cache_info(cache_size)
+        sys.exit(0)
+
+    if args.cache_purge:
+        purge_conversion_cache()
+        print(f"Cache {CONVERSION_CACHE_DIR} vidé")
+        sys.exit(0)
+
+    if not output_excel_file_path:
+        parser.error("l'argument -o/--output est requis")
+
+    # les mesures ne coutent rien quand elles sont desactivees
+    if args.metrics or args.profile:
+        metrics = PipelineMetrics(args.profile)
+    else:
+        metrics = NULL_METRICS
+    exit_code = 0
+    start = time.perf_counter()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'sqlite' if output_excel_file_path.lower().endswith(SQLITE_EXTENSIONS) else 'xlsx'
+
+    if args.resume and not (args.batch and not args.merge and not args.catalog and output_format == 'xlsx'):
+        parser.error("--resume ne s'applique qu'au mode lot (-b) vers un répertoire de classeurs")
+    if args.sort and not ((args.batch or args.stream) and not args.catalog and output_format == 'xlsx'):
+        parser.error("--sort ne s'applique qu'au mode flux (-s) ou au mode lot (-b) vers des classeurs")
+    sort_memory = args.sort_memory * 2**20
+
+    # la surveillance tourne jusqu'a Ctrl-C ou SIGTERM
+    if args.watch:
+        if output_format != 'xlsx':
+            parser.error("--watch ne produit que des fichiers Excel")
+        print(f"Surveillance de {args.watch} (Ctrl-C pour arrêter)", flush=True)
+        # un fichier en erreur est range dans failed/ : il n'arrete pas le service
+        results = watch_directory(args.watch, output_excel_file_path, col_specs, args.jobs, use_cache, args.settle,
+                                  cache_size=cache_size)
+        print_batch_summary(results, time.perf_counter() - start)
+
+    # les differences vont dans un classeur, ou dans la table 'differences' d'une base SQLite
+    elif args.diff:
+        # un fichier, eventuellement compresse, ou un membre d'archive est un releve ;
+        # un repertoire, un motif glob ou une archive zip est un lot
+        single = [
+            split_archive_path(path)[1] is not None or os.path.isfile(path) and not path.lower().endswith(ARCHIVE_EXTENSION)
+            for path in args.diff
+        ]
+        old_inputs, new_inputs = ([path] if one else list_batch_inputs(path) for path, one in zip(args.diff, single))
+        jobs = (args.jobs or 1) if len(old_inputs) == len(new_inputs) == 1 else 1
+        results, counts, skipped = diff_inventories(old_inputs, new_inputs, output_excel_file_path, col_specs, jobs, metrics)
+        print_batch_summary(results, time.perf_counter() - start)
+        print(f"{counts['ajoute']} ajouts, {counts['supprime']} suppressions, {counts['modifie']} mises à jour dans {output_excel_file_path}")
+        if skipped:
+            print(f"{len(skipped)} machines non comparées (absentes d'un relevé ou en erreur): {', '.join(skipped)}")
+        exit_code = 1 if any(result['status'] != 'ok' for result in results) else 0
+
+    # le catalogue agrege tout le lot en un seul passage, un processus par fichier
+    elif args.catalog:
+        if output_format != 'xlsx':
+            parser.error("--catalog ne produit qu'un classeur Excel")
+        inputs = list_batch_inputs(args.batch) if args.batch else [input_text_file_path]
+        results = build_catalog(inputs, output_excel_file_path, col_specs, args.jobs, metrics)
+        print_batch_summary(results, time.perf_counter() - start)
+        print(f"Catalogue écrit dans {output_excel_file_path}")
+        exit_code = 1 if any(result['status'] != 'ok' for result in results) else 0
+
+    # en SQLite toutes les lignes, d'un fichier ou d'un lot, vont dans une seule table
+    elif output_format == 'sqlite':
+        inputs = list_batch_inputs(args.batch) if args.batch else [input_text_file_path]
+        jobs = (args.jobs or 1) if len(inputs) == 1 else 1
+        results = load_to_sqlite(inputs, output_excel_file_path, col_specs, args.index, jobs, metrics)
+        print_batch_summary(results, time.perf_counter() - start)
+        exit_code = 1 if any(result['status'] != 'ok' for result in results) else 0
+
+    # en mode lot chaque fichier est converti en mode flux par un processus du pool
+    elif args.batch:
+        inputs = list_batch_inputs(args.batch)
+        if args.merge:
+            results = merge_to_excel(inputs, output_excel_file_path, col_specs, args.sheet_per_host, use_cache, metrics,
+                                     args.sort, sort_memory)
+        else:
+            journal_file = args.journal or os.path.join(output_excel_file_path, BATCH_JOURNAL_NAME)
+            results = convert_batch(inputs, output_excel_file_path, col_specs, args.jobs, use_cache, metrics,
+                                    journal_file, args.resume, args.sort, sort_memory)
+        evict_conversion_cache(cache_size)
+        print_batch_summary(results, time.perf_counter() - start)
+        exit_code = 1 if any(result['status'] != 'ok' for result in results) else 0
+
+    # en mode flux on ecrit directement le fichier Excel
+    elif args.stream:
+        result = convert_file(input_text_file_path, output_excel_file_path, col_specs, use_cache, metrics, args.jobs or 1,
+                              args.sort, sort_memory)
+        evict_conversion_cache(cache_size)
+        if result['status'] != 'ok':
+            print(f"Erreur lors de la conversion: {result['error']}")
+            exit_code = 1
+        else:
+            origin = " (cache)" if result['cached'] else ""
+            print(f"{result['rows']} lignes insérées dans {output_excel_file_path}{origin}")
 
-    # on sauve les colonnes dans des fichiers temporaires
-    save_columns_to_files(columns, col_files)
-    
-    output_csv_file = os.path.join(temp_dir, 'fichier.csv')
-    merge_columns_to_csv(output_csv_file, col_files, delimiter)
-    
-    convert_csv_to_excel(output_csv_file, output_excel_file_path, delimiter)
-    
-    #clear_temp_directory(temp_dir)
+    else:
+        try:
+            convert_text_to_excel_legacy(input_text_file_path, output_excel_file_path, col_specs, delimiter, metrics)
+            print(f"Données insérées dans {output_excel_file_path}")
+        except Exception as e:
+            print(f"Erreur lors de la conversion: {e}")
+            exit_code = 1
+
+    if metrics.enabled:
+        metrics.add('total', calls=1, seconds=time.perf_counter() - start, cpu_seconds=time.process_time())
+        metrics.sample_memory(metrics.get('total'))
+        if args.metrics:
+            metrics.write(args.metrics, args.metrics_format)
+        if args.profile:
+            metrics.write_profile(f"{args.profile}.prof")
+
+    sys.exit(exit_code)
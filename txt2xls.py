@@ -1,9 +1,10 @@
-import pandas as pd
+import xlsxwriter
 import os
 import argparse
-import chardet
 import shutil
 
+from txt2xls_core import detect_encoding
+
 
 
 def clear_temp_directory(directory_path):
@@ -39,14 +40,20 @@ def clear_temp_directory(directory_path):
 
 
 
-def fin_ligne(input_file):
+def detecter_encodage(input_file):
+    """
+    Detecte l'encodage du fichier une seule fois, avec la detection de txt2xls_core :
+    BOM, echantillon borne analyse par chardet et cache persistant des encodages.
+
+    :param input_file: Nom du fichier texte en entrée
+    :return: l'encodage du fichier
+    """
+    return detect_encoding(input_file)
+
+
+
+def fin_ligne(input_file, encoding):
     try:
-        # Detecter l'encodage du fichier
-        with open(input_file, 'rb') as f:
-            result = chardet.detect(f.read())
-            encoding = result['encoding']
-            print(result)
-            #print(result['encoding'])
 
         # Ouvrir le fichier d'entrée en lecture avec l'encodage detecte
         with open(input_file, 'r', encoding=encoding) as f_in:
@@ -68,7 +75,7 @@ def fin_ligne(input_file):
 
     
 
-def extraire_colonne(input_file, output_file, debut, fin):
+def extraire_colonne(input_file, output_file, debut, fin, encoding):
     """
     Lit un fichier texte ligne par ligne et conserve un ensemble de caracteres contigues.
     
@@ -76,13 +83,9 @@ def extraire_colonne(input_file, output_file, debut, fin):
     :param output_file: Nom du fichier texte en sortie
     :param debut: premiere position du caractere a conserver
     :param fin: derniere position du caractere a conserver
+    :param encoding: encodage du fichier en entrée
     """
     try:
-        # Detecter l'encodage du fichier
-        with open(input_file, 'rb') as f:
-            result = chardet.detect(f.read())
-            encoding = result['encoding']
-
         # Ouvrir le fichier d'entrée en lecture avec l'encodage detecte
         with open(input_file, 'r', encoding=encoding) as f_in:
         
@@ -195,44 +198,51 @@ def reconstruire_csv(fichier_col1, fichier_col2, fichier_col3, fichier_col4, fic
 
 
 def convert_cvs_to_excel(input_file, output_file, delimiter="\t"):
+    """
+    Ecrit le fichier csv dans un fichier Excel ligne par ligne, en mode 'constant_memory' :
+    aucune ligne n'est gardee en memoire une fois ecrite. La largeur des colonnes est
+    suivie pendant l'ecriture pour les ajuster a la fin, l'entete est mise en forme,
+    filtrable et figee.
+
+    :param input_file: Nom du fichier csv en entrée
+    :param output_file: Nom du fichier Excel en sortie
+    :param delimiter: Délimiteur utilisé dans le fichier csv
+    """
     try:
-        ###########
-        # Lecture #
-        ###########
-
-        # # Lire le fichier texte en DataFrame avec le delimiteur specifie
-        # df = pd.read_csv(input_file, delimiter=delimiter, engine='python')
+        workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+        worksheet = workbook.add_worksheet()
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#D9E1F2', 'bottom': 1})
+        largeurs = []
+        nb_lignes = 0
 
-        # Lire le fichier texte ligne par ligne avec readlines()
+        # Lire le fichier texte ligne par ligne
         with open(input_file, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        
-        # Diviser chaque ligne en colonnes en utilisant le délimiteur
-        data = [line.strip().split(delimiter) for line in lines]
-
-
-
-        #print(data)
-
-
-
-
-        # Créer un DataFrame à partir des données
-        df = pd.DataFrame(data[1:], columns=data[0])
-
-        print(df)
-
-
-
-
-
-
-        ############
-        # Ecriture #
-        ############
-
-        # Sauvegarder le DataFrame dans un fichier Excel
-        df.to_excel(output_file, index=False, engine='xlsxwriter')
+            for line in file:
+                if not line.strip():
+                    continue
+
+                # Diviser la ligne en colonnes en utilisant le délimiteur
+                cellules = line.strip().split(delimiter)
+
+                # la premiere ligne est l'entete
+                worksheet.write_row(nb_lignes, 0, cellules, header_format if nb_lignes == 0 else None)
+                nb_lignes += 1
+
+                # on retient la plus grande largeur de chaque colonne
+                for i, cellule in enumerate(cellules):
+                    if i >= len(largeurs):
+                        largeurs.append(len(cellule))
+                    else:
+                        largeurs[i] = max(largeurs[i], len(cellule))
+
+        # on ajuste les colonnes, on filtre et on fige l'entete
+        for i, largeur in enumerate(largeurs):
+            worksheet.set_column(i, i, min(largeur + 3, 80))
+        if nb_lignes:
+            worksheet.autofilter(0, 0, nb_lignes - 1, len(largeurs) - 1)
+            worksheet.freeze_panes(1, 0)
+
+        workbook.close()
         
         print(f"Données insérées dans {output_file}")
 
@@ -264,13 +274,16 @@ if __name__ == "__main__":
     col4 = os.path.join("data", "tmp", 'col4.txt')
 
     
-    eol = fin_ligne(input_fichier_text)
+    # on detecte l'encodage une seule fois pour toutes les etapes
+    encodage = detecter_encodage(input_fichier_text)
+
+    eol = fin_ligne(input_fichier_text, encodage)
     
 
-    extraire_colonne(input_fichier_text, col1, 0, 63)
-    extraire_colonne(input_fichier_text, col2, 63, 81)
-    extraire_colonne(input_fichier_text, col3, 81, 111)
-    extraire_colonne(input_fichier_text, col4, 111, eol)
+    extraire_colonne(input_fichier_text, col1, 0, 63, encodage)
+    extraire_colonne(input_fichier_text, col2, 63, 81, encodage)
+    extraire_colonne(input_fichier_text, col3, 81, 111, encodage)
+    extraire_colonne(input_fichier_text, col4, 111, eol, encodage)
 
 
 
@@ -0,0 +1,3786 @@
+import os               # pour la manipulation des fichiers et des repertoires
+import codecs           # pour les BOM et le decodage incremental
+import json             # pour le cache des encodages detectes
+import csv              # pour relire le fichier csv ligne par ligne
+import mmap             # pour projeter le fichier texte en memoire
+import shutil           # pour la manipulation des fichiers et des repertoires
+import sys              # pour les mesures ecrites sur la sortie standard
+import io               # pour convertir en memoire, sans fichier
+import glob             # pour lister les fichiers d'un lot
+import tempfile         # pour un repertoire temporaire propre a chaque execution
+import time             # pour mesurer la duree des conversions
+import hashlib          # pour l'empreinte du contenu des fichiers (cache des conversions)
+import contextlib       # pour les etapes mesurees
+try:
+    import resource     # pour la memoire maximale (RSS), absent sous Windows
+except ImportError:
+    resource = None
+from datetime import datetime
+import functools        # pour memoriser les dates deja analysees
+import itertools        # pour remettre la premiere ligne en tete du flux
+import collections      # pour les plages en cours d'analyse parallele
+import array            # pour les codes des colonnes encodees par dictionnaire
+import operator         # pour extraire les colonnes de la cle d'un logiciel
+import heapq            # pour fusionner les series triees du tri externe
+import pickle           # pour deverser les series du tri externe sur disque
+import re               # pour decouper les numeros de version
+import fnmatch          # pour les fichiers surveilles du repertoire de depot
+import signal           # pour arreter proprement la surveillance
+
+# les modules longs a charger (pandas, numpy, chardet, xlsxwriter, sqlite3,
+# concurrent.futures...) sont importes dans les fonctions qui s'en servent :
+# '--help' ou la conversion d'un petit fichier ne paient que ce qu'ils utilisent
+
+
+# nombre maximum d'octets analyses par 'chardet' pour detecter l'encodage, et nombre
+# d'echantillons parcourus au plus pour trouver autre chose que de l'ASCII
+ENCODING_SAMPLE_SIZE = 64 * 1024
+ENCODING_CHUNK_SIZE = 4096
+ENCODING_ASCII_SKIP_SAMPLES = 4
+
+# taille des blocs lus lors du decodage
+DECODE_CHUNK_SIZE = 1024 * 1024
+
+# formats des dates dans le fichier texte et format des cellules date Excel ;
+# Excel ne represente pas les dates anterieures au 01/01/1900 (00010101...) :
+# elles sont ecrites en texte
+DATE_FORMATS = ("%Y%m%d", "%d/%m/%Y")
+EXCEL_DATE_FORMAT = 'dd/mm/yyyy'
+EXCEL_MIN_DATE = datetime(1900, 1, 1)
+
+# nombre de dates distinctes memorisees
+DATE_CACHE_SIZE = 65536
+
+# taille des blocs du decoupage vectorise des colonnes de largeur fixe
+FIXED_WIDTH_BLOCK_SIZE = 1024 * 1024
+
+# moteur leger pour les petits fichiers : decoupage ligne par ligne et dates
+# analysees une a une, sans numpy ni pandas dont l'import coute plus cher
+# que la conversion elle-meme (taille en octets, nombre de dates)
+LIGHT_ENGINE_MAX_SIZE = 1024 * 1024
+LIGHT_ENGINE_MAX_ROWS = 20000
+
+# analyse parallele d'un seul fichier : taille minimale d'une plage
+# et nombre de plages par processus (pour equilibrer la charge)
+PARALLEL_MIN_RANGE_SIZE = 4 * 1024 * 1024
+PARALLEL_RANGES_PER_JOB = 4
+
+# nombre maximum de lignes d'une feuille Excel
+EXCEL_MAX_ROWS = 1048576
+
+# style de l'entete et largeur maximale des colonnes des classeurs Excel
+EXCEL_HEADER_FORMAT = {'bold': True, 'bg_color': '#D9E1F2', 'bottom': 1}
+EXCEL_MAX_COLUMN_WIDTH = 80
+
+# entete de la colonne ajoutee quand plusieurs inventaires sont reunis
+HOST_COLUMN = 'Host'
+
+# reunion d'un lot : les lignes d'un fichier sont mises de cote jusqu'a la fin de sa lecture,
+# par paquets, en memoire jusqu'a cette taille puis dans un fichier temporaire
+MERGE_SPOOL_SIZE = 64 * 2**20
+MERGE_CHUNK_ROWS = 1000
+
+# fichiers pris en compte quand un lot est un repertoire
+BATCH_PATTERNS = ('*.txt', '*.csv', '*.json')
+
+# formats d'entree reconnus sur le debut du contenu : sortie Format-Table (largeur fixe),
+# Export-Csv (entete '#TYPE' eventuelle, separateur deduit de l'entete) et ConvertTo-Json
+INPUT_FORMAT_SAMPLE_SIZE = 8 * 1024
+CSV_TYPE_PREFIX = '#TYPE'
+CSV_DELIMITERS = (',', ';', '\t', '|')
+JSON_SEPARATORS = ' \t\r\n\ufeff[],'
+
+# entrees compressees, lues en flux sans etre decompressees sur disque ;
+# une archive zip est un lot dont chaque membre ('releves.zip/pc1.txt') est une entree
+COMPRESSED_EXTENSIONS = ('.gz', '.xz')
+ARCHIVE_EXTENSION = '.zip'
+
+# surveillance d'un repertoire de depot : intervalle entre deux parcours,
+# duree pendant laquelle un fichier ne doit plus changer avant d'etre converti
+# (secondes) et sous-repertoires ou sont deplaces les originaux ; un fichier dont
+# la conversion a tue un processus du pool est reessaye avant d'aller dans 'failed'
+WATCH_INTERVAL = 1.0
+WATCH_SETTLE_TIME = 2.0
+WATCH_DONE_DIR = 'done'
+WATCH_FAILED_DIR = 'failed'
+WATCH_MAX_CRASHES = 2
+
+# positions (debut, fin) des colonnes DisplayName, DisplayVersion, Publisher
+# et InstallDate de la sortie Format-Table, quand elles ne peuvent pas etre
+# deduites de la ligne de soulignement du fichier (voir 'detect_layout')
+DEFAULT_COL_SPECS = [(0, 63), (63, 81), (81, 111), (111, None)]
+
+# detection des colonnes de Format-Table : octets lus au debut du fichier et nombre
+# de lignes de donnees dont l'occupation verifie les colonnes deduites du soulignement ;
+# les colonnes sont memorisees par couple (entete, soulignement)
+LAYOUT_SAMPLE_SIZE = 16 * 1024
+LAYOUT_SAMPLE_ROWS = 64
+_layout_cache = {}
+
+# sortie SQLite : table des inventaires, colonne ajoutee pour les chargements
+# de plusieurs fichiers, colonnes indexees avec --index et taille des paquets d'insertion
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+SQLITE_TABLE = 'inventaire'
+SQLITE_SOURCE_COLUMN = 'Source'
+SQLITE_INDEX_COLUMNS = ('DisplayName', 'Publisher')
+SQLITE_BATCH_SIZE = 10000
+
+# tri des sorties (--sort) : memoire maximale des lignes gardees avant d'etre
+# deversees en series triees sur disque, taille des paquets de lignes
+# ecrits dans une serie et nombre de numeros de version analyses memorises
+SORT_MEMORY_BUDGET = 256 * 2**20
+SORT_CHUNK_ROWS = 1000
+SORT_KEY_CACHE_SIZE = 65536
+
+# comparaison de deux inventaires : colonnes qui identifient un logiciel sur une machine,
+# colonne de la version, colonnes ajoutees a la sortie et table de la sortie SQLite
+DIFF_KEY_COLUMNS = ('DisplayName', 'Publisher')
+DIFF_VERSION_COLUMN = 'DisplayVersion'
+DIFF_CHANGE_COLUMN = 'Changement'
+DIFF_OLD_VERSION_COLUMN = 'AncienneVersion'
+DIFF_TABLE = 'differences'
+
+# catalogue du parc : colonnes qui identifient un logiciel, entetes des feuilles
+# du catalogue et des editeurs, et nombre maximum de caracteres d'une cellule Excel
+# (la liste des machines d'un logiciel tres repandu est tronquee)
+CATALOG_KEY_COLUMNS = ('DisplayName', 'DisplayVersion', 'Publisher')
+CATALOG_HEADER = list(CATALOG_KEY_COLUMNS) + ['Postes', 'Installations', 'PremiereInstallation', 'DerniereInstallation', 'Machines']
+PUBLISHER_HEADER = ['Publisher', 'Logiciels', 'Versions', 'Postes', 'Installations', 'PremiereInstallation', 'DerniereInstallation']
+EXCEL_MAX_CELL_LENGTH = 32767
+
+# repertoire des caches persistants : $TXT2XLS_CACHE_DIR, sinon le cache de l'utilisateur
+# ($XDG_CACHE_HOME, %LOCALAPPDATA% sous Windows, ~/.cache), jamais le repertoire courant,
+# pour qu'un lancement depuis n'importe ou retrouve le meme cache
+CACHE_DIR = os.environ.get('TXT2XLS_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'txt2xls',
+)
+
+# fichier du cache persistant des encodages
+ENCODING_CACHE_FILE = os.path.join(CACHE_DIR, 'encodings.jsonl')
+_encoding_cache = {}
+
+# journal d'un lot, dans le repertoire de sortie : une ligne JSON par fichier traite
+BATCH_JOURNAL_NAME = 'txt2xls-journal.jsonl'
+
+# cache des conversions, indexe par l'empreinte du contenu et les options
+CONVERSION_CACHE_DIR = os.path.join(CACHE_DIR, 'conversions')
+CONVERSION_CACHE_MAX_SIZE = 1024 * 2**20
+CONVERSION_CACHE_VERSION = 3
+
+# marques d'ordre des octets, l'UTF-32 doit etre teste avant l'UTF-16
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str):
+    """
+    Convertit une date texte dans un des formats connus en datetime.
+    Le resultat est memorise : une valeur deja vue n'est jamais reanalysee.
+    
+    :param date_str: La chaîne de caractères représentant la date.
+    :return: La date ou None si la date n'est pas valide.
+    """
+    if not date_str.strip():
+        return None
+
+    # Essayer de détecter et convertir les formats connus
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            pass
+
+    return None
+
+
+def normalize_date(date_str):
+    """
+    Normalise une date au format jj/mm/aaaa.
+    
+    :param date_str: La chaîne de caractères représentant la date.
+    :return: La date normalisée au format jj/mm/aaaa ou une chaîne vide si la date n'est pas valide.
+    """
+    date = parse_date(date_str)
+    if date is None:
+        return ""
+
+    return date.strftime("%d/%m/%Y")
+
+
+def parse_dates(values, date_format=None):
+    """
+    Convertit une liste de dates texte en une seule fois : les valeurs distinctes
+    sont analysees une seule fois par pandas avec des formats explicites,
+    puis le resultat est reporte sur chaque ligne.
+    
+    :param values: La liste des dates texte.
+    :param date_format: Si indique, les dates sont rendues en texte dans ce format.
+    :return: La liste des dates (datetime ou None, texte ou chaîne vide si date_format).
+    """
+    # peu de dates : les analyser une a une coute moins que d'importer pandas
+    if len(values) < LIGHT_ENGINE_MAX_ROWS:
+        dates = [parse_date(value) for value in values]
+        if date_format is None:
+            return dates
+        return [date.strftime(date_format) if date else "" for date in dates]
+
+    import numpy as np      # importes a la demande, longs a charger
+    import pandas as pd     # pour analyser les dates en une seule fois
+
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna().to_numpy()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+
+    distinct = []
+    for value, date in zip(uniques, parsed):
+        # les dates hors des limites de pandas sont confiees a strptime
+        date = parse_date(value) if pd.isna(date) else date.to_pydatetime()
+        if date_format is not None:
+            date = date.strftime(date_format) if date else ""
+        distinct.append(date)
+
+    return np.array(distinct + [None], dtype=object)[codes].tolist()
+
+
+def normalize_dates_in_column(column):
+    """
+    Applique la normalisation des dates sur une colonne de données.
+    
+    :param column: La liste (ou la colonne encodee) des dates à normaliser.
+    :return: La liste (ou la colonne encodee) des dates normalisées.
+    """
+    # une colonne encodee n'analyse que ses valeurs distinctes
+    if isinstance(column, DictionaryColumn):
+        return column.map_values(lambda values: parse_dates(values, "%d/%m/%Y"), start=2)
+
+    # les 2 premieres lignes ne sont pas des dates
+    return column[:2] + parse_dates(column[2:], "%d/%m/%Y")
+
+
+
+def clear_temp_directory(directory_path):
+    ''' 
+    Cette fonction supprime tous les fichiers du repertoire
+
+    Argument:
+        directory_path -- chemin du repertoire
+    '''
+    try:
+        # si le repertoire existe
+        if os.path.exists(directory_path):
+
+            # on boucle sur tous les fichiers du repertoire
+            for filename in os.listdir(directory_path):
+
+                # on construit le nom de fichier a partir du nom du repertoire
+                file_path = os.path.join(directory_path, filename)
+
+                try:
+                    # si c'est un vrai fichier ou un lien symbolique sur un fichier
+                    if os.path.isfile(file_path) or os.path.islink(file_path):
+
+                        # on l'efface
+                        os.unlink(file_path)    
+
+                # si un probleme on leve l'exception
+                except Exception as e:
+                    print(f'Erreur lors de la suppression de {file_path}. Raison: {e}')
+
+        else:
+            print(f'Le répertoire {directory_path} n\'existe pas.')
+
+    except Exception as e:
+        print(f'Erreur lors de la vérification du répertoire {directory_path}. Raison: {e}')
+
+
+def split_archive_path(path):
+    ''' 
+    Separe le chemin d'un membre d'archive zip, ecrit comme un fichier d'un
+    repertoire qui serait l'archive ('releves.zip/pc1/scanpc.txt')
+
+    Retourne:
+        un tuple (chemin de l'archive, nom du membre) ou (chemin, None)
+    '''
+    path = os.fspath(path)
+    lower = path.lower()
+    start = 0
+    while True:
+        i = lower.find(ARCHIVE_EXTENSION, start)
+        if i < 0:
+            return path, None
+        end = i + len(ARCHIVE_EXTENSION)
+        if end < len(path) and path[end] in (os.sep, '/') and os.path.isfile(path[:end]):
+            return path[:end], path[end + 1:].replace(os.sep, '/')
+        start = end
+
+
+def is_compressed_input(path):
+    ''' 
+    Indique si une entree est lue en flux decompresse (.gz, .xz, membre
+    d'archive zip) : elle ne peut pas etre projetee en memoire ni decoupee en plages
+    '''
+    return os.fspath(path).lower().endswith(COMPRESSED_EXTENSIONS) or split_archive_path(path)[1] is not None
+
+
+def open_input(path):
+    ''' 
+    Ouvre une entree en lecture binaire : un fichier, un fichier .gz ou .xz
+    decompresse a la volee, ou un membre d'archive zip lu sans extraction
+
+    Retourne:
+        un flux binaire
+    '''
+    archive, member = split_archive_path(path)
+    if member is not None:
+        import zipfile          # importe a la demande
+        # le membre garde l'archive ouverte jusqu'a sa propre fermeture
+        with zipfile.ZipFile(archive) as z:
+            return z.open(member)
+
+    lower = archive.lower()
+    if lower.endswith(ARCHIVE_EXTENSION):
+        raise ValueError(f"{path} est une archive : la convertir en lot (-b) ou designer un membre ({path}/fichier.txt)")
+    if lower.endswith('.gz'):
+        import gzip             # importe a la demande
+        return gzip.open(path, 'rb')
+    if lower.endswith('.xz'):
+        import lzma             # importe a la demande
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def input_size(path):
+    ''' 
+    Taille d'une entree, pour les mesures et le choix du moteur de decoupage :
+    la taille decompressee d'un membre d'archive zip (connue sans le lire),
+    la taille sur disque sinon, compressee pour un fichier .gz ou .xz
+    '''
+    archive, member = split_archive_path(path)
+    if member is None:
+        return os.path.getsize(path)
+
+    import zipfile              # importe a la demande
+    with zipfile.ZipFile(archive) as z:
+        return z.getinfo(member).file_size
+
+
+def input_name(path):
+    ''' 
+    Le chemin d'une entree tel qu'il sert aux noms des sorties et des machines :
+    sans extension de compression (pc1.txt.gz -> pc1.txt), une archive zip
+    etant vue comme un repertoire (releves.zip/pc1.txt -> releves/pc1.txt)
+    '''
+    archive, member = split_archive_path(path)
+    if member is not None:
+        return os.path.join(os.path.splitext(archive)[0], *member.split('/'))
+
+    root, extension = os.path.splitext(os.fspath(path))
+    return root if extension.lower() in COMPRESSED_EXTENSIONS else os.fspath(path)
+
+
+def is_batch_input(name):
+    ''' 
+    Indique si un nom de fichier est celui d'un inventaire a convertir,
+    eventuellement compresse (scanpc.txt, scanpc.csv, scanpc.json.gz...)
+    '''
+    return any(fnmatch.fnmatch(input_name(name), pattern) for pattern in BATCH_PATTERNS)
+
+
+def list_archive_members(archive):
+    ''' 
+    Liste les inventaires d'une archive zip, sans l'extraire
+
+    Retourne:
+        la liste des chemins des membres ('releves.zip/pc1/scanpc.txt')
+    '''
+    import zipfile              # importe a la demande
+    with zipfile.ZipFile(archive) as z:
+        names = [name for name in z.namelist() if not name.endswith('/')]
+
+    return [os.path.join(archive, *name.split('/')) for name in names if is_batch_input(name.rsplit('/', 1)[-1])]
+
+
+def detect_bom(head):
+    ''' 
+    Cherche une marque d'ordre des octets (BOM) au debut du fichier.
+    PowerShell ecrit en UTF-16LE avec BOM lors d'une redirection '>'
+
+    Argument:
+        head -- les premiers octets du fichier
+
+    Retourne:
+        l'encodage correspondant au BOM ou None
+    '''
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    return None
+
+
+def detect_stream_encoding(f, sample_size=ENCODING_SAMPLE_SIZE):
+    ''' 
+    Detecte l'encodage d'un flux binaire sans le lire en entier :
+    le BOM est utilise s'il existe, sinon le detecteur incremental de 'chardet'
+    est alimente bloc par bloc jusqu'a ce qu'il soit sur de lui
+    ou que 'sample_size' octets aient ete lus. Apres un debut en pur ASCII,
+    au plus ENCODING_ASCII_SKIP_SAMPLES echantillons sont parcourus
+
+    Arguments:
+        f           -- un flux binaire ouvert en lecture
+        sample_size -- le nombre maximum d'octets a analyser
+
+    Retourne:
+        l'encodage du flux
+    '''
+    head = f.read(4)
+    encoding = detect_bom(head)
+    if encoding:
+        return encoding
+
+    from chardet.universaldetector import UniversalDetector    # importe a la demande, long a charger
+
+    detector = UniversalDetector()
+    detector.feed(head)
+    nb_bytes = len(head)
+    chunk = head
+    ascii_only = head.isascii()
+    while chunk and not detector.done and nb_bytes < sample_size:
+        chunk = f.read(ENCODING_CHUNK_SIZE)
+        detector.feed(chunk)
+        nb_bytes += len(chunk)
+        ascii_only = ascii_only and chunk.isascii()
+
+    # un echantillon en pur ASCII ne dit rien de la suite du fichier : on saute
+    # rapidement jusqu'au premier bloc qui contient autre chose, sans aller au-dela
+    # de quelques echantillons (un fichier de plusieurs Go n'est pas parcouru en entier)
+    if chunk and ascii_only:
+        limit = nb_bytes + ENCODING_ASCII_SKIP_SAMPLES * sample_size
+        chunk = f.read(ENCODING_CHUNK_SIZE)
+        nb_bytes += len(chunk)
+        while chunk and chunk.isascii() and nb_bytes < limit:
+            chunk = f.read(ENCODING_CHUNK_SIZE)
+            nb_bytes += len(chunk)
+        if chunk and chunk.isascii():
+            # toujours de l'ASCII : l'UTF-8 le lit de meme et accepte un accent plus loin
+            return 'utf-8'
+        limit = nb_bytes + sample_size
+        while chunk and not detector.done and nb_bytes < limit:
+            detector.feed(chunk)
+            chunk = f.read(ENCODING_CHUNK_SIZE)
+            nb_bytes += len(chunk)
+
+    encoding = detector.close()['encoding']
+    if encoding is None:
+        return 'utf-8'
+
+    return codecs.lookup(encoding).name
+
+
+def load_encoding_cache():
+    ''' 
+    Charge le cache persistant des encodages detectes. Le fichier est un journal
+    JSON ligne par ligne ou la derniere entree d'un chemin l'emporte ;
+    il est compacte quand il contient trop d'entrees perimees
+
+    Retourne:
+        le dictionnaire {chemin: [taille, date de modification, encodage]}
+    '''
+    if not _encoding_cache:
+        nb_lines = 0
+        try:
+            with open(ENCODING_CACHE_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        key, size, mtime, encoding = json.loads(line)
+                    except ValueError:
+                        continue
+                    _encoding_cache[key] = [size, mtime, encoding]
+                    nb_lines += 1
+        except OSError:
+            pass
+
+        if nb_lines > 1000 and nb_lines > 2 * len(_encoding_cache):
+            compact_encoding_cache(_encoding_cache)
+
+    return _encoding_cache
+
+
+def compact_encoding_cache(cache):
+    ''' 
+    Reecrit le cache des encodages sans les entrees perimees,
+    en remplacant le fichier de facon atomique
+    '''
+    try:
+        tmp_file = f"{ENCODING_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for key, entry in cache.items():
+                f.write(json.dumps([key] + entry) + '\n')
+        os.replace(tmp_file, ENCODING_CACHE_FILE)
+    except OSError as e:
+        print(f"Impossible de compacter le cache des encodages. Raison: {e}")
+
+
+def save_encoding_cache_entry(key, entry):
+    ''' 
+    Ajoute une entree a la fin du cache des encodages. Un ajout de quelques octets
+    ne se melange pas avec ceux des autres processus : plusieurs conversions
+    peuvent donc tourner en parallele
+    '''
+    try:
+        os.makedirs(os.path.dirname(ENCODING_CACHE_FILE), exist_ok=True)
+        with open(ENCODING_CACHE_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([key] + entry) + '\n')
+    except OSError as e:
+        print(f"Impossible d'enregistrer le cache des encodages. Raison: {e}")
+
+
+def detect_encoding(file_path):
+    ''' 
+    Cette fonction detecte l'encodage d'un fichier en utilisant 'chardet',
+    sur le debut du contenu decompresse pour un fichier compresse.
+    Le resultat est mis en cache par (chemin, taille, date de modification),
+    un fichier inchange n'est donc jamais analyse deux fois
+    
+    Argument:
+    file_path -- le chemin du fichier a analyser
+
+    Retourne:
+    l'encodage du fichier
+    '''
+    # un membre d'archive change avec l'archive
+    stat = os.stat(split_archive_path(file_path)[0])
+    key = os.path.abspath(file_path)
+    cache = load_encoding_cache()
+
+    entry = cache.get(key)
+    if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return entry[2]
+
+    with open_input(file_path) as f:            # Ouvre le fichier binaire (decompresse) en lecture
+        encoding = detect_stream_encoding(f)    # Detecte l'encodage sur le debut du fichier
+
+    cache[key] = [stat.st_size, stat.st_mtime_ns, encoding]
+    save_encoding_cache_entry(key, cache[key])
+
+    return encoding
+
+
+def iter_decoded_lines(f, encoding, chunk_size=DECODE_CHUNK_SIZE, head=b''):
+    ''' 
+    Decode un flux binaire bloc par bloc avec un decodeur incremental
+    et le decoupe en lignes
+
+    Arguments:
+        f          -- un flux binaire ouvert en lecture
+        encoding   -- l'encodage du flux
+        chunk_size -- la taille des blocs lus
+        head       -- les premiers octets du flux, s'ils ont deja ete lus
+
+    Retourne:
+        un generateur sur les lignes du flux (avec leur fin de ligne)
+    '''
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        chunk = head or f.read(chunk_size)
+        head = b''
+        text = pending + decoder.decode(chunk, final=not chunk)
+        parts = text.split('\n')
+        pending = parts.pop()
+        for part in parts:
+            yield part + '\n'
+
+        if not chunk:
+            break
+
+    if pending:
+        yield pending
+
+
+def read_file_lines(file_path, encoding):
+
+    ''' 
+    Ouvre le fichier en lecture avec le bon encodage et
+    creer une liste avec toutes les lignes
+
+    Argument:
+    --------
+        file_path -- le chemin du fichier a lire
+        encoding  -- l'encodage du fichier
+ 
+    Retourne:
+    --------
+        une liste de lignes lu dans le fichier
+    '''
+
+    return list(iter_file_lines(file_path, encoding))
+
+
+def record_layout(buffer, encoding):
+    ''' 
+    Determine comment voir le buffer brut du fichier comme un tableau
+    d'unites de largeur fixe (octets ou mots de 16 bits)
+
+    Arguments:
+        buffer   -- le contenu brut du fichier (mmap ou bytes)
+        encoding -- l'encodage du fichier
+
+    Retourne:
+        un tuple (dtype, decalage du BOM, encodage des unites, table de conversion
+        des octets non ASCII, controle des caracteres multi-unites)
+        ou None si l'encodage ne permet pas un decoupage vectorise
+    '''
+    import numpy as np      # importe a la demande, long a charger
+    name = codecs.lookup(encoding).name
+    head = bytes(buffer[:4])
+
+    if name in ('utf-16', 'utf-16-le', 'utf-16-be'):
+        big_endian = head.startswith(codecs.BOM_UTF16_BE) if name == 'utf-16' else name == 'utf-16-be'
+        offset = 2 if name == 'utf-16' and head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) else 0
+        if big_endian:
+            return np.dtype('>u2'), offset, 'utf-16-be', None, 'surrogate'
+        return np.dtype('<u2'), offset, 'utf-16-le', None, 'surrogate'
+
+    if name in ('utf-8', 'utf-8-sig', 'ascii'):
+        offset = 3 if head.startswith(codecs.BOM_UTF8) else 0
+        return np.dtype('u1'), offset, 'utf-8', None, 'non-ascii'
+
+    # encodage sur un octet compatible ASCII (cp1252, latin-1...) :
+    # une table donne le caractere de chaque octet non ASCII
+    chars = bytes(range(256)).decode(name, errors='replace')
+    if len(chars) != 256 or name.startswith('utf') or not chars[:128].isascii():
+        return None
+
+    table = np.array([ord(c) for c in chars], dtype=np.uint32)
+    if np.array_equal(table, np.arange(256)):
+        table = None
+    return np.dtype('u1'), 0, name, table, None
+
+
+def decode_units(units, unit_encoding, table, check):
+    ''' 
+    Convertit un bloc d'unites brutes en points de code Unicode (un par caractere).
+    Un bloc qui contient des caracteres multi-unites (UTF-8 non ASCII,
+    paires de substitution UTF-16) est decode par le codec Python
+
+    Retourne:
+        un tableau numpy de points de code (uint32)
+    '''
+    import numpy as np      # importe a la demande, long a charger
+    if check == 'non-ascii':
+        multi_units = (units >= 0x80).any()
+    elif check == 'surrogate':
+        multi_units = ((units & 0xF800) == 0xD800).any()
+    else:
+        multi_units = False
+
+    if multi_units:
+        text = units.tobytes().decode(unit_encoding)
+        return np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+
+    codes = units.astype(np.uint32)
+    if table is not None:
+        high = units >= 0x80
+        codes[high] = table[units[high]]
+    return codes
+
+
+def slice_records(codes, col_specs):
+    ''' 
+    Decoupe un bloc de points de code en colonnes : chaque suite de lignes
+    de meme longueur est vue comme un tableau 2-D (une ligne par enregistrement)
+    et les colonnes sont extraites par tranches, les espaces etant supprimes en bloc.
+    Les autres lignes (lignes vides, fin de fichier...) sont decoupees une par une
+
+    Arguments:
+        codes     -- tableau numpy de points de code, fait de lignes completes
+        col_specs -- liste de tuples (debut, fin) des colonnes
+
+    Retourne:
+        la liste des colonnes, chacune etant une liste de chaines
+    '''
+    import numpy as np      # importe a la demande, long a charger
+    newlines = np.flatnonzero(codes == 10)
+    ends = newlines
+    if len(newlines) == 0 or newlines[-1] != len(codes) - 1:
+        ends = np.append(newlines, len(codes))
+    starts = np.concatenate(([0], newlines + 1))[:len(ends)]
+    lengths = ends - starts
+
+    # la longueur d'enregistrement est la plus frequente du bloc
+    record_length = int(np.bincount(lengths).argmax())
+    regular = lengths == record_length
+
+    # une derniere ligne sans '\n' ne peut pas etre vue comme un enregistrement
+    if len(ends) > len(newlines):
+        regular[-1] = False
+
+    # chaque suite de lignes regulieres consecutives est une simple vue 2-D du bloc
+    regular_idx = np.flatnonzero(regular)
+    runs = np.split(regular_idx, np.flatnonzero(np.diff(regular_idx) != 1) + 1)
+    views = [
+        codes[starts[run[0]]:starts[run[0]] + len(run) * (record_length + 1)].reshape(-1, record_length + 1)
+        for run in runs if len(run)
+    ]
+    if views:
+        records = np.concatenate(views)[:, :record_length]
+    else:
+        records = np.empty((0, record_length), dtype=np.uint32)
+
+    cols = []
+    for start, end in col_specs:
+        start, end, _ = slice(start, end).indices(record_length)
+        width = end - start
+        if width <= 0:
+            cols.append([''] * len(records))
+            continue
+
+        cells = np.ascontiguousarray(records[:, start:end]).view(f'U{width}').ravel()
+        cols.append(np.char.strip(cells).tolist())
+
+    if len(regular_idx) == len(starts):
+        return cols
+
+    # on remet les lignes irregulieres a leur place
+    merged = [np.empty(len(starts), dtype=object) for _ in col_specs]
+    for column, values in zip(merged, cols):
+        column[regular_idx] = values
+    for i in np.flatnonzero(~regular).tolist():
+        line = codes[starts[i]:ends[i]].tobytes().decode('utf-32-le')
+        for column, (start, end) in zip(merged, col_specs):
+            column[i] = line[start:end].strip()
+
+    return [column.tolist() for column in merged]
+
+
+def iter_fixed_width_blocks(input_file, encoding, col_specs, block_size=FIXED_WIDTH_BLOCK_SIZE, byte_range=None):
+    ''' 
+    Decoupe le fichier en colonnes par blocs de lignes, sans boucle Python par ligne :
+    le fichier est projete en memoire (mmap) et chaque bloc de lignes completes
+    est converti en points de code puis decoupe par 'slice_records'.
+    Si l'encodage ne s'y prete pas, on revient au decoupage ligne par ligne
+
+    Arguments:
+        input_file -- le chemin vers le fichier texte
+        encoding   -- l'encodage du fichier
+        col_specs  -- liste de tuples (debut, fin) des colonnes
+        block_size -- la taille en octets d'un bloc
+        byte_range -- tuple (debut, fin) en octets pour ne decouper qu'une plage
+                      du fichier (voir 'split_byte_ranges'), tout le fichier par defaut
+
+    Retourne:
+        un generateur de blocs, chaque bloc etant la liste de ses colonnes
+    '''
+    # un fichier compresse ne se projette pas en memoire : il est lu en flux
+    if is_compressed_input(input_file):
+        with open_input(input_file) as f:
+            yield from iter_stream_blocks(f, encoding, col_specs, block_size)
+        return
+
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        # le mmap reste valide apres la fermeture du fichier,
+        # il est libere avec le dernier tableau qui le reference
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    yield from iter_buffer_blocks(buffer, encoding, col_specs, block_size, byte_range)
+
+
+def iter_buffer_blocks(buffer, encoding, col_specs, block_size=FIXED_WIDTH_BLOCK_SIZE, byte_range=None):
+    '''
+    Meme decoupage que 'iter_fixed_width_blocks' sur un contenu deja en memoire
+    (mmap, bytes, bytearray ou memoryview)
+
+    Retourne:
+        un generateur de blocs, chaque bloc etant la liste de ses colonnes
+    '''
+    import numpy as np      # importe a la demande, long a charger
+    if len(buffer) == 0:
+        return
+
+    layout = record_layout(buffer, encoding)
+    if layout is None:
+        for row in iter_raw_rows(iter_decoded_lines(io.BytesIO(buffer), encoding), col_specs):
+            yield [[cell] for cell in row]
+        return
+
+    dtype, offset, unit_encoding, table, check = layout
+    end = len(buffer)
+    if byte_range is not None:
+        offset, end = byte_range
+    data = np.frombuffer(buffer, dtype=dtype, offset=offset, count=(end - offset) // dtype.itemsize)
+
+    window = max(block_size // dtype.itemsize, 1)
+    pos = 0
+    while pos < len(data):
+        chunk = data[pos:pos + window]
+        if pos + len(chunk) >= len(data):
+            stop = len(chunk)
+        else:
+            newlines = np.flatnonzero(chunk == 10)
+            # une ligne plus longue que le bloc : on agrandit le bloc
+            if len(newlines) == 0:
+                window *= 2
+                continue
+            stop = int(newlines[-1]) + 1
+
+        codes = decode_units(chunk[:stop], unit_encoding, table, check)
+        yield slice_records(codes, col_specs)
+        pos += stop
+
+
+def iter_stream_blocks(f, encoding, col_specs, block_size=FIXED_WIDTH_BLOCK_SIZE):
+    ''' 
+    Meme decoupage que 'iter_fixed_width_blocks' sur un flux binaire (fichier
+    decompresse a la volee...) : le flux est lu par blocs coupes apres la derniere
+    fin de ligne, chaque bloc etant decoupe par 'iter_buffer_blocks' ;
+    la fin de ligne incomplete est reportee au bloc suivant.
+    La taille decompressee n'est connue qu'a la lecture : un contenu qui tient
+    dans le premier bloc et sous LIGHT_ENGINE_MAX_SIZE passe par le moteur leger
+
+    Retourne:
+        un generateur de blocs, chaque bloc etant la liste de ses colonnes
+    '''
+    head = f.read(block_size)
+    if not head:
+        return
+
+    if len(head) < min(block_size, LIGHT_ENGINE_MAX_SIZE):
+        rows = list(iter_raw_rows(iter_decoded_lines(io.BytesIO(head), encoding), col_specs))
+        if rows:
+            yield [list(col) for col in zip(*rows)]
+        return
+
+    layout = record_layout(head, encoding)
+    if layout is None:
+        for row in iter_raw_rows(iter_decoded_lines(f, encoding, head=head), col_specs):
+            yield [[cell] for cell in row]
+        return
+
+    # le BOM est retire : les blocs sont decoupes avec l'encodage de leurs unites
+    dtype, offset, unit_encoding = layout[:3]
+    newline = '\n'.encode(unit_encoding)
+    pending = head[offset:]
+    chunk = head
+    while chunk:
+        chunk = f.read(block_size)
+        data = pending + chunk
+        if chunk:
+            pos = data.rfind(newline)
+            # une fin de ligne commence sur une unite (UTF-16)
+            while pos > 0 and pos % dtype.itemsize:
+                pos = data.rfind(newline, 0, pos + len(newline) - 1)
+            end = pos + len(newline) if pos >= 0 else 0
+        else:
+            end = len(data)
+
+        if end:
+            yield from iter_buffer_blocks(data[:end], unit_encoding, col_specs, block_size)
+        pending = data[end:]
+
+
+def iter_fixed_width_rows(input_file, encoding, col_specs):
+    ''' 
+    Meme decoupage que 'iter_fixed_width_blocks' mais ligne par ligne.
+    Un petit fichier est decoupe par le moteur leger, sans numpy
+
+    Retourne:
+        un generateur de lignes, chaque ligne etant la liste des cellules
+    '''
+    if not is_compressed_input(input_file) and os.path.getsize(input_file) < LIGHT_ENGINE_MAX_SIZE:
+        yield from iter_raw_rows(iter_file_lines(input_file, encoding), col_specs)
+        return
+
+    for cols in iter_fixed_width_blocks(input_file, encoding, col_specs):
+        yield from map(list, zip(*cols))
+
+
+def split_byte_ranges(input_file, encoding, parts, min_size=PARALLEL_MIN_RANGE_SIZE):
+    ''' 
+    Decoupe le fichier en plages d'octets de tailles voisines qui commencent
+    toutes au debut d'une ligne, pour etre decoupees par des processus differents
+
+    Arguments:
+        input_file -- le chemin vers le fichier texte
+        encoding   -- l'encodage du fichier
+        parts      -- le nombre de plages souhaite
+        min_size   -- la taille minimale d'une plage en octets
+
+    Retourne:
+        la liste des tuples (debut, fin) en octets, dans l'ordre du fichier,
+        ou None si l'encodage ou la compression ne permettent pas un decoupage vectorise
+    '''
+    import numpy as np      # importe a la demande, long a charger
+    if is_compressed_input(input_file):
+        return None
+
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    layout = record_layout(buffer, encoding)
+    if layout is None:
+        return None
+
+    dtype, offset = layout[0], layout[1]
+    data = np.frombuffer(buffer, dtype=dtype, offset=offset, count=(len(buffer) - offset) // dtype.itemsize)
+    parts = max(1, min(parts, len(data) * dtype.itemsize // max(min_size, 1)))
+
+    # chaque limite est repoussee juste apres la fin de ligne suivante
+    bounds = [0]
+    for k in range(1, parts):
+        pos = max(len(data) * k // parts, bounds[-1])
+        while pos < len(data):
+            newlines = np.flatnonzero(data[pos:pos + FIXED_WIDTH_BLOCK_SIZE] == 10)
+            if len(newlines):
+                pos += int(newlines[0]) + 1
+                break
+            pos += FIXED_WIDTH_BLOCK_SIZE
+        if pos >= len(data):
+            break
+        if pos > bounds[-1]:
+            bounds.append(pos)
+    bounds.append(len(data))
+
+    # une fin de fichier qui ne tombe pas sur une unite entiere reste dans la derniere plage
+    positions = [offset + pos * dtype.itemsize for pos in bounds]
+    positions[-1] = len(buffer)
+    return list(zip(positions[:-1], positions[1:]))
+
+
+def parse_byte_range(input_file, encoding, col_specs, byte_range, header):
+    ''' 
+    Decoupe et normalise une plage du fichier, dans un processus du pool
+
+    Arguments:
+        input_file -- le chemin vers le fichier texte
+        encoding   -- l'encodage du fichier
+        col_specs  -- liste de tuples (debut, fin) des colonnes
+        byte_range -- tuple (debut, fin) en octets, aligne sur des debuts de ligne
+        header     -- la plage est la premiere du fichier et contient l'entete
+
+    Retourne:
+        la liste des lignes nettoyees de la plage
+    '''
+    blocks = iter_fixed_width_blocks(input_file, encoding, col_specs, byte_range=byte_range)
+    rows = (list(row) for cols in blocks for row in zip(*cols))
+    return list(iter_table_rows(rows, header))
+
+
+def iter_parallel_rows(input_file, encoding, col_specs, jobs=None):
+    ''' 
+    Meme resultat que 'iter_table_rows(iter_fixed_width_rows(...))' mais le fichier
+    est decoupe en plages alignees sur les lignes, analysees en parallele par
+    un pool de processus et remises dans l'ordre du fichier.
+    Seules quelques plages sont en cours a la fois pour borner la memoire
+
+    Arguments:
+        input_file -- le chemin vers le fichier texte
+        encoding   -- l'encodage du fichier
+        col_specs  -- liste de tuples (debut, fin) des colonnes
+        jobs       -- le nombre de processus (par defaut: nombre de coeurs)
+
+    Retourne:
+        un generateur sur l'entete puis les lignes de donnees
+    '''
+    from concurrent.futures import ProcessPoolExecutor     # importe a la demande
+
+    jobs = jobs or os.cpu_count() or 1
+    ranges = split_byte_ranges(input_file, encoding, jobs * PARALLEL_RANGES_PER_JOB)
+    if ranges is None or len(ranges) < 2:
+        yield from iter_table_rows(iter_fixed_width_rows(input_file, encoding, col_specs))
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        tasks = iter(enumerate(ranges))
+        pending = collections.deque()
+
+        def submit():
+            task = next(tasks, None)
+            if task is not None:
+                index, byte_range = task
+                pending.append(executor.submit(parse_byte_range, input_file, encoding, col_specs, byte_range, index == 0))
+
+        for _ in range(2 * jobs):
+            submit()
+
+        first = True
+        while pending:
+            rows = pending.popleft().result()
+            submit()
+
+            # une premiere plage sans entete (que des lignes vides) :
+            # on ne sait plus ou est l'entete, on reprend tout en serie
+            if first and not rows:
+                for future in pending:
+                    future.cancel()
+                yield from iter_table_rows(iter_fixed_width_rows(input_file, encoding, col_specs))
+                return
+            first = False
+            yield from rows
+
+
+class DictionaryColumn:
+    ''' 
+    Colonne encodee par dictionnaire : chaque valeur distincte n'est gardee
+    qu'une fois dans 'values' et chaque ligne n'est qu'un code entier (4 octets)
+    dans 'codes'. Publisher, DisplayVersion ou InstallDate n'ont que quelques
+    centaines de valeurs distinctes sur tout un parc : la colonne occupe une
+    fraction de la liste de chaines equivalente.
+    Elle se lit comme une liste (len, indice, tranche, iteration)
+    '''
+
+    def __init__(self, values=()):
+        self.codes = array.array('I')
+        self.values = []
+        self.index = {}
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.values[code] for code in self.codes[i]]
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+    def append(self, value):
+        ''' 
+        Ajoute une valeur en fin de colonne
+        '''
+        self.codes.append(self.intern(value))
+
+    def extend(self, values):
+        ''' 
+        Ajoute une suite de valeurs : les nouvelles valeurs distinctes sont
+        d'abord ajoutees au dictionnaire, puis tous les codes en une seule passe
+        '''
+        values = values if isinstance(values, list) else list(values)
+        for value in dict.fromkeys(values):
+            self.intern(value)
+        self.codes.extend(map(self.index.__getitem__, values))
+
+    def map_values(self, function, start=0):
+        ''' 
+        Transforme la colonne en n'appliquant la fonction qu'aux valeurs distinctes
+
+        Arguments:
+            function -- fonction qui recoit la liste des valeurs distinctes
+                        et renvoie la liste des valeurs transformees
+            start    -- les lignes avant cet indice (entete...) sont gardees telles quelles
+
+        Retourne:
+            une nouvelle colonne encodee
+        '''
+        mapped = function(self.values)
+        column = DictionaryColumn()
+        # deux valeurs distinctes peuvent donner la meme valeur transformee
+        remap = [column.intern(value) for value in mapped]
+        column.codes = array.array('I', map(remap.__getitem__, self.codes))
+        for i in range(min(start, len(self.codes))):
+            column.codes[i] = column.intern(self.values[self.codes[i]])
+        return column
+
+    def intern(self, value):
+        ''' 
+        Retourne le code d'une valeur, en l'ajoutant au dictionnaire si besoin
+        '''
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def to_categorical(self):
+        ''' 
+        Retourne la colonne en pandas.Categorical, sans recopier les valeurs :
+        les codes deviennent ceux de la categorie, le dictionnaire ses categories
+        '''
+        import numpy as np      # importes a la demande, longs a charger
+        import pandas as pd
+
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.uint32).astype(np.int32), self.values)
+
+
+def extract_columns(input_file, col_specs):
+    ''' 
+    Cette fonction extrait des colonnes specifiques du fichier texte
+
+    Arguments:
+        input_file --  le chemin vers le fichier texte
+        col_specs  --  liste de tuples (debut, fin) des colonnes a extraire
+                       (None: deduites de la ligne de soulignement)
+
+    Retourne:
+        la liste des colonnes extraites, encodees par dictionnaire (voir 'DictionaryColumn')
+    '''
+    
+    # on recupere l'encodage du fichier texte et ses colonnes
+    encoding = detect_encoding(input_file)          
+    col_specs = resolve_col_specs(input_file, encoding, col_specs)
+
+    # une colonne par element de col_specs, chaque chaine distincte n'y est gardee qu'une fois
+    cols = [DictionaryColumn() for _ in col_specs]
+
+    # un petit fichier est decoupe ligne par ligne, sans numpy
+    if not is_compressed_input(input_file) and os.path.getsize(input_file) < LIGHT_ENGINE_MAX_SIZE:
+        for row in iter_raw_rows(iter_file_lines(input_file, encoding), col_specs):
+            for col, value in zip(cols, row):
+                col.append(value)
+        return cols
+
+    # les colonnes sont decoupees par blocs de lignes, sans boucle Python par ligne ;
+    # les chaines d'un bloc sont liberees des qu'il est encode
+    for block in iter_fixed_width_blocks(input_file, encoding, col_specs):
+        for col, values in zip(cols, block):
+            col.extend(values)
+
+    return cols
+
+
+
+
+
+def iter_file_lines(file_path, encoding):
+    ''' 
+    Lit le fichier ligne par ligne avec le bon encodage,
+    sans jamais charger tout le fichier en memoire
+
+    Arguments:
+        file_path -- le chemin du fichier a lire
+        encoding  -- l'encodage du fichier
+
+    Retourne:
+        un generateur sur les lignes du fichier
+    '''
+    with open_input(file_path) as f:
+        yield from iter_decoded_lines(f, encoding)
+
+
+def iter_raw_rows(lines, col_specs):
+    ''' 
+    Decoupe chaque ligne selon les positions des colonnes
+
+    Arguments:
+        lines     -- un iterable de lignes de texte
+        col_specs -- liste de tuples (debut, fin) des colonnes
+
+    Retourne:
+        un generateur de lignes, chaque ligne etant la liste des cellules
+    '''
+    for line in lines:
+        yield [line[start:end].strip() for start, end in col_specs]
+
+
+def occupied_positions(lines):
+    ''' 
+    Calcule en une fois les positions occupees (au moins un caractere non blanc)
+    d'un echantillon de lignes : chaque ligne, en UTF-32 avec des octets nuls a la
+    place des espaces, est vue comme un grand entier et les entiers sont reunis par
+    un OU binaire. Une position est libre si ses quatre octets restent nuls
+
+    Retourne:
+        une fonction qui indique si une position est occupee
+    '''
+    mask = 0
+    for line in lines:
+        mask |= int.from_bytes(line.replace(' ', '\0').encode('utf-32-le'), 'little')
+
+    def occupied(position):
+        return (mask >> (32 * position)) & 0xFFFFFFFF != 0
+
+    return occupied
+
+
+def detect_layout(lines, sample_rows=LAYOUT_SAMPLE_ROWS):
+    ''' 
+    Deduit les colonnes d'une sortie Format-Table de ses premieres lignes : chaque suite
+    de '-' de la ligne de soulignement commence une colonne. Les debuts sont verifies
+    sur l'occupation d'un echantillon de lignes de donnees : une colonne alignee a droite
+    (soulignement decale vers la droite) est elargie jusqu'a la colonne blanche qui
+    la separe de la precedente. Les colonnes sont memorisees par couple (entete,
+    soulignement) : un fichier deja vu ne coute que la lecture de son debut
+
+    Arguments:
+        lines       -- les premieres lignes du fichier (texte decode)
+        sample_rows -- le nombre de lignes de donnees de l'echantillon
+
+    Retourne:
+        la liste de tuples (debut, fin) des colonnes, ou None sans ligne de soulignement
+    '''
+    lines = (line.rstrip('\r\n').lstrip('\ufeff') for line in lines)
+    header = next((line for line in lines if line.strip()), None)
+    underline = next(lines, None)
+    if header is None or not underline or not underline.strip() or underline.strip(' -'):
+        return None
+
+    signature = (header, underline)
+    col_specs = _layout_cache.get(signature)
+    if col_specs is not None:
+        return col_specs
+
+    starts = [match.start() for match in re.finditer('-+', underline)]
+    starts[0] = 0
+    occupied = occupied_positions(itertools.islice(lines, sample_rows))
+    for i in range(1, len(starts)):
+        while starts[i] - 1 > starts[i - 1] and occupied(starts[i] - 1):
+            starts[i] -= 1
+
+    col_specs = list(zip(starts, starts[1:] + [None]))
+    _layout_cache[signature] = col_specs
+    return col_specs
+
+
+def detect_file_layout(input_file, encoding):
+    ''' 
+    Deduit les colonnes Format-Table d'un fichier, eventuellement compresse, de son debut
+    (voir 'detect_layout')
+    '''
+    with open_input(input_file) as f:
+        head = f.read(LAYOUT_SAMPLE_SIZE)
+    lines = head.decode(encoding, errors='ignore').splitlines()
+    # la derniere ligne d'un echantillon plein peut etre coupee
+    if len(head) == LAYOUT_SAMPLE_SIZE:
+        lines = lines[:-1]
+    return detect_layout(lines)
+
+
+def resolve_col_specs(input_file, encoding, col_specs):
+    ''' 
+    Les colonnes a decouper dans un fichier Format-Table : celles qui sont imposees,
+    sinon celles de son soulignement, sinon DEFAULT_COL_SPECS
+    '''
+    if col_specs is not None:
+        return col_specs
+    return detect_file_layout(input_file, encoding) or DEFAULT_COL_SPECS
+
+
+def detect_input_format(head, encoding):
+    ''' 
+    Reconnait le format d'une entree d'apres ses premiers octets : un tableau ou un objet
+    JSON (ConvertTo-Json), une entete csv (Export-Csv) ou, par defaut, la sortie Format-Table
+
+    Arguments:
+        head     -- les premiers octets de l'entree (voir INPUT_FORMAT_SAMPLE_SIZE)
+        encoding -- l'encodage de l'entree
+
+    Retourne:
+        le nom du format, une cle de INPUT_READERS
+    '''
+    text = head.decode(encoding, errors='ignore').lstrip('\ufeff \t\r\n')
+    if text[:1] in ('[', '{'):
+        return 'json'
+
+    # la derniere ligne de l'echantillon peut etre coupee
+    lines = [line for line in text.splitlines() if line.strip()][:2]
+    if not lines:
+        return 'table'
+    if lines[0].startswith(CSV_TYPE_PREFIX):
+        return 'csv'
+    # la ligne de soulignement '---- ----' n'existe que dans Format-Table
+    if len(lines) > 1 and is_underline_row(lines[1].split()):
+        return 'table'
+    # les entetes de Format-Table sont alignees par des blancs, pas separees
+    delimiter = max(CSV_DELIMITERS, key=lines[0].count)
+    if lines[0].startswith('"') or lines[0].count(delimiter) and '  ' not in lines[0]:
+        return 'csv'
+    return 'table'
+
+
+def detect_file_format(input_file, encoding):
+    ''' 
+    Reconnait le format d'un fichier, eventuellement compresse (voir 'detect_input_format')
+    '''
+    with open_input(input_file) as f:
+        head = f.read(INPUT_FORMAT_SAMPLE_SIZE)
+    return detect_input_format(head, encoding)
+
+
+def iter_table_stream(f, encoding, col_specs):
+    ''' 
+    Lecteur de la sortie Format-Table pour un flux : decoupage par blocs
+    (voir 'iter_stream_blocks'). Un fichier est lu par 'iter_fixed_width_rows'
+
+    Retourne:
+        un generateur de lignes, chaque ligne etant la liste des cellules
+    '''
+    for cols in iter_stream_blocks(f, encoding, col_specs):
+        yield from map(list, zip(*cols))
+
+
+def iter_csv_stream(f, encoding, col_specs=None):
+    ''' 
+    Lecteur de la sortie Export-Csv : la ligne '#TYPE' eventuelle est sautee et le
+    separateur (virgule, point-virgule, tabulation, barre) est deduit de l'entete.
+    Les lignes sont analysees par le module csv (en C), sans DataFrame intermediaire.
+    Chaque ligne a la largeur de l'entete, comme celles des autres lecteurs : une ligne
+    courte est completee par des cellules vides, une ligne plus longue est refusee
+    (sauf si ses cellules en trop sont vides)
+
+    Arguments:
+        f         -- un flux binaire ouvert en lecture
+        encoding  -- l'encodage du flux
+        col_specs -- ignore : les colonnes sont celles de l'entete
+
+    Retourne:
+        un generateur sur l'entete puis les lignes, chaque ligne etant la liste des cellules
+    '''
+    lines = (line for line in iter_decoded_lines(f, encoding) if line.strip())
+    first = next(lines, '').lstrip('\ufeff')
+    while first.startswith(CSV_TYPE_PREFIX):
+        first = next(lines, '')
+    if not first:
+        return
+
+    delimiter = max(CSV_DELIMITERS, key=first.count)
+    reader = csv.reader(itertools.chain([first], lines), delimiter=delimiter)
+    header = [cell.strip() for cell in next(reader)]
+    yield header
+    width = len(header)
+    for row in reader:
+        row = [cell.strip() for cell in row]
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        elif len(row) > width:
+            if any(row[width:]):
+                raise ValueError(f"csv: une ligne a {len(row)} cellules pour {width} colonnes")
+            del row[width:]
+        yield row
+
+
+def json_cell(value):
+    ''' 
+    Texte d'une valeur JSON dans une cellule : vide pour null, JSON pour un objet ou un tableau
+    '''
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def iter_json_stream(f, encoding, col_specs=None):
+    ''' 
+    Lecteur de la sortie ConvertTo-Json : un tableau d'objets, un seul objet ou une
+    suite d'objets (JSON Lines). Le flux est decode par blocs et chaque objet est
+    analyse des qu'il est complet : un tableau de plusieurs Go n'est jamais charge
+    en entier. Les cles du premier objet forment l'entete
+
+    Arguments:
+        f         -- un flux binaire ouvert en lecture
+        encoding  -- l'encodage du flux
+        col_specs -- ignore : les colonnes sont les cles des objets
+
+    Retourne:
+        un generateur sur l'entete puis les lignes, chaque ligne etant la liste des cellules
+    '''
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    header = None
+    buffer = ''
+    done = False
+    while not done:
+        chunk = f.read(DECODE_CHUNK_SIZE)
+        done = not chunk
+        buffer += text_decoder.decode(chunk, final=done)
+        pos = 0
+        while True:
+            # les crochets et virgules du tableau sont sautes comme des blancs
+            while pos < len(buffer) and buffer[pos] in JSON_SEPARATORS:
+                pos += 1
+            if pos == len(buffer):
+                break
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # un objet coupe en fin de bloc est complete par le bloc suivant
+                if done:
+                    raise ValueError(f"JSON invalide: {e}") from None
+                break
+            if not isinstance(item, dict):
+                raise ValueError(f"JSON: objet attendu, {type(item).__name__} trouve")
+
+            if header is None:
+                header = list(item)
+                yield list(header)
+            yield [json_cell(item.get(name)) for name in header]
+        buffer = buffer[pos:]
+
+
+# lecteurs des formats d'entree (voir 'detect_input_format') : chacun lit un flux binaire
+# et rend l'entete puis les lignes de cellules texte, nettoyees et normalisees ensuite par
+# 'iter_table_rows' comme pour Format-Table ; un nouveau format n'a qu'a s'y ajouter
+INPUT_READERS = {
+    'table': iter_table_stream,
+    'csv': iter_csv_stream,
+    'json': iter_json_stream,
+}
+
+# colonne des dates d'installation des formats a cles (Export-Csv, ConvertTo-Json) :
+# elle est retrouvee par son nom, les proprietes n'y sont pas dans un ordre fixe
+DATE_COLUMN_NAME = 'InstallDate'
+
+
+def input_date_column(input_format):
+    '''
+    La colonne des dates d'un format d'entree, pour 'iter_table_rows' : la derniere
+    pour Format-Table (son entete peut etre tronque), son nom pour les formats a cles
+    '''
+    return -1 if input_format == 'table' else DATE_COLUMN_NAME
+
+
+def iter_input_rows(input_file, encoding, col_specs, input_format=None):
+    ''' 
+    Lit un fichier avec le lecteur de son format : la sortie Format-Table d'un fichier
+    non compresse est projetee en memoire (voir 'iter_fixed_width_rows'), les autres
+    formats sont lus en flux par leur lecteur de INPUT_READERS
+
+    Arguments:
+        input_file   -- le chemin vers le fichier
+        encoding     -- l'encodage du fichier
+        col_specs    -- liste de tuples (debut, fin) des colonnes de Format-Table
+                        (None: deduites du soulignement, voir 'detect_layout')
+        input_format -- le format du fichier (detecte s'il n'est pas donne)
+
+    Retourne:
+        un generateur de lignes, chaque ligne etant la liste des cellules
+    '''
+    if input_format is None:
+        input_format = detect_file_format(input_file, encoding)
+
+    if input_format == 'table':
+        yield from iter_fixed_width_rows(input_file, encoding, resolve_col_specs(input_file, encoding, col_specs))
+        return
+
+    with open_input(input_file) as f:
+        yield from INPUT_READERS[input_format](f, encoding, col_specs)
+
+
+def iter_source_rows(source, col_specs, encoding=None):
+    '''
+    Decoupe en colonnes et normalise (voir 'iter_table_rows') un inventaire qui n'est
+    pas forcement un fichier : contenu binaire, flux ouvert (binaire ou texte) ou iterable
+    de lignes de texte. Un contenu binaire est decoupe par blocs comme un fichier projete
+    en memoire ; un fichier ou un contenu binaire Export-Csv ou ConvertTo-Json passe par
+    son lecteur (voir 'detect_input_format'), des lignes de texte sont toujours du Format-Table
+
+    Arguments:
+        source    -- un chemin, des bytes, un flux ou un iterable de lignes (str)
+        col_specs -- liste de tuples (debut, fin) des colonnes (None: deduites du soulignement)
+        encoding  -- l'encodage du contenu binaire (detecte s'il n'est pas donne)
+
+    Retourne:
+        un generateur sur l'entete puis les lignes de donnees
+    '''
+    if isinstance(source, (str, os.PathLike)):
+        encoding = encoding or detect_encoding(source)
+        input_format = detect_file_format(source, encoding)
+        rows = iter_input_rows(source, encoding, col_specs, input_format)
+        yield from iter_table_rows(rows, date_column=input_date_column(input_format))
+        return
+
+    if hasattr(source, 'read') and not isinstance(source, io.TextIOBase):
+        source = source.read()
+        if isinstance(source, str):
+            source = [source]
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if encoding is None:
+            encoding = detect_stream_encoding(io.BytesIO(source))
+        input_format = detect_input_format(bytes(source[:INPUT_FORMAT_SAMPLE_SIZE]), encoding)
+        if input_format != 'table':
+            rows = INPUT_READERS[input_format](io.BytesIO(source), encoding, col_specs)
+            yield from iter_table_rows(rows, date_column=input_date_column(input_format))
+            return
+        if col_specs is None:
+            col_specs = detect_layout(bytes(source[:LAYOUT_SAMPLE_SIZE]).decode(encoding, errors='ignore').splitlines())
+            col_specs = col_specs or DEFAULT_COL_SPECS
+        if len(source) < LIGHT_ENGINE_MAX_SIZE:
+            yield from iter_table_rows(iter_raw_rows(iter_decoded_lines(io.BytesIO(source), encoding), col_specs))
+            return
+        yield from iter_table_rows(list(row) for cols in iter_buffer_blocks(source, encoding, col_specs) for row in zip(*cols))
+        return
+
+    # lignes de texte : un texte d'un seul tenant est redecoupe, le BOM eventuel retire
+    lines = (line for text in source for line in text.splitlines())
+    first = next(lines, None)
+    if first is None:
+        return
+    lines = itertools.chain([first.lstrip('\ufeff')], lines)
+    if col_specs is None:
+        head = list(itertools.islice(lines, LAYOUT_SAMPLE_ROWS + 8))
+        col_specs = detect_layout(head) or DEFAULT_COL_SPECS
+        lines = itertools.chain(head, lines)
+    yield from iter_table_rows(iter_raw_rows(lines, col_specs))
+
+
+def is_underline_row(row):
+    ''' 
+    Indique si la ligne est la ligne de soulignement '----' de Format-Table ; avec des
+    colonnes imposees ('--columns'), une cellule peut y couvrir plusieurs soulignements
+    '''
+    return any(row) and all(not cell.strip('- ') for cell in row)
+
+
+def iter_table_rows(rows, header=True, date_column=-1):
+    ''' 
+    Nettoie le flux de lignes decoupees : les lignes vides et la ligne
+    de soulignement sont ignorees, la premiere ligne non vide est l'entete
+    et la colonne des dates des lignes suivantes est normalisee en date
+
+    Arguments:
+        rows        -- un iterable de lignes decoupees (listes de cellules)
+        header      -- le flux commence par l'entete (faux pour une plage
+                       prise au milieu du fichier)
+        date_column -- l'indice de la colonne des dates (la derniere par defaut,
+                       celle de Format-Table) ou son nom dans l'entete ; sans
+                       colonne de ce nom, aucune cellule n'est convertie
+
+    Retourne:
+        un generateur sur l'entete puis les lignes de donnees
+    '''
+    header_seen = not header
+    for row in rows:
+        if not any(row):
+            continue
+
+        if not header_seen:
+            header_seen = True
+            if isinstance(date_column, str):
+                names = [cell.strip() for cell in row]
+                date_column = names.index(date_column) if date_column in names else None
+            yield row
+            continue
+
+        if is_underline_row(row):
+            continue
+
+        if date_column is not None and len(row) > date_column:
+            row[date_column] = parse_date(row[date_column])
+        yield row
+
+
+def peak_memory():
+    '''
+    Memoire maximale (RSS) atteinte jusqu'ici par le processus, en octets,
+    ou None si le systeme ne la fournit pas
+    '''
+    if resource is None:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS donne des octets, Linux des Ko
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class NullMetrics:
+    '''
+    Mesures desactivees : chaque methode ne fait rien, le cout
+    se limite a un appel par etape et par fichier
+    '''
+    enabled = False
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def wrap(self, name, iterable):
+        return iterable
+
+    def add(self, name, **counters):
+        pass
+
+
+class PipelineMetrics:
+    '''
+    Mesures par etape du traitement : duree, temps CPU, octets lus et ecrits,
+    lignes traitees et memoire maximale a la fin de l'etape.
+    Les etapes s'emboitent (l'ecriture tire les lignes de la normalisation,
+    qui tire celles du decoupage...) : chaque etape ne compte que son propre temps.
+    Une etape peut en plus etre profilee avec cProfile
+    '''
+    enabled = True
+    COUNTERS = ('calls', 'seconds', 'cpu_seconds', 'bytes_read', 'bytes_written', 'rows')
+
+    def __init__(self, profile_stage=None):
+        self.stages = {}
+        self.stack = []
+        self.profile_stage = profile_stage
+        self.profiler = None
+        if profile_stage:
+            import cProfile     # pour profiler une etape
+            self.profiler = cProfile.Profile()
+
+    def get(self, name):
+        if name not in self.stages:
+            self.stages[name] = dict.fromkeys(self.COUNTERS, 0)
+            self.stages[name]['peak_memory_bytes'] = None
+        return self.stages[name]
+
+    def start(self, name):
+        self.stack.append([0.0, 0.0])
+        if name == self.profile_stage:
+            self.profiler.enable()
+        return time.perf_counter(), time.process_time()
+
+    def stop(self, name, stats, started):
+        seconds = time.perf_counter() - started[0]
+        cpu_seconds = time.process_time() - started[1]
+        if name == self.profile_stage:
+            self.profiler.disable()
+
+        # on retire le temps passe dans les etapes emboitees
+        nested = self.stack.pop()
+        stats['seconds'] += seconds - nested[0]
+        stats['cpu_seconds'] += cpu_seconds - nested[1]
+        if self.stack:
+            self.stack[-1][0] += seconds
+            self.stack[-1][1] += cpu_seconds
+
+    def sample_memory(self, stats):
+        memory = peak_memory()
+        if memory is not None:
+            stats['peak_memory_bytes'] = max(stats['peak_memory_bytes'] or 0, memory)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Mesure le bloc 'with' comme une etape
+        '''
+        stats = self.get(name)
+        stats['calls'] += 1
+        started = self.start(name)
+        try:
+            yield stats
+        finally:
+            self.stop(name, stats, started)
+            self.sample_memory(stats)
+
+    def wrap(self, name, iterable):
+        '''
+        Mesure une etape qui produit des lignes : le temps de chaque 'next'
+        est compte et chaque element produit compte pour une ligne
+        '''
+        stats = self.get(name)
+        stats['calls'] += 1
+        iterator = iter(iterable)
+        while True:
+            started = self.start(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                self.stop(name, stats, started)
+            stats['rows'] += 1
+            yield item
+
+        self.sample_memory(stats)
+
+    def add(self, name, **counters):
+        '''
+        Ajoute des compteurs (octets lus, ecrits...) a une etape
+        '''
+        stats = self.get(name)
+        for counter, value in counters.items():
+            stats[counter] += value
+
+    def merge(self, stages):
+        '''
+        Ajoute les mesures d'un autre processus (conversion d'un lot)
+        '''
+        for name, other in stages.items():
+            stats = self.get(name)
+            for counter in self.COUNTERS:
+                stats[counter] += other[counter]
+            if other['peak_memory_bytes'] is not None:
+                stats['peak_memory_bytes'] = max(stats['peak_memory_bytes'] or 0, other['peak_memory_bytes'])
+
+    def to_json(self):
+        return json.dumps({'stages': self.stages}, indent=2)
+
+    def to_prometheus(self):
+        '''
+        Rend les mesures au format texte de Prometheus (node_exporter textfile)
+        '''
+        lines = []
+        for counter in self.COUNTERS + ('peak_memory_bytes',):
+            metric = f"txt2xls_stage_{counter}"
+            lines.append(f"# TYPE {metric} gauge")
+            for name, stats in self.stages.items():
+                if stats[counter] is not None:
+                    lines.append(f'{metric}{{stage="{name}"}} {stats[counter]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, output_file, output_format='json'):
+        '''
+        Ecrit les mesures dans un fichier ('-' pour la sortie standard),
+        en remplacant le fichier de facon atomique pour le collecteur Prometheus
+        '''
+        text = self.to_prometheus() if output_format == 'prometheus' else self.to_json() + '\n'
+        if output_file == '-':
+            sys.stdout.write(text)
+            return
+
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, output_file)
+
+    def write_profile(self, output_file, nb_lines=20):
+        '''
+        Enregistre le profil cProfile de l'etape profilee et affiche ses fonctions les plus couteuses
+        '''
+        if self.profiler is None:
+            return
+
+        self.profiler.dump_stats(output_file)
+        import pstats
+        stats = pstats.Stats(self.profiler, stream=sys.stderr)
+        stats.sort_stats('cumulative').print_stats(nb_lines)
+
+
+NULL_METRICS = NullMetrics()
+
+
+def excel_sheet_name(name, used_names):
+    ''' 
+    Rend un nom utilisable comme nom de feuille Excel : sans caracteres interdits,
+    31 caracteres au plus et different des noms deja utilises (sans tenir compte de la casse)
+    '''
+    name = ''.join('_' if c in '[]:*?/\\' else c for c in name).strip("'") or 'Feuille'
+    candidate = name[:31]
+    number = 2
+    while candidate.lower() in used_names:
+        suffix = f" ({number})"
+        candidate = name[:31 - len(suffix)] + suffix
+        number += 1
+
+    used_names.add(candidate.lower())
+    return candidate
+
+
+class ExcelRowWriter:
+    ''' 
+    Ecrit des lignes au fur et a mesure dans un classeur Excel, en mode
+    'constant_memory' : une ligne ecrite n'est plus gardee en memoire.
+    Les datetime sont ecrits comme de vraies cellules date Excel.
+    La largeur maximale de chaque colonne est suivie pendant l'ecriture :
+    a la fin d'une feuille les colonnes sont ajustees, l'entete est filtrable
+    et figee, sans relire les donnees.
+    Quand une feuille atteint la limite d'Excel, la suite est ecrite
+    dans une nouvelle feuille qui reprend l'entete.
+    Un fichier n'apparait sous son nom qu'a la fermeture (voir 'temporary_output') ;
+    utilise comme contexte ('with'), le classeur est abandonne sur une exception
+    '''
+
+    def __init__(self, output_file):
+        options = {'constant_memory': True, 'default_date_format': EXCEL_DATE_FORMAT}
+        self.output_file = None
+        self.tmp_file = output_file
+        if isinstance(output_file, (str, os.PathLike)):
+            self.output_file = output_file
+            self.tmp_file = temporary_output(output_file)
+        else:
+            # un flux (io.BytesIO...) est ecrit sans aucun fichier temporaire
+            options['in_memory'] = True
+
+        import xlsxwriter       # pour ecrire le fichier Excel ligne par ligne, importe a la demande
+        self.workbook = xlsxwriter.Workbook(self.tmp_file, options)
+        self.closed = False
+        self.header_format = self.workbook.add_format(EXCEL_HEADER_FORMAT)
+        self.used_names = set()
+        self.worksheet = None
+        self.sheet_name = None
+        self.header = None
+        self.widths = []
+        self.row = 0
+        self.nb_rows = 0
+
+    def add_sheet(self, name, header):
+        ''' 
+        Commence une nouvelle feuille et y ecrit l'entete
+        '''
+        self.finish_sheet()
+        self.sheet_name = name
+        self.header = header
+        self.worksheet = self.workbook.add_worksheet(excel_sheet_name(name, self.used_names))
+        self.worksheet.write_row(0, 0, header, self.header_format)
+        self.widths = [len(str(cell)) for cell in header]
+        self.row = 1
+
+    def write_row(self, row):
+        ''' 
+        Ecrit une ligne de donnees, en passant a une nouvelle feuille si la feuille est pleine
+        '''
+        if self.row >= EXCEL_MAX_ROWS:
+            self.add_sheet(self.sheet_name, self.header)
+
+        # les chaines sont ecrites telles quelles : 'write' chercherait dans chaque
+        # valeur un nombre, une formule ou une URL, ce qui coute cher et n'a pas de sens ici
+        worksheet = self.worksheet
+        widths = self.widths
+        row_number = self.row
+        for i, cell in enumerate(row):
+            if cell.__class__ is str:
+                if cell:
+                    worksheet.write_string(row_number, i, cell)
+                width = len(cell)
+            elif cell is None:
+                continue
+            elif isinstance(cell, datetime):
+                if cell >= EXCEL_MIN_DATE:
+                    worksheet.write_datetime(row_number, i, cell)
+                else:
+                    worksheet.write_string(row_number, i, f"{cell.day:02d}/{cell.month:02d}/{cell.year:04d}")
+                width = len(EXCEL_DATE_FORMAT)
+            else:
+                worksheet.write(row_number, i, cell)
+                width = len(str(cell))
+            if i >= len(widths):
+                widths.append(width)
+            elif width > widths[i]:
+                widths[i] = width
+
+        self.row += 1
+        self.nb_rows += 1
+
+    def write_rows(self, rows):
+        ''' 
+        Ecrit toutes les lignes d'un iterable
+        '''
+        for row in rows:
+            self.write_row(row)
+
+    def finish_sheet(self):
+        ''' 
+        Ajuste la largeur des colonnes, pose le filtre automatique
+        et fige la ligne d'entete de la feuille en cours
+        '''
+        if self.worksheet is None:
+            return
+
+        for i, width in enumerate(self.widths):
+            # la marge laisse la place a la fleche du filtre
+            self.worksheet.set_column(i, i, min(width + 3, EXCEL_MAX_COLUMN_WIDTH))
+        if self.widths:
+            self.worksheet.autofilter(0, 0, self.row - 1, len(self.widths) - 1)
+        self.worksheet.freeze_panes(1, 0)
+
+    def close(self):
+        ''' 
+        Termine le classeur et l'enregistre sous son nom
+        '''
+        if self.closed:
+            return
+        self.closed = True
+        if self.worksheet is None:
+            self.workbook.add_worksheet()
+        self.finish_sheet()
+        try:
+            self.workbook.close()
+            if self.output_file is not None:
+                os.replace(self.tmp_file, self.output_file)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        ''' 
+        Abandonne le classeur : rien n'est ecrit sous le nom de la sortie
+        '''
+        self.closed = True
+        if self.output_file is not None:
+            discard_output(self.tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_rows_to_excel(rows, output_file, sheet_name='Inventaire'):
+    ''' 
+    Ecrit les lignes au fur et a mesure dans le fichier Excel,
+    la premiere ligne etant l'entete
+
+    Arguments:
+        rows        -- un iterable de lignes (listes de cellules)
+        output_file -- le chemin du fichier Excel de sortie, ou un flux binaire
+        sheet_name  -- le nom de la feuille
+
+    Retourne:
+        le nombre de lignes de donnees ecrites
+    '''
+    with ExcelRowWriter(output_file) as writer:
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is not None:
+            writer.add_sheet(sheet_name, header)
+            writer.write_rows(rows)
+
+    return writer.nb_rows
+
+
+def write_rows_to_csv(rows, output, delimiter=','):
+    '''
+    Ecrit les lignes au fur et a mesure dans un flux csv,
+    les dates etant ecrites au format jj/mm/aaaa
+
+    Arguments:
+        rows      -- un iterable de lignes (listes de cellules), la premiere etant l'entete
+        output    -- un flux texte ouvert en ecriture (avec newline='')
+        delimiter -- le separateur de champ
+
+    Retourne:
+        le nombre de lignes de donnees ecrites
+    '''
+    writer = csv.writer(output, delimiter=delimiter)
+    nb_rows = -1
+    for row in rows:
+        writer.writerow([cell.strftime("%d/%m/%Y") if isinstance(cell, datetime) else cell for cell in row])
+        nb_rows += 1
+
+    return max(nb_rows, 0)
+
+
+def convert(source, output=None, col_specs=None, output_format='xlsx', encoding=None,
+            sheet_name='Inventaire', delimiter=','):
+    '''
+    Convertit un inventaire en memoire, sans fichier temporaire : c'est le point
+    d'entree pour appeler la conversion depuis un autre programme.
+    Les erreurs ne sont pas affichees mais levees (TypeError, ValueError, UnicodeDecodeError...)
+
+    Arguments:
+        source        -- des bytes, un flux (binaire ou texte), un iterable de lignes
+                         de texte ou le chemin d'un fichier
+        output        -- le flux ou ecrire le resultat (io.BytesIO, io.StringIO pour
+                         le csv...) ; s'il n'est pas donne, le resultat est renvoye
+        col_specs     -- liste de tuples (debut, fin) des colonnes (None: deduites du soulignement)
+        output_format -- 'xlsx' ou 'csv'
+        encoding      -- l'encodage d'une source binaire (detecte s'il n'est pas donne)
+        sheet_name    -- le nom de la feuille Excel
+        delimiter     -- le separateur de champ du csv
+
+    Retourne:
+        le contenu produit (bytes) si 'output' n'est pas donne,
+        sinon le nombre de lignes de donnees ecrites dans 'output'
+    '''
+    if output_format not in ('xlsx', 'csv'):
+        raise ValueError(f"format de sortie inconnu: {output_format!r} (xlsx ou csv)")
+    if isinstance(source, (int, float)) or source is None:
+        raise TypeError(f"source non prise en charge: {type(source).__name__}")
+
+    rows = iter_source_rows(source, col_specs, encoding)
+    target = io.BytesIO() if output is None else output
+
+    if output_format == 'xlsx':
+        nb_rows = write_rows_to_excel(rows, target, sheet_name)
+    elif isinstance(target, io.TextIOBase):
+        nb_rows = write_rows_to_csv(rows, target, delimiter)
+    else:
+        # le csv est encode en UTF-8 dans le flux binaire, laisse ouvert a l'appelant
+        text = io.TextIOWrapper(target, encoding='utf-8', newline='', write_through=True)
+        try:
+            nb_rows = write_rows_to_csv(rows, text, delimiter)
+            text.flush()
+        finally:
+            text.detach()
+
+    if output is None:
+        return target.getvalue()
+    return nb_rows
+
+
+def sql_column_names(header):
+    '''
+    Rend les noms de l'entete utilisables comme noms de colonnes SQL :
+    un nom vide est remplace et les doublons sont numerotes (sans tenir compte de la casse)
+    '''
+    names = []
+    used_names = set()
+    for i, name in enumerate(header):
+        name = str(name).strip() or f"Colonne{i + 1}"
+        candidate = name
+        number = 2
+        while candidate.lower() in used_names:
+            candidate = f"{name}_{number}"
+            number += 1
+        used_names.add(candidate.lower())
+        names.append(candidate)
+
+    return names
+
+
+def sql_identifier(name):
+    '''
+    Met un nom de table ou de colonne entre guillemets SQL
+    '''
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteRowWriter:
+    '''
+    Ecrit des lignes au fur et a mesure dans une table SQLite : les lignes sont
+    inserees par paquets ('executemany') dans une seule transaction, les dates
+    sont enregistrees au format ISO (AAAA-MM-JJ) et les index sont crees
+    a la fin du chargement, une fois les lignes en place.
+    La base est reconstruite a chaque chargement : le journal est tenu en memoire,
+    sans fichier (il faut un journal pour qu'un point de reprise retire vraiment
+    les lignes d'un fichier en erreur) et la base n'apparait sous son nom
+    qu'a la fermeture (voir 'temporary_output')
+    '''
+
+    def __init__(self, output_file, table=SQLITE_TABLE):
+        import sqlite3          # importe a la demande
+        self.output_file = output_file
+        self.tmp_file = temporary_output(output_file)
+        discard_output(self.tmp_file)
+        self.connection = sqlite3.connect(self.tmp_file, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode = MEMORY')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('BEGIN')
+        self.table = table
+        self.columns = None
+        self.insert = None
+        self.saved_table = (None, None)
+        self.batch = []
+        self.nb_rows = 0
+
+    def create_table(self, header):
+        '''
+        Cree la table d'apres l'entete (toutes les colonnes sont du texte)
+        '''
+        self.columns = sql_column_names(header)
+        columns = ', '.join(f"{sql_identifier(name)} TEXT" for name in self.columns)
+        self.connection.execute(f"CREATE TABLE {sql_identifier(self.table)} ({columns})")
+        self.insert = f"INSERT INTO {sql_identifier(self.table)} VALUES ({', '.join('?' * len(self.columns))})"
+
+    def write_row(self, row):
+        '''
+        Ajoute une ligne de donnees au paquet en cours, insere le paquet s'il est plein
+        '''
+        self.batch.append([cell.strftime('%Y-%m-%d') if isinstance(cell, datetime) else cell for cell in row])
+        if len(self.batch) >= SQLITE_BATCH_SIZE:
+            self.flush()
+
+    def write_rows(self, rows):
+        '''
+        Ecrit toutes les lignes d'un iterable
+        '''
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        '''
+        Insere le paquet de lignes en cours
+        '''
+        if self.batch:
+            self.connection.executemany(self.insert, self.batch)
+            self.nb_rows += len(self.batch)
+            self.batch = []
+
+    def savepoint(self):
+        '''
+        Pose un point de reprise avant le chargement d'un fichier
+        '''
+        self.flush()
+        self.connection.execute('SAVEPOINT fichier')
+        self.saved_table = (self.columns, self.insert)
+
+    def rollback(self, nb_rows):
+        '''
+        Retire les lignes inserees depuis le dernier point de reprise,
+        et la table si elle a ete creee depuis
+        '''
+        self.batch = []
+        self.connection.execute('ROLLBACK TO fichier')
+        self.columns, self.insert = self.saved_table
+        self.nb_rows = nb_rows
+
+    def release(self):
+        '''
+        Libere le point de reprise une fois le fichier charge (ou retire)
+        '''
+        self.flush()
+        self.connection.execute('RELEASE fichier')
+
+    def create_indexes(self, columns):
+        '''
+        Cree un index sur chacune des colonnes presentes dans la table
+        '''
+        self.flush()
+        for name in columns:
+            if name not in (self.columns or []):
+                continue
+            index = sql_identifier(f"idx_{self.table}_{name}")
+            self.connection.execute(f"CREATE INDEX {index} ON {sql_identifier(self.table)} ({sql_identifier(name)})")
+
+    def close(self):
+        '''
+        Valide la transaction, ferme la base et l'enregistre sous son nom
+        '''
+        try:
+            self.flush()
+            self.connection.execute('COMMIT')
+            self.connection.close()
+            os.replace(self.tmp_file, self.output_file)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        ''' 
+        Abandonne la base : rien n'est ecrit sous le nom de la sortie
+        '''
+        self.connection.close()
+        discard_output(self.tmp_file)
+
+
+@functools.lru_cache(maxsize=SORT_KEY_CACHE_SIZE)
+def version_key(version):
+    ''' 
+    Cle de tri d'un numero de version : les parties numeriques sont comparees
+    comme des nombres (1.9 < 1.10), les parties alphabetiques sans tenir compte
+    de la casse et apres les nombres. Memorisee : chaque version distincte
+    n'est analysee qu'une fois
+
+    Argument:
+        version -- le numero de version (texte)
+
+    Retourne:
+        un tuple comparable
+    '''
+    return tuple((0, int(part)) if part.isdigit() else (1, part.casefold())
+                 for part in re.findall(r'\d+|[^\W\d_]+', version or ''))
+
+
+def inventory_sort_key(header):
+    ''' 
+    Construit la cle de tri des lignes d'un inventaire : DisplayName sans tenir
+    compte de la casse, puis DisplayVersion dans l'ordre des versions
+
+    Argument:
+        header -- l'entete des lignes triees
+
+    Retourne:
+        une fonction qui donne la cle d'une ligne
+    '''
+    missing = [name for name in ('DisplayName', 'DisplayVersion') if name not in header]
+    if missing:
+        raise ValueError(f"colonnes absentes de l'entete: {', '.join(missing)}")
+    name_index = header.index('DisplayName')
+    version_index = header.index('DisplayVersion')
+
+    def key(row):
+        return row[name_index].casefold(), version_key(row[version_index])
+
+    return key
+
+
+def header_aligner(header, file_header):
+    ''' 
+    Fait correspondre les colonnes d'un fichier a celles d'une sortie commune, par leur nom :
+    les proprietes d'un csv ou d'un JSON peuvent venir dans un autre ordre, les colonnes
+    de Format-Table avoir une autre disposition. Un fichier qui n'a pas les memes colonnes
+    est refuse : ses valeurs seraient perdues ou rangees sous une autre colonne
+
+    Arguments:
+        header      -- l'entete de la sortie
+        file_header -- l'entete du fichier
+
+    Retourne:
+        une fonction qui remet une ligne du fichier dans l'ordre de la sortie,
+        ou None si les colonnes sont deja dans le meme ordre
+    '''
+    if file_header == header:
+        return None
+
+    missing = collections.Counter(header) - collections.Counter(file_header)
+    extra = collections.Counter(file_header) - collections.Counter(header)
+    if missing or extra:
+        raise ValueError(f"colonnes differentes de celles du premier fichier (absentes: {', '.join(missing) or '-'}, "
+                         f"en trop: {', '.join(extra) or '-'})")
+
+    positions = {}
+    for i, name in enumerate(file_header):
+        positions.setdefault(name, []).append(i)
+    order = [positions[name].pop(0) for name in header]
+    return lambda row: [row[i] for i in order]
+
+
+class ExternalSorter:
+    ''' 
+    Tri externe de lignes a memoire bornee : les lignes sont gardees en memoire
+    jusqu'au budget, triees puis deversees sur disque en une serie (fichier temporaire) ;
+    a la lecture les series sont fusionnees (k voies) au fil de l'ecriture.
+    Le tri est stable : a cle egale, les lignes restent dans l'ordre d'arrivee
+    '''
+
+    def __init__(self, key, memory=SORT_MEMORY_BUDGET):
+        self.key = key
+        self.memory = memory
+        self.rows = []
+        self.max_rows = None
+        self.runs = []
+        self.nb_rows = 0
+
+    def add(self, row):
+        ''' 
+        Ajoute une ligne, en deversant une serie si le budget est atteint
+        '''
+        self.rows.append(row)
+        self.nb_rows += 1
+        # la taille d'une ligne est estimee sur les premieres lignes
+        if self.max_rows is None and len(self.rows) == SORT_CHUNK_ROWS:
+            row_size = sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in self.rows) / len(self.rows)
+            self.max_rows = max(SORT_CHUNK_ROWS, int(self.memory // row_size))
+        if self.max_rows is not None and len(self.rows) >= self.max_rows:
+            self.spill()
+
+    def add_rows(self, rows):
+        ''' 
+        Ajoute toutes les lignes d'un iterable
+
+        Retourne:
+            le nombre de lignes ajoutees
+        '''
+        nb_rows = self.nb_rows
+        for row in rows:
+            self.add(row)
+        return self.nb_rows - nb_rows
+
+    def spill(self):
+        ''' 
+        Trie les lignes en memoire et les ecrit dans une nouvelle serie, par paquets
+        '''
+        self.rows.sort(key=self.key)
+        f = tempfile.TemporaryFile(prefix='txt2xls-tri-')
+        for i in range(0, len(self.rows), SORT_CHUNK_ROWS):
+            pickle.dump(self.rows[i:i + SORT_CHUNK_ROWS], f, pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+        self.runs.append(f)
+        self.rows = []
+
+    def iter_run(self, f):
+        ''' 
+        Relit une serie paquet par paquet
+        '''
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+    def __iter__(self):
+        ''' 
+        Renvoie les lignes triees ; les series sont fermees (et supprimees) a la fin
+        '''
+        self.rows.sort(key=self.key)
+        try:
+            if not self.runs:
+                yield from self.rows
+            else:
+                # la derniere serie reste en memoire ; a cle egale, heapq.merge
+                # garde l'ordre des series, donc l'ordre d'arrivee
+                yield from heapq.merge(*map(self.iter_run, self.runs), self.rows, key=self.key)
+        finally:
+            self.close()
+
+    def close(self):
+        ''' 
+        Ferme les series et libere les lignes
+        '''
+        for f in self.runs:
+            f.close()
+        self.runs = []
+        self.rows = []
+
+
+def iter_inventory_rows(input_file, col_specs, metrics=NULL_METRICS, jobs=1):
+    '''
+    Le flux de lignes d'un inventaire, commun a toutes les sorties :
+    detection de l'encodage et du format, decoupage des colonnes puis normalisation
+
+    Arguments:
+        input_file -- le chemin vers le fichier (Format-Table, Export-Csv ou ConvertTo-Json)
+        col_specs  -- liste de tuples (debut, fin) des colonnes de Format-Table
+                      (None: deduites de la ligne de soulignement de chaque fichier)
+        metrics    -- les mesures par etape (desactivees par defaut)
+        jobs       -- le nombre de processus qui decoupent et normalisent
+                      le fichier (1: tout dans ce processus, None: nombre de coeurs) ;
+                      seule la sortie Format-Table est analysee en parallele
+
+    Retourne:
+        un iterateur sur l'entete puis les lignes de donnees
+    '''
+    with metrics.stage('detect_encoding'):
+        encoding = detect_encoding(input_file)
+        input_format = detect_file_format(input_file, encoding)
+
+        if input_format == 'table':
+            col_specs = resolve_col_specs(input_file, encoding, col_specs)
+
+    if input_format != 'table':
+        jobs = 1
+    if jobs == 1:
+        rows = metrics.wrap('slice', iter_input_rows(input_file, encoding, col_specs, input_format))
+        rows = metrics.wrap('normalize', iter_table_rows(rows, date_column=input_date_column(input_format)))
+    else:
+        # decoupage et normalisation ont lieu dans le pool : on mesure l'attente des plages
+        rows = metrics.wrap('parallel_parse', iter_parallel_rows(input_file, encoding, col_specs, jobs))
+
+    if metrics.enabled:
+        metrics.add('slice' if jobs == 1 else 'parallel_parse', bytes_read=input_size(input_file))
+    return rows
+
+
+def convert_text_to_excel_stream(input_file, output_file, col_specs, metrics=NULL_METRICS, jobs=1,
+                                 sort=False, sort_memory=SORT_MEMORY_BUDGET):
+    ''' 
+    Convertit le fichier texte en fichier Excel en une seule passe :
+    chaque ligne est lue, decoupee, normalisee puis ecrite directement,
+    sans fichier temporaire (sauf les series du tri externe avec 'sort')
+
+    Arguments:
+        input_file  -- le chemin vers le fichier texte
+        output_file -- le chemin du fichier Excel de sortie
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        metrics     -- les mesures par etape (desactivees par defaut)
+        jobs        -- le nombre de processus qui decoupent et normalisent
+                       le fichier (1: tout dans ce processus, None: nombre de coeurs)
+        sort        -- trier les lignes par DisplayName puis DisplayVersion
+        sort_memory -- la memoire du tri en octets, au-dela les lignes sont deversees sur disque
+
+    Retourne:
+        le nombre de lignes ecrites
+    '''
+    rows = iter_inventory_rows(input_file, col_specs, metrics, jobs)
+    if sort:
+        rows = iter_sorted_table(rows, sort_memory, metrics)
+    with metrics.stage('xlsx_write'):
+        nb_rows = write_rows_to_excel(rows, output_file)
+
+    if metrics.enabled:
+        metrics.add('xlsx_write', bytes_written=os.path.getsize(output_file), rows=nb_rows)
+    return nb_rows
+
+
+def iter_sorted_table(rows, memory=SORT_MEMORY_BUDGET, metrics=NULL_METRICS):
+    ''' 
+    Trie un flux d'entete puis de lignes (voir 'ExternalSorter') : toutes les lignes
+    sont lues avant que la premiere ligne triee soit rendue
+
+    Retourne:
+        un generateur sur l'entete puis les lignes triees
+    '''
+    header = next(rows, None)
+    if header is None:
+        return
+    sorter = ExternalSorter(inventory_sort_key(header), memory)
+    with metrics.stage('sort'):
+        sorter.add_rows(rows)
+    yield header
+    yield from sorter
+
+
+def convert_text_to_excel_legacy(input_file, output_file, col_specs, delimiter, metrics=NULL_METRICS):
+    ''' 
+    Convertit le fichier texte en fichier Excel en passant par des fichiers colonne
+    et un fichier csv, dans un repertoire temporaire propre a cette execution
+
+    Arguments:
+        input_file  -- le chemin vers le fichier texte
+        output_file -- le chemin du fichier Excel de sortie
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        delimiter   -- le separateur de champ du fichier csv
+        metrics     -- les mesures par etape (desactivees par defaut)
+
+    Retourne:
+        le nombre de lignes de donnees ecrites
+    '''
+    # les fichiers colonne n'existent que pour Format-Table : les autres formats passent par le flux
+    encoding = detect_encoding(input_file)
+    if detect_file_format(input_file, encoding) != 'table':
+        return convert_text_to_excel_stream(input_file, output_file, col_specs, metrics)
+    col_specs = resolve_col_specs(input_file, encoding, col_specs)
+
+    # on cree le repertoire temporaire, propre a cette execution
+    os.makedirs(os.path.join('data', 'tmp'), exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix='txt2xls-', dir=os.path.join('data', 'tmp'))
+
+    try:
+        # liste de tuples, ou chaque tuple specifie le nom du fichier colonne temporaire
+        col_files = [os.path.join(temp_dir, f"col{i+1}.txt") for i in range(len(col_specs))]
+
+        # on extrait les colonnes et on recupere une liste des colonnes
+        with metrics.stage('extract_columns'):
+            columns = extract_columns(input_file, col_specs)
+        metrics.add('extract_columns', bytes_read=input_size(input_file), rows=len(columns[0]))
+
+        # Normaliser la dernière colonne
+        with metrics.stage('normalize'):
+            columns[-1] = normalize_dates_in_column(columns[-1])
+        metrics.add('normalize', rows=len(columns[-1]))
+
+        # on sauve les colonnes dans des fichiers temporaires puis on les reunit en csv
+        output_csv_file = os.path.join(temp_dir, 'fichier.csv')
+        with metrics.stage('csv_merge'):
+            save_columns_to_files(columns, col_files)
+            merge_columns_to_csv(output_csv_file, col_files, delimiter)
+
+        with metrics.stage('xlsx_write'):
+            nb_rows = convert_csv_to_excel(output_csv_file, output_file, delimiter, date_column=-1)
+
+        if metrics.enabled:
+            metrics.add('csv_merge', bytes_written=os.path.getsize(output_csv_file))
+            metrics.add('xlsx_write', bytes_read=os.path.getsize(output_csv_file))
+            metrics.add('xlsx_write', bytes_written=os.path.getsize(output_file))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return nb_rows
+
+
+def save_columns_to_files(columns, output_files):
+    ''' 
+    Cette fonction enregistre dans des fichiers temporaires les colonnes,
+    un fichier par colonne en lisant une ligne dans chaque fichier grace a zip
+
+    Arguments:
+        columns     -- la liste des colonnes
+        output_file -- la liste des noms de fichiers colonne
+    ''' 
+    for col, output_file in zip(columns, output_files):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(col) + '\n')
+
+
+def merge_columns_to_csv(output_file, col_files, delimiter):
+    ''' 
+    Cette fonction reunit dans un fichier les colonnes,
+    en lisant une ligne dans chaque fichier grace a zip
+
+    Arguments:
+        output_file -- la liste des noms de fichiers colonne
+        output_file -- la liste des fichiers colonnes
+        delimiter   -- le separateur de champ
+    ''' 
+
+    col_data = [read_file_lines(col_file, 'utf-8') for col_file in col_files]
+    with open(output_file, 'w', encoding='utf-8') as f_out:
+        for row in zip(*col_data):
+            f_out.write(delimiter.join(cell.strip() for cell in row) + '\n')
+
+
+def convert_csv_to_excel(input_file, output_file, delimiter="\t", date_column=None):
+    '''
+    Convertit le fichier csv en fichier Excel. Les erreurs sont levees,
+    c'est a l'appelant de les signaler
+
+    Arguments:
+        input_file  -- le chemin du fichier csv
+        output_file -- le chemin du fichier Excel de sortie
+        delimiter   -- le separateur de champ du fichier csv
+        date_column -- l'indice de la colonne des dates jj/mm/aaaa, s'il y en a une
+
+    Retourne:
+        le nombre de lignes de donnees ecrites
+    '''
+    # le fichier csv est lu et ecrit ligne par ligne, sans DataFrame intermediaire
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        rows = csv.reader((line for line in f if line.strip()), delimiter=delimiter)
+        header = next(rows, None)
+
+        with ExcelRowWriter(output_file) as writer:
+            if header is not None:
+                writer.add_sheet('Inventaire', header)
+
+                # la colonne des dates jj/mm/aaaa devient une colonne de vraies dates Excel
+                for row in rows:
+                    if date_column is not None and row:
+                        row[date_column] = parse_date(row[date_column])
+                    writer.write_row(row)
+
+    return writer.nb_rows
+
+
+def file_digest(file_path):
+    ''' 
+    Calcule l'empreinte SHA-256 du contenu d'un fichier, lu par blocs.
+    Un membre d'archive zip est lu decompresse, un fichier .gz ou .xz tel quel
+    '''
+    digest = hashlib.sha256()
+    with (open_input(file_path) if split_archive_path(file_path)[1] else open(file_path, 'rb')) as f:
+        for chunk in iter(lambda: f.read(DECODE_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def conversion_cache_key(input_files, options, digests=None):
+    ''' 
+    Construit la cle du cache des conversions a partir du contenu des fichiers
+    et des options qui changent le resultat (colonnes, dates, format...)
+
+    Arguments:
+        input_files -- la liste des fichiers texte convertis ensemble
+        options     -- un dictionnaire des options de la conversion
+        digests     -- les empreintes des fichiers, si elles sont deja calculees
+
+    Retourne:
+        la cle (empreinte hexadecimale)
+    '''
+    options = dict(options, version=CONVERSION_CACHE_VERSION)
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    for content_digest in digests or map(file_digest, input_files):
+        digest.update(content_digest.encode('ascii'))
+
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination):
+    ''' 
+    Cree un lien physique vers le fichier, ou une copie si le lien est impossible
+    (autre systeme de fichiers...), de facon atomique
+    '''
+    tmp_file = f"{destination}.{os.getpid()}.tmp"
+    try:
+        os.link(source, tmp_file)
+    except OSError:
+        shutil.copyfile(source, tmp_file)
+    os.replace(tmp_file, destination)
+    # renommer un lien sur un autre lien du meme fichier ne fait rien (POSIX) :
+    # la sortie pointait deja vers cette entree du cache, le lien temporaire reste
+    if os.path.lexists(tmp_file):
+        os.remove(tmp_file)
+
+
+def temporary_output(output_file):
+    ''' 
+    Prepare l'ecriture atomique d'un fichier de sortie : le repertoire est cree
+    et le fichier est ecrit sous un nom temporaire propre au processus, puis
+    renomme une fois complet. Une conversion interrompue ne laisse donc jamais
+    une sortie partielle sous le nom attendu, et le renommage remplace
+    un eventuel lien vers le cache sans toucher a l'entree du cache
+
+    Retourne:
+        le chemin temporaire
+    '''
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    return f"{output_file}.{os.getpid()}.tmp"
+
+
+def discard_output(tmp_file):
+    ''' 
+    Supprime le fichier temporaire d'une sortie abandonnee
+    '''
+    with contextlib.suppress(OSError):
+        os.remove(tmp_file)
+
+
+def conversion_cache_lookup(key, output_file):
+    ''' 
+    Cherche une conversion dans le cache ; si elle existe, le fichier de sortie
+    devient un lien vers le resultat deja calcule
+
+    Retourne:
+        les informations enregistrees avec la conversion, ou None
+    '''
+    entry = os.path.join(CONVERSION_CACHE_DIR, key + '.out')
+    try:
+        with open(os.path.join(CONVERSION_CACHE_DIR, key + '.json'), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        link_or_copy(entry, output_file)
+        # la date de modification sert a l'eviction des entrees les moins utilisees
+        os.utime(entry)
+    except (OSError, ValueError):
+        return None
+
+    return info
+
+
+def conversion_cache_store(key, output_file, info):
+    ''' 
+    Enregistre le resultat d'une conversion dans le cache
+    '''
+    try:
+        os.makedirs(CONVERSION_CACHE_DIR, exist_ok=True)
+        link_or_copy(output_file, os.path.join(CONVERSION_CACHE_DIR, key + '.out'))
+        meta_file = os.path.join(CONVERSION_CACHE_DIR, key + '.json')
+        with open(f"{meta_file}.{os.getpid()}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(f"{meta_file}.{os.getpid()}.tmp", meta_file)
+    except OSError as e:
+        print(f"Impossible d'enregistrer {output_file} dans le cache. Raison: {e}")
+
+
+def conversion_cache_entries():
+    ''' 
+    Liste les entrees du cache des conversions
+
+    Retourne:
+        une liste de tuples (date du dernier usage, taille, chemin), la plus ancienne en tete
+    '''
+    entries = []
+    if os.path.isdir(CONVERSION_CACHE_DIR):
+        for entry in os.scandir(CONVERSION_CACHE_DIR):
+            if entry.name.endswith('.out') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    return sorted(entries)
+
+
+def evict_conversion_cache(max_size):
+    ''' 
+    Supprime les entrees les moins recemment utilisees jusqu'a ce que
+    le cache ne depasse plus 'max_size' octets
+    '''
+    entries = conversion_cache_entries()
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_size <= max_size:
+            break
+        for file_path in (path, path[:-len('.out')] + '.json'):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        total_size -= size
+
+
+def purge_conversion_cache():
+    ''' 
+    Vide entierement le cache des conversions
+    '''
+    shutil.rmtree(CONVERSION_CACHE_DIR, ignore_errors=True)
+
+
+def print_conversion_cache_info(max_size):
+    ''' 
+    Affiche le contenu du cache des conversions
+    '''
+    entries = conversion_cache_entries()
+    total_size = sum(size for _, size, _ in entries)
+    print(f"Cache {CONVERSION_CACHE_DIR} : {len(entries)} conversions, "
+          f"{total_size / 2**20:.1f} Mo sur {max_size / 2**20:.0f} Mo")
+    for mtime, size, path in reversed(entries):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime))} {size:>12} {os.path.basename(path)}")
+
+
+def list_batch_inputs(source):
+    ''' 
+    Liste les fichiers a convertir en mode lot
+
+    Argument:
+        source -- un repertoire (ses fichiers .txt, .csv, .json, compresses ou non, et ses archives zip,
+                  recursivement), un motif glob ou un manifeste (un chemin par ligne,
+                  relatif au manifeste)
+
+    Retourne:
+        la liste triee des chemins des fichiers, chaque archive zip etant
+        remplacee par les chemins de ses membres ('releves.zip/pc1.txt')
+    '''
+    if os.path.isdir(source):
+        patterns = [
+            pattern + extension for pattern in BATCH_PATTERNS for extension in ('',) + COMPRESSED_EXTENSIONS
+        ] + ['*' + ARCHIVE_EXTENSION]
+        paths = [
+            path for pattern in patterns
+            for path in glob.glob(os.path.join(glob.escape(source), '**', pattern), recursive=True) if os.path.isfile(path)
+        ]
+
+    elif any(c in source for c in '*?['):
+        paths = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+
+    elif source.lower().endswith(ARCHIVE_EXTENSION):
+        paths = [source]
+
+    else:
+        # un fichier absent du manifeste apparaitra en erreur dans le bilan
+        base = os.path.dirname(source)
+        with open(source, 'r', encoding='utf-8') as f:
+            paths = [os.path.join(base, line.strip()) for line in f if line.strip() and not line.startswith('#')]
+
+    # les membres d'une archive sont des entrees a part entiere, lues sans extraction
+    paths = [
+        member for path in paths
+        for member in (list_archive_members(path) if path.lower().endswith(ARCHIVE_EXTENSION) and os.path.isfile(path) else [path])
+    ]
+    return sorted(set(paths))
+
+
+def batch_output_path(input_file, root, output_dir, extension='.xlsx'):
+    ''' 
+    Construit le chemin de sortie d'un fichier du lot : l'arborescence
+    sous 'root' est reproduite dans 'output_dir', deux machines ayant
+    chacune leur 'scanpc.txt' ne s'ecrasent donc pas ; une archive zip
+    y est un repertoire et l'extension de compression disparait
+    '''
+    relative_path = os.path.relpath(os.path.abspath(input_name(input_file)), root)
+    return os.path.join(output_dir, os.path.splitext(relative_path)[0] + extension)
+
+
+def convert_file(input_file, output_file, col_specs, use_cache=True, metrics=NULL_METRICS, jobs=1,
+                 sort=False, sort_memory=SORT_MEMORY_BUDGET, digest=False):
+    ''' 
+    Convertit un fichier en mode flux, sans repertoire temporaire.
+    Un fichier deja converti avec les memes options est repris du cache.
+    Les erreurs ne sont pas propagees mais rapportees dans le resultat
+
+    Arguments:
+        input_file  -- le chemin vers le fichier texte
+        output_file -- le chemin du fichier Excel de sortie
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        use_cache   -- utiliser le cache des conversions
+        metrics     -- les mesures par etape (desactivees par defaut)
+        jobs        -- le nombre de processus qui analysent le fichier
+        sort        -- trier les lignes par DisplayName puis DisplayVersion
+        sort_memory -- la memoire du tri en octets
+        digest      -- calculer l'empreinte du contenu meme sans le cache
+                       (pour le journal d'un lot)
+
+    Retourne:
+        un dictionnaire avec le statut, le nombre de lignes, la duree
+        et l'empreinte du contenu si elle a ete calculee (sinon '')
+    '''
+    start = time.perf_counter()
+    result = {'input': input_file, 'output': output_file, 'status': 'ok', 'rows': 0, 'error': '', 'cached': False, 'digest': ''}
+    try:
+        key = None
+        info = None
+        # l'empreinte lit tout le fichier : seuls le cache et le journal d'un lot s'en servent
+        if use_cache or digest:
+            with metrics.stage('digest'):
+                result['digest'] = file_digest(input_file)
+        if use_cache:
+            with metrics.stage('cache'):
+                key = conversion_cache_key([input_file], stream_options(col_specs, sort=sort), [result['digest']])
+                info = conversion_cache_lookup(key, output_file)
+            if metrics.enabled:
+                metrics.add('cache', bytes_read=input_size(input_file))
+
+        if info is not None:
+            result['rows'] = info['rows']
+            result['cached'] = True
+        else:
+            result['rows'] = convert_text_to_excel_stream(input_file, output_file, col_specs, metrics, jobs, sort, sort_memory)
+            if key is not None:
+                with metrics.stage('cache'):
+                    conversion_cache_store(key, output_file, {'rows': result['rows']})
+    except Exception as e:
+        result['status'] = 'erreur'
+        result['error'] = f"{type(e).__name__}: {e}"
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def convert_file_measured(input_file, output_file, col_specs, use_cache=True, sort=False, sort_memory=SORT_MEMORY_BUDGET,
+                          digest=False):
+    ''' 
+    Comme 'convert_file', avec des mesures propres au processus qui convertit :
+    elles sont renvoyees dans le resultat pour etre ajoutees a celles du lot
+    '''
+    metrics = PipelineMetrics()
+    result = convert_file(input_file, output_file, col_specs, use_cache, metrics, sort=sort, sort_memory=sort_memory,
+                          digest=digest)
+    result['metrics'] = metrics.stages
+    return result
+
+
+def stream_options(col_specs, **options):
+    ''' 
+    Options d'une conversion en mode flux, pour la cle du cache
+    '''
+    return dict(options, col_specs=col_specs, dates=EXCEL_DATE_FORMAT, format='xlsx', mode='stream')
+
+
+def load_batch_journal(journal_file):
+    ''' 
+    Relit le journal d'un lot. La derniere entree d'un fichier l'emporte ;
+    une ligne tronquee par un arret brutal est ignoree
+
+    Retourne:
+        le dictionnaire {chemin absolu du fichier: derniere entree}
+    '''
+    entries = {}
+    try:
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[entry['input']] = entry
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+
+    return entries
+
+
+def input_stat(input_file):
+    ''' 
+    Taille et date de modification d'une entree (de son archive pour un membre),
+    pour reconnaitre au redemarrage un fichier deja converti sans le relire
+    '''
+    stat = os.stat(split_archive_path(input_file)[0])
+    return stat.st_size, stat.st_mtime_ns
+
+
+def is_journal_done(entry, input_file, output_file):
+    ''' 
+    Indique si le journal atteste qu'un fichier a deja ete converti vers cette sortie :
+    conversion reussie, fichier inchange depuis et sortie toujours presente.
+    Une sortie n'existe sous son nom qu'une fois complete (voir 'temporary_output')
+    '''
+    if entry is None or entry.get('status') != 'ok' or entry.get('output') != os.path.abspath(output_file):
+        return False
+    try:
+        return [entry.get('size'), entry.get('mtime')] == list(input_stat(input_file)) and os.path.isfile(output_file)
+    except OSError:
+        return False
+
+
+def write_journal_entry(f, result):
+    ''' 
+    Ajoute au journal le resultat d'un fichier (statut, sortie, empreinte, duree),
+    ecrit aussitot : apres un arret brutal seul le travail en cours est perdu
+    '''
+    entry = {
+        'input': os.path.abspath(result['input']),
+        'output': os.path.abspath(result['output']),
+        'status': result['status'],
+        'rows': result['rows'],
+        'digest': result.get('digest', ''),
+        'seconds': round(result['seconds'], 3),
+        'cached': result['cached'],
+        'error': result['error'],
+        'date': datetime.now().isoformat(timespec='seconds'),
+    }
+    try:
+        entry['size'], entry['mtime'] = input_stat(result['input'])
+    except OSError:
+        entry['size'] = entry['mtime'] = None
+    f.write(json.dumps(entry) + '\n')
+    f.flush()
+
+
+def convert_batch(inputs, output_dir, col_specs, jobs=None, use_cache=True, metrics=NULL_METRICS,
+                  journal_file=None, resume=False, sort=False, sort_memory=SORT_MEMORY_BUDGET):
+    ''' 
+    Convertit un lot de fichiers en les repartissant sur un pool de processus.
+    Chaque resultat est ajoute au journal des qu'il est connu ; avec 'resume'
+    les fichiers que le journal donne deja convertis (et inchanges) sont sautes
+
+    Arguments:
+        inputs       -- la liste des fichiers texte
+        output_dir   -- le repertoire des fichiers Excel de sortie
+        col_specs    -- liste de tuples (debut, fin) des colonnes
+        jobs         -- le nombre de processus (par defaut: nombre de coeurs)
+        use_cache    -- utiliser le cache des conversions
+        metrics      -- les mesures par etape, cumulees sur tout le lot
+        journal_file -- le journal du lot (aucun par defaut)
+        resume       -- reprendre d'apres le journal
+        sort         -- trier les lignes de chaque fichier (voir 'convert_file')
+        sort_memory  -- la memoire du tri de chaque processus en octets
+
+    Retourne:
+        la liste des resultats de 'convert_file', dans l'ordre des fichiers
+    '''
+    if not inputs:
+        return []
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(input_name(path))) for path in inputs])
+    outputs = [batch_output_path(path, root, output_dir) for path in inputs]
+    # un inventaire livre sous deux formes (pc1.txt et pc1.txt.gz) garde son nom complet
+    counts = collections.Counter(outputs)
+    outputs = [
+        output if counts[output] == 1 else os.path.join(output_dir, os.path.relpath(os.path.abspath(path), root) + '.xlsx')
+        for path, output in zip(inputs, outputs)
+    ]
+    tasks = [(path, output, col_specs, use_cache) for path, output in zip(inputs, outputs)]
+
+    results = [None] * len(tasks)
+    entries = load_batch_journal(journal_file) if journal_file and resume else {}
+    for i, (path, output, _, _) in enumerate(tasks):
+        entry = entries.get(os.path.abspath(path))
+        if is_journal_done(entry, path, output):
+            results[i] = {'input': path, 'output': output, 'status': 'ok', 'rows': entry['rows'], 'error': '',
+                          'cached': False, 'digest': entry.get('digest', ''), 'seconds': 0.0, 'resumed': True}
+    todo = [i for i, result in enumerate(results) if result is None]
+    # le journal garde l'empreinte de chaque fichier, meme sans le cache
+    digest = bool(journal_file)
+
+    with contextlib.ExitStack() as stack:
+        journal = None
+        if journal_file:
+            os.makedirs(os.path.dirname(journal_file) or '.', exist_ok=True)
+            journal = stack.enter_context(open(journal_file, 'a', encoding='utf-8'))
+
+        def finish(i, result):
+            results[i] = result
+            if journal is not None:
+                write_journal_entry(journal, result)
+
+        if jobs == 1:
+            for i in todo:
+                finish(i, convert_file(*tasks[i], metrics, sort=sort, sort_memory=sort_memory, digest=digest))
+            return results
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed     # importes a la demande
+
+        # chaque processus mesure ses conversions, les mesures sont cumulees ici
+        worker = convert_file_measured if metrics.enabled else convert_file
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(worker, *tasks[i], sort=sort, sort_memory=sort_memory, digest=digest): i
+                       for i in todo}
+            for future in as_completed(futures):
+                result = future.result()
+                if 'metrics' in result:
+                    metrics.merge(result.pop('metrics'))
+                finish(futures[future], result)
+
+    return results
+
+
+class RowSpool:
+    ''' 
+    Lignes mises de cote dans l'ordre d'arrivee, par paquets, dans un fichier
+    temporaire qui reste en memoire jusqu'a 'memory' octets : les lignes d'un fichier
+    ne sont ajoutees a une sortie commune qu'une fois le fichier lu sans erreur
+    '''
+
+    def __init__(self, memory=MERGE_SPOOL_SIZE):
+        self.file = tempfile.SpooledTemporaryFile(max_size=memory, prefix='txt2xls-lot-')
+        self.chunk = []
+        self.nb_rows = 0
+
+    def add_rows(self, rows):
+        ''' 
+        Met de cote toutes les lignes d'un iterable
+
+        Retourne:
+            le nombre de lignes ajoutees
+        '''
+        nb_rows = self.nb_rows
+        for row in rows:
+            self.chunk.append(row)
+            if len(self.chunk) == MERGE_CHUNK_ROWS:
+                pickle.dump(self.chunk, self.file, pickle.HIGHEST_PROTOCOL)
+                self.chunk = []
+            self.nb_rows += 1
+        return self.nb_rows - nb_rows
+
+    def __iter__(self):
+        ''' 
+        Relit les lignes dans l'ordre ; le fichier est ferme a la fin
+        '''
+        try:
+            if self.chunk:
+                pickle.dump(self.chunk, self.file, pickle.HIGHEST_PROTOCOL)
+                self.chunk = []
+            self.file.seek(0)
+            while True:
+                try:
+                    chunk = pickle.load(self.file)
+                except EOFError:
+                    return
+                yield from chunk
+        finally:
+            self.close()
+
+    def close(self):
+        ''' 
+        Ferme le fichier et oublie les lignes
+        '''
+        self.file.close()
+        self.chunk = []
+
+
+def host_names(inputs):
+    ''' 
+    Donne un nom de machine a chaque fichier : le nom du fichier s'il est unique
+    dans le lot, sinon le nom de son repertoire (pc1/scanpc.txt, pc2/scanpc.txt...),
+    sinon son chemin relatif
+    '''
+    paths = [os.path.abspath(input_name(path)) for path in inputs]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    candidates = [
+        [os.path.splitext(os.path.basename(path))[0] for path in paths],
+        [os.path.basename(os.path.dirname(path)) for path in paths],
+        [os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '/') for path in paths],
+    ]
+    for names in candidates:
+        if len(set(names)) == len(names):
+            return names
+
+    return candidates[-1]
+
+
+def merge_to_excel(inputs, output_file, col_specs, sheet_per_host=False, use_cache=True, metrics=NULL_METRICS,
+                   sort=False, sort_memory=SORT_MEMORY_BUDGET):
+    ''' 
+    Reunit plusieurs inventaires dans un seul classeur : une feuille par machine,
+    ou une feuille commune avec le nom de la machine en premiere colonne ; les colonnes
+    de chaque fichier y sont remises dans l'ordre du premier (voir 'header_aligner').
+    Les lignes d'un fichier sont mises de cote pendant sa lecture (voir 'RowSpool')
+    et ne sont ecrites qu'une fois le fichier lu sans erreur
+
+    Arguments:
+        inputs         -- la liste des fichiers texte
+        output_file    -- le chemin du fichier Excel de sortie
+        col_specs      -- liste de tuples (debut, fin) des colonnes
+        sheet_per_host -- une feuille par machine plutot qu'une feuille commune
+        use_cache      -- utiliser le cache des conversions
+        metrics        -- les mesures par etape (desactivees par defaut)
+        sort           -- trier chaque feuille par DisplayName puis DisplayVersion :
+                          la feuille commune est triee sur tout le lot, a memoire bornee
+        sort_memory    -- la memoire du tri en octets
+
+    Retourne:
+        la liste des resultats par fichier (statut, nombre de lignes, duree)
+    '''
+    key = None
+    if use_cache:
+        options = stream_options(col_specs, hosts=host_names(inputs), sheet_per_host=sheet_per_host, sort=sort)
+        with metrics.stage('cache'):
+            try:
+                key = conversion_cache_key(inputs, options)
+            except OSError:
+                key = None
+            info = conversion_cache_lookup(key, output_file) if key else None
+        if info is not None:
+            return [dict(result, cached=True, seconds=0.0) for result in info['results']]
+
+    # les lignes d'un fichier sont mises de cote pendant sa lecture : un fichier en erreur
+    # ne laisse rien dans le classeur ; la feuille commune triee n'est ecrite qu'une fois tout le lot lu
+    sorter = None
+    sheet_header = None
+    results = []
+    with ExcelRowWriter(output_file) as writer:
+        for input_file, host in zip(inputs, host_names(inputs)):
+            start = time.perf_counter()
+            result = {'input': input_file, 'output': output_file, 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+            spool = RowSpool()
+            try:
+                rows = iter_inventory_rows(input_file, col_specs, metrics)
+                header = next(rows, None)
+                if header is not None:
+                    if not sheet_per_host:
+                        # la feuille commune a les colonnes du premier fichier lu
+                        align = header_aligner(sheet_header, header) if sheet_header is not None else None
+                        if align is not None:
+                            header = sheet_header
+                            rows = map(align, rows)
+                        header = [HOST_COLUMN] + header
+                        rows = ([host] + row for row in rows)
+                    # la cle de tri est verifiee avant la lecture
+                    sort_key = inventory_sort_key(header) if sort else None
+                    result['rows'] = spool.add_rows(rows)
+            except Exception as e:
+                spool.close()
+                result['status'] = 'erreur'
+                result['error'] = f"{type(e).__name__}: {e}"
+                result['rows'] = 0
+                header = None
+
+            if header is not None:
+                if sheet_per_host:
+                    writer.add_sheet(host, header)
+                    rows = spool
+                    if sort:
+                        file_sorter = ExternalSorter(sort_key, sort_memory)
+                        with metrics.stage('sort'):
+                            file_sorter.add_rows(spool)
+                        rows = file_sorter
+                    with metrics.stage('xlsx_write'):
+                        writer.write_rows(rows)
+                else:
+                    if writer.worksheet is None:
+                        sheet_header = header[1:]
+                        writer.add_sheet('Inventaire', header)
+                        if sort:
+                            sorter = ExternalSorter(sort_key, sort_memory)
+                    if sorter is not None:
+                        with metrics.stage('sort'):
+                            sorter.add_rows(spool)
+                    else:
+                        with metrics.stage('xlsx_write'):
+                            writer.write_rows(spool)
+            result['seconds'] = time.perf_counter() - start
+            results.append(result)
+
+        with metrics.stage('xlsx_write'):
+            if sorter is not None:
+                writer.write_rows(sorter)
+            writer.close()
+    if metrics.enabled:
+        metrics.add('xlsx_write', bytes_written=os.path.getsize(output_file), rows=writer.nb_rows)
+
+    if key is not None and all(result['status'] == 'ok' for result in results):
+        conversion_cache_store(key, output_file, {'results': results})
+    return results
+
+
+def load_to_sqlite(inputs, output_file, col_specs, indexes=False, jobs=1, metrics=NULL_METRICS):
+    '''
+    Charge un ou plusieurs inventaires dans une table SQLite, avec le nom de
+    la machine et le fichier d'origine de chaque ligne. Les lignes viennent du meme
+    flux que la sortie Excel ; un fichier en erreur ne laisse aucune ligne dans la table,
+    les colonnes des suivants sont remises dans l'ordre du premier (voir 'header_aligner').
+    La base n'est pas mise en cache : elle est faite pour etre interrogee, voire modifiee
+
+    Arguments:
+        inputs      -- la liste des fichiers texte
+        output_file -- le chemin de la base SQLite
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        indexes     -- indexer la machine et les colonnes de SQLITE_INDEX_COLUMNS
+        jobs        -- le nombre de processus qui analysent chaque fichier
+        metrics     -- les mesures par etape (desactivees par defaut)
+
+    Retourne:
+        la liste des resultats par fichier (statut, nombre de lignes, duree)
+    '''
+    writer = SqliteRowWriter(output_file)
+    table_header = None
+    results = []
+    for input_file, host in zip(inputs, host_names(inputs)):
+        start = time.perf_counter()
+        result = {'input': input_file, 'output': output_file, 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+        nb_rows = writer.nb_rows
+        writer.savepoint()
+        try:
+            rows = iter_inventory_rows(input_file, col_specs, metrics, jobs)
+            header = next(rows, None)
+            if header is not None:
+                # la table a les colonnes du premier fichier lu
+                if table_header is None:
+                    table_header = header
+                    writer.create_table([HOST_COLUMN, SQLITE_SOURCE_COLUMN] + header)
+                align = header_aligner(table_header, header)
+                if align is not None:
+                    rows = map(align, rows)
+                with metrics.stage('sqlite_write'):
+                    writer.write_rows([host, input_file] + row for row in rows)
+                    writer.flush()
+        except Exception as e:
+            writer.rollback(nb_rows)
+            if writer.columns is None:
+                table_header = None
+            result['status'] = 'erreur'
+            result['error'] = f"{type(e).__name__}: {e}"
+        writer.release()
+
+        result['rows'] = writer.nb_rows - nb_rows
+        result['seconds'] = time.perf_counter() - start
+        results.append(result)
+
+    with metrics.stage('sqlite_write'):
+        if writer.columns is None:
+            writer.create_table([HOST_COLUMN, SQLITE_SOURCE_COLUMN])
+        if indexes:
+            writer.create_indexes((HOST_COLUMN,) + SQLITE_INDEX_COLUMNS)
+        writer.close()
+    if metrics.enabled:
+        metrics.add('sqlite_write', bytes_written=os.path.getsize(output_file), rows=writer.nb_rows)
+
+    return results
+
+
+def format_batch_result(result):
+    ''' 
+    Met en forme la ligne de bilan d'un fichier : statut, duree, lignes et erreur
+    '''
+    line = f"{result['status']:<7} {result['seconds']:8.2f}s {result['rows']:>9} lignes  {result['input']}"
+    if result['error']:
+        line += f"  ({result['error']})"
+    if result.get('cached'):
+        line += "  [cache]"
+    if result.get('resumed'):
+        line += "  [journal]"
+    return line
+
+
+def diff_host_names(old_inputs, new_inputs):
+    ''' 
+    Donne un nom de machine aux fichiers des deux inventaires compares : deux
+    fichiers seuls sont deux releves de la meme machine (le nom du plus recent),
+    sinon chaque lot est nomme comme avec 'host_names'
+
+    Retourne:
+        un tuple (noms des anciens fichiers, noms des nouveaux fichiers)
+    '''
+    if len(old_inputs) == 1 and len(new_inputs) == 1:
+        name = host_names(new_inputs)[0]
+        return [name], [name]
+    return host_names(old_inputs), host_names(new_inputs)
+
+
+def diff_column_indexes(header):
+    ''' 
+    Cherche dans l'entete d'un inventaire les colonnes de la cle et de la version
+
+    Retourne:
+        un tuple (indices des colonnes de la cle, indice de la colonne de la version)
+    '''
+    missing = [name for name in DIFF_KEY_COLUMNS + (DIFF_VERSION_COLUMN,) if name not in header]
+    if missing:
+        raise ValueError(f"colonnes absentes de l'entete: {', '.join(missing)}")
+    return [header.index(name) for name in DIFF_KEY_COLUMNS], header.index(DIFF_VERSION_COLUMN)
+
+
+def diff_inventories(old_inputs, new_inputs, output_file, col_specs, jobs=1, metrics=NULL_METRICS):
+    ''' 
+    Compare deux releves d'inventaire (un fichier ou un lot chacun) machine par machine
+    et ecrit les logiciels ajoutes, supprimes et dont la version a change.
+    L'ancien releve est indexe dans un dictionnaire par (machine, DisplayName, Publisher),
+    le nouveau est lu en flux contre cet index : la comparaison est lineaire et
+    seules les lignes anciennes et les differences sont gardees en memoire.
+    Une machine absente d'un des releves, ou dont un fichier est en erreur,
+    n'est pas comparee
+
+    Arguments:
+        old_inputs  -- la liste des fichiers texte de l'ancien releve
+        new_inputs  -- la liste des fichiers texte du nouveau releve
+        output_file -- le classeur Excel, ou la base SQLite, des differences
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        jobs        -- le nombre de processus qui analysent chaque fichier
+        metrics     -- les mesures par etape (desactivees par defaut)
+
+    Retourne:
+        un tuple (resultats par fichier comme 'load_to_sqlite', nombre de
+        differences par type de changement, machines qui n'ont pas ete comparees)
+    '''
+    old_hosts, new_hosts = diff_host_names(old_inputs, new_inputs)
+    results = []
+    failed_hosts = set()
+    header = None
+
+    # machine -> cle -> version -> lignes anciennes ; les chaines repetees d'une
+    # machine a l'autre (editeurs, versions, noms) ne sont gardees qu'une fois
+    index = {}
+    strings = {}
+    # machine -> cle -> lignes nouvelles sans equivalent dans l'ancien releve
+    added = {}
+
+    for side, inputs, hosts in (('old', old_inputs, old_hosts), ('new', new_inputs, new_hosts)):
+        for input_file, host in zip(inputs, hosts):
+            start = time.perf_counter()
+            result = {'input': input_file, 'output': output_file, 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+            try:
+                rows = iter_inventory_rows(input_file, col_specs, metrics, jobs)
+                file_header = next(rows, None)
+                if file_header is None:
+                    rows = ()
+                else:
+                    diff_column_indexes(file_header)
+                    # les lignes gardees sont dans l'ordre des colonnes du premier fichier
+                    header = header or file_header
+                    align = header_aligner(header, file_header)
+                    if align is not None:
+                        rows = map(align, rows)
+                    key_indexes, version_index = diff_column_indexes(header)
+
+                with metrics.stage('diff'):
+                    if side == 'old':
+                        by_key = index.setdefault(host, {})
+                        for row in rows:
+                            row = tuple(strings.setdefault(cell, cell) if cell.__class__ is str else cell for cell in row)
+                            versions = by_key.setdefault(tuple(row[i] for i in key_indexes), {})
+                            versions.setdefault(row[version_index], []).append(row)
+                            result['rows'] += 1
+                    else:
+                        old_by_key = index.get(host, {})
+                        added_by_key = added.setdefault(host, {})
+                        for row in rows:
+                            key = tuple(row[i] for i in key_indexes)
+                            result['rows'] += 1
+                            # une version deja presente est inchangee : on la retire de l'index
+                            old_rows = old_by_key.get(key, {}).get(row[version_index])
+                            if old_rows:
+                                old_rows.pop()
+                            else:
+                                added_by_key.setdefault(key, []).append(row)
+            except Exception as e:
+                failed_hosts.add(host)
+                result['status'] = 'erreur'
+                result['error'] = f"{type(e).__name__}: {e}"
+
+            result['seconds'] = time.perf_counter() - start
+            results.append(result)
+
+    compared = (set(old_hosts) & set(new_hosts)) - failed_hosts
+    skipped = sorted((set(old_hosts) | set(new_hosts)) - compared)
+    counts = {'ajoute': 0, 'supprime': 0, 'modifie': 0}
+
+    if header is None:
+        header = list(DIFF_KEY_COLUMNS) + [DIFF_VERSION_COLUMN]
+    version_index = header.index(DIFF_VERSION_COLUMN)
+    diff_header = [HOST_COLUMN, DIFF_CHANGE_COLUMN] + header + [DIFF_OLD_VERSION_COLUMN]
+
+    if output_file.lower().endswith(SQLITE_EXTENSIONS):
+        writer = SqliteRowWriter(output_file, DIFF_TABLE)
+        writer.create_table(diff_header)
+    else:
+        writer = ExcelRowWriter(output_file)
+        writer.add_sheet('Differences', diff_header)
+
+    # les differences sont ecrites par machine et par logiciel : une version remplacee
+    # est une modification, une version en plus un ajout, une version en moins une suppression
+    with metrics.stage('diff'):
+        for host in sorted(compared):
+            old_by_key = index.get(host, {})
+            added_by_key = added.get(host, {})
+            changes = []
+            removed_by_key = {}
+            for key, versions in old_by_key.items():
+                old_rows = [row for rows in versions.values() for row in rows]
+                if old_rows:
+                    removed_by_key[key] = old_rows
+
+            for key in sorted(set(added_by_key) | set(removed_by_key)):
+                old_rows = removed_by_key.get(key, [])
+                new_rows = added_by_key.get(key, [])
+                for old_row, new_row in zip(old_rows, new_rows):
+                    changes.append(('modifie', new_row, old_row[version_index]))
+                for new_row in new_rows[len(old_rows):]:
+                    changes.append(('ajoute', new_row, ''))
+                for old_row in old_rows[len(new_rows):]:
+                    changes.append(('supprime', old_row, old_row[version_index]))
+
+            for change, row, old_version in changes:
+                counts[change] += 1
+                writer.write_row([host, change] + list(row) + [old_version])
+
+    writer.close()
+    if metrics.enabled:
+        metrics.add('diff', bytes_written=os.path.getsize(output_file), rows=sum(counts.values()))
+
+    return results, counts, skipped
+
+
+def aggregate_inventory(input_file, col_specs, metrics=NULL_METRICS):
+    ''' 
+    Agrege un inventaire par logiciel (DisplayName, DisplayVersion, Publisher) :
+    nombre d'installations, premiere et derniere date d'installation. Le fichier
+    est lu en flux, seul l'agregat (un element par logiciel distinct) est garde
+
+    Arguments:
+        input_file -- le chemin vers le fichier
+        col_specs  -- liste de tuples (debut, fin) des colonnes
+        metrics    -- les mesures par etape (desactivees par defaut)
+
+    Retourne:
+        un dictionnaire avec le statut, le nombre de lignes, la duree et 'packages' :
+        {(nom, version, editeur): [installations, premiere date, derniere date]}
+    '''
+    start = time.perf_counter()
+    result = {'input': input_file, 'output': '', 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+    packages = {}
+    try:
+        rows = iter_inventory_rows(input_file, col_specs, metrics)
+        header = next(rows, None)
+        if header is not None:
+            missing = [name for name in CATALOG_KEY_COLUMNS if name not in header]
+            if missing:
+                raise ValueError(f"colonnes absentes de l'entete: {', '.join(missing)}")
+            key_of = operator.itemgetter(*(header.index(name) for name in CATALOG_KEY_COLUMNS))
+            # InstallDate d'un format a cles, sinon la derniere colonne (Format-Table)
+            date_index = header.index(DATE_COLUMN_NAME) if DATE_COLUMN_NAME in header else -1
+
+            with metrics.stage('aggregate'):
+                for row in rows:
+                    key = key_of(row)
+                    date = row[date_index]
+                    if not isinstance(date, datetime):
+                        date = None
+                    entry = packages.get(key)
+                    if entry is None:
+                        packages[key] = [1, date, date]
+                        continue
+                    entry[0] += 1
+                    if date is not None:
+                        if entry[1] is None or date < entry[1]:
+                            entry[1] = date
+                        if entry[2] is None or date > entry[2]:
+                            entry[2] = date
+            result['rows'] = sum(entry[0] for entry in packages.values())
+    except Exception as e:
+        result['status'] = 'erreur'
+        result['error'] = f"{type(e).__name__}: {e}"
+        packages = {}
+
+    result['packages'] = packages
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def merge_dates(first, last, other_first, other_last):
+    ''' 
+    Reunit deux intervalles de dates d'installation, une date pouvant manquer (None)
+
+    Retourne:
+        un tuple (premiere date, derniere date)
+    '''
+    if other_first is not None and (first is None or other_first < first):
+        first = other_first
+    if other_last is not None and (last is None or other_last > last):
+        last = other_last
+    return first, last
+
+
+def catalog_hosts(hosts, names):
+    ''' 
+    Liste des machines d'un logiciel, tronquee a la taille d'une cellule Excel
+    '''
+    text = ', '.join(sorted(names[i] for i in hosts))
+    if len(text) > EXCEL_MAX_CELL_LENGTH:
+        text = text[:EXCEL_MAX_CELL_LENGTH - 3].rsplit(', ', 1)[0] + '...'
+    return text
+
+
+def build_catalog(inputs, output_file, col_specs, jobs=None, metrics=NULL_METRICS):
+    ''' 
+    Construit le catalogue logiciel du parc en un seul passage sur tous les inventaires :
+    chaque fichier (une machine) est agrege par un processus du pool (voir 'aggregate_inventory')
+    puis les agregats sont reunis ici dans une table de hachage par logiciel. La memoire
+    depend du nombre de logiciels distincts (et d'un entier par machine et par logiciel
+    pour la liste des machines), pas du nombre de lignes.
+    Le classeur contient la feuille 'Catalogue' (une ligne par logiciel, trie par nom puis
+    version) et la feuille 'Editeurs' (une ligne par editeur)
+
+    Arguments:
+        inputs      -- la liste des fichiers (un par machine)
+        output_file -- le chemin du classeur de sortie
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        jobs        -- le nombre de processus (par defaut: nombre de coeurs)
+        metrics     -- les mesures par etape (desactivees par defaut)
+
+    Retourne:
+        la liste des resultats par fichier (statut, nombre de lignes, duree)
+    '''
+    names = host_names(inputs)
+    jobs = jobs or os.cpu_count() or 1
+    # logiciel -> [installations, premiere date, derniere date, indices des machines]
+    catalog = {}
+    results = []
+
+    if jobs == 1 or len(inputs) < 2:
+        partials = (aggregate_inventory(input_file, col_specs, metrics) for input_file in inputs)
+        executor = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor     # importe a la demande
+
+        executor = ProcessPoolExecutor(max_workers=min(jobs, len(inputs)))
+        partials = executor.map(aggregate_inventory, inputs, itertools.repeat(col_specs), chunksize=4)
+
+    try:
+        for host, result in enumerate(partials):
+            packages = result.pop('packages')
+            result['output'] = output_file
+            results.append(result)
+            with metrics.stage('catalog_merge'):
+                for key, (count, first, last) in packages.items():
+                    entry = catalog.get(key)
+                    if entry is None:
+                        catalog[key] = [count, first, last, array.array('I', [host])]
+                        continue
+                    entry[0] += count
+                    entry[1], entry[2] = merge_dates(entry[1], entry[2], first, last)
+                    entry[3].append(host)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    # les editeurs sont calcules depuis le catalogue : un passage sur les logiciels distincts
+    publishers = {}
+    for (name, version, publisher), (count, first, last, hosts) in catalog.items():
+        entry = publishers.get(publisher)
+        if entry is None:
+            entry = publishers[publisher] = [set(), 0, set(), 0, None, None]
+        entry[0].add(name)
+        entry[1] += 1
+        entry[2].update(hosts)
+        entry[3] += count
+        entry[4], entry[5] = merge_dates(entry[4], entry[5], first, last)
+
+    with metrics.stage('xlsx_write'):
+        with ExcelRowWriter(output_file) as writer:
+            writer.add_sheet('Catalogue', CATALOG_HEADER)
+            for key in sorted(catalog, key=lambda key: (key[0].casefold(), version_key(key[1]), key[2].casefold())):
+                count, first, last, hosts = catalog[key]
+                writer.write_row(list(key) + [len(hosts), count, first, last, catalog_hosts(hosts, names)])
+
+            writer.add_sheet('Editeurs', PUBLISHER_HEADER)
+            for publisher in sorted(publishers, key=str.casefold):
+                software, versions, hosts, count, first, last = publishers[publisher]
+                writer.write_row([publisher, len(software), versions, len(hosts), count, first, last])
+    metrics.add('catalog_merge', rows=len(catalog))
+
+    return results
+
+
+def print_batch_summary(results, elapsed):
+    ''' 
+    Affiche le bilan d'un lot : statut et duree de chaque fichier puis les totaux
+    '''
+    for result in results:
+        print(format_batch_result(result))
+
+    nb_errors = sum(result['status'] != 'ok' for result in results)
+    nb_rows = sum(result['rows'] for result in results)
+    print(f"{len(results)} fichiers, {len(results) - nb_errors} convertis, {nb_errors} en erreur, "
+          f"{nb_rows} lignes en {elapsed:.2f}s ({nb_rows / max(elapsed, 1e-9):.0f} lignes/s)")
+
+
+def ignore_interrupts():
+    ''' 
+    Initialise un processus du pool de surveillance : Ctrl-C est recu par tout
+    le groupe de processus, seul le processus principal doit l'interpreter
+    et laisser finir les conversions en cours. Le gestionnaire de SIGTERM de la
+    surveillance n'est pas herite : un pool casse doit pouvoir terminer ses processus
+    '''
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def move_to_directory(path, directory):
+    ''' 
+    Deplace un fichier dans un repertoire sans ecraser un fichier du meme nom
+    deja present : un suffixe horodate est ajoute au nom
+
+    Retourne:
+        le nouveau chemin du fichier
+    '''
+    os.makedirs(directory, exist_ok=True)
+    destination = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(destination):
+        stem, extension = os.path.splitext(os.path.basename(path))
+        destination = os.path.join(directory, f"{stem}-{datetime.now():%Y%m%d-%H%M%S-%f}{extension}")
+    os.replace(path, destination)
+    return destination
+
+
+def scan_drop_directory(input_dir):
+    ''' 
+    Liste les inventaires, eventuellement compresses (.gz, .xz), deposes
+    dans un repertoire (sans ses sous-repertoires)
+
+    Retourne:
+        un dictionnaire chemin -> (taille, date de modification en ns)
+    '''
+    files = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            # les fichiers caches sont les fichiers temporaires des copies en cours
+            if entry.name.startswith('.') or not is_batch_input(entry.name):
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return files
+
+
+def watch_directory(input_dir, output_dir, col_specs, jobs=None, use_cache=True, settle_time=WATCH_SETTLE_TIME,
+                    interval=WATCH_INTERVAL, cache_size=CONVERSION_CACHE_MAX_SIZE, on_result=None):
+    ''' 
+    Surveille un repertoire de depot et convertit chaque fichier qui y arrive.
+    Un fichier n'est converti que lorsque sa taille et sa date n'ont plus change
+    pendant 'settle_time' secondes (copie terminee), par un pool borne de processus.
+    L'original est ensuite deplace dans 'done' ou 'failed' : au redemarrage seuls
+    les fichiers restes dans le depot sont convertis, et ceux dont la conversion
+    avait abouti avant l'arret sont repris du cache.
+    Un fichier sans entete ni ligne (fichier vide, copie pas encore remplie...) est en
+    erreur sans sortie et reste dans le depot : il n'est reconverti que s'il change.
+    Si un processus du pool meurt (manque de memoire...), le pool est relance et les
+    fichiers qu'il convertissait restent dans le depot pour etre reessayes.
+    Le repertoire est parcouru toutes les 'interval' secondes : un simple os.scandir,
+    la surveillance ne coute presque rien quand aucun fichier n'arrive.
+    S'arrete sur Ctrl-C ou SIGTERM apres avoir fini les conversions en cours
+
+    Arguments:
+        input_dir   -- le repertoire de depot
+        output_dir  -- le repertoire des fichiers Excel de sortie
+        col_specs   -- liste de tuples (debut, fin) des colonnes
+        jobs        -- le nombre de processus (par defaut: nombre de coeurs)
+        use_cache   -- utiliser le cache des conversions
+        settle_time -- duree sans changement avant de convertir un fichier (secondes)
+        interval    -- intervalle entre deux parcours du repertoire (secondes)
+        cache_size  -- taille maximale du cache des conversions en octets
+        on_result   -- fonction appelee avec le resultat de chaque conversion
+                       (par defaut: affiche la ligne de bilan)
+
+    Retourne:
+        la liste des resultats de 'convert_file', dans l'ordre des conversions
+    '''
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait     # importes a la demande
+    from concurrent.futures.process import BrokenProcessPool
+
+    if on_result is None:
+        on_result = lambda result: print(format_batch_result(result), flush=True)
+    jobs = jobs or os.cpu_count() or 1
+    done_dir = os.path.join(input_dir, WATCH_DONE_DIR)
+    failed_dir = os.path.join(input_dir, WATCH_FAILED_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # SIGTERM (arret du service) est traite comme Ctrl-C
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    previous_handler = signal.signal(signal.SIGTERM, interrupt)
+
+    # chemin -> (taille, date, instant depuis lequel le fichier n'a pas change)
+    pending = {}
+    # chemin -> ((taille, date), repertoire) des fichiers convertis qui n'ont pas pu etre deplaces
+    stuck = {}
+    # chemin -> (taille, date) des fichiers vides laisses dans le depot
+    empty = {}
+    # chemin -> nombre de conversions interrompues par la mort d'un processus du pool
+    crashes = {}
+    # future -> (chemin, (taille, date), sortie)
+    running = {}
+    results = []
+
+    def finish(future):
+        input_file, signature, output_file = running.pop(future)
+        tmp_file = temporary_output(output_file)
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            discard_output(tmp_file)
+            result = {'input': input_file, 'output': output_file, 'status': 'erreur', 'rows': 0,
+                      'error': f"{type(e).__name__}: {e}", 'cached': False, 'seconds': 0.0}
+            crashes[input_file] = crashes.get(input_file, 0) + 1
+            if crashes[input_file] < WATCH_MAX_CRASHES:
+                # reste dans le depot : le prochain parcours le confie au nouveau pool
+                results.append(result)
+                on_result(result)
+                return
+        result['output'] = output_file
+        crashes.pop(input_file, None)
+
+        # un fichier sans ligne n'est pas un inventaire : pas de sortie, il reste dans le depot
+        if result['status'] == 'ok' and not result['rows']:
+            discard_output(tmp_file)
+            result['status'] = 'erreur'
+            result['error'] = "aucune ligne lue (fichier vide ou sans entete)"
+            empty[input_file] = signature
+            results.append(result)
+            on_result(result)
+            return
+        if result['status'] == 'ok':
+            os.replace(tmp_file, output_file)
+        else:
+            discard_output(tmp_file)
+
+        directory = done_dir if result['status'] == 'ok' else failed_dir
+        try:
+            move_to_directory(input_file, directory)
+        except OSError as e:
+            # encore ouvert par l'emetteur : on reessaiera au prochain parcours
+            stuck[input_file] = (signature, directory)
+            result['error'] = result['error'] or f"non deplace ({type(e).__name__}: {e})"
+        results.append(result)
+        on_result(result)
+
+    def restart(broken):
+        # un processus tue casse tout le pool : ses conversions echouent, il est remplace
+        for future in list(running):
+            finish(future)
+        broken.shutdown(wait=False, cancel_futures=True)
+        return ProcessPoolExecutor(max_workers=jobs, initializer=ignore_interrupts)
+
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=ignore_interrupts)
+    try:
+        while True:
+            now = time.monotonic()
+            files = scan_drop_directory(input_dir)
+            busy = {input_file for input_file, _, _ in running.values()}
+
+            for path in list(pending):
+                if path not in files:
+                    del pending[path]
+            for path, signature in list(empty.items()):
+                if files.get(path) != signature:
+                    del empty[path]
+            for path, (signature, directory) in list(stuck.items()):
+                if files.get(path) != signature:
+                    del stuck[path]
+                    continue
+                try:
+                    move_to_directory(path, directory)
+                    del stuck[path]
+                    del files[path]
+                except OSError:
+                    pass
+
+            for path, signature in sorted(files.items()):
+                if path in busy or path in stuck or path in empty:
+                    continue
+                previous = pending.get(path)
+                if previous is None or previous[:2] != signature:
+                    pending[path] = signature + (now,)
+                # la file du pool reste courte : un fichier qui change encore n'y attend pas
+                elif now - previous[2] >= settle_time and len(running) < 2 * jobs:
+                    del pending[path]
+                    output_file = os.path.join(output_dir, os.path.splitext(os.path.basename(input_name(path)))[0] + '.xlsx')
+                    # ecrit sous un nom temporaire : 'finish' ne garde que les sorties non vides
+                    try:
+                        future = executor.submit(convert_file, path, temporary_output(output_file), col_specs, use_cache)
+                    except BrokenProcessPool:
+                        executor = restart(executor)
+                        future = executor.submit(convert_file, path, temporary_output(output_file), col_specs, use_cache)
+                    running[future] = (path, signature, output_file)
+
+            # on attend la fin d'une conversion ou le prochain parcours
+            if running:
+                completed, _ = wait(list(running), timeout=interval, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(future.exception(), BrokenProcessPool) for future in completed)
+                for future in completed:
+                    finish(future)
+                if broken:
+                    executor = restart(executor)
+                if completed and not running:
+                    evict_conversion_cache(cache_size)
+            else:
+                time.sleep(interval)
+
+    except KeyboardInterrupt:
+        for future in list(running):
+            wait([future])
+            finish(future)
+        evict_conversion_cache(cache_size)
+
+    finally:
+        executor.shutdown(cancel_futures=True)
+        signal.signal(signal.SIGTERM, previous_handler)
+
+    return results
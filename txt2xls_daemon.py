@@ -0,0 +1,442 @@
+import os               # pour la manipulation des fichiers et des repertoires
+import io               # pour les conversions en memoire
+import json             # pour l'entete des messages
+import socket           # pour la socket Unix
+import socketserver     # pour servir chaque client dans son propre thread
+import struct           # pour la longueur des messages
+import threading        # pour les compteurs partages entre les clients
+import time             # pour la duree de fonctionnement et les debits
+import argparse         # pour analyser les arguments de la ligne de commande
+import signal           # pour arreter proprement le serveur
+import importlib        # pour charger le moteur au demarrage du pool
+
+
+# socket Unix par defaut du serveur de conversion
+DAEMON_SOCKET = os.path.join('data', 'txt2xls.sock')
+
+# taille maximale de l'entete JSON d'un message
+DAEMON_MAX_HEADER_SIZE = 1024 * 1024
+
+# duree maximale (secondes) d'attente des conversions en cours a l'arret du serveur
+DAEMON_SHUTDOWN_TIMEOUT = 30.0
+
+# modules du moteur charges des le demarrage de chaque processus du pool
+DAEMON_WARM_MODULES = ('txt2xls_core', 'numpy', 'xlsxwriter', 'chardet.universaldetector')
+
+
+def send_message(sock, header, payload=b''):
+    '''
+    Envoie un message : la longueur de l'entete sur 4 octets, l'entete JSON
+    (qui donne la taille du contenu) puis le contenu binaire eventuel
+
+    Arguments:
+        sock    -- la socket connectee
+        header  -- le dictionnaire d'entete
+        payload -- le contenu binaire (fichier a convertir, classeur produit...)
+    '''
+    data = json.dumps(dict(header, size=len(payload))).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_exactly(sock, size):
+    '''
+    Lit exactement 'size' octets sur la socket
+    '''
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("connexion fermee au milieu d'un message")
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    '''
+    Lit un message envoye par 'send_message'
+
+    Retourne:
+        un tuple (entete, contenu), ou (None, b'') si la connexion est fermee
+    '''
+    prefix = sock.recv(4, socket.MSG_WAITALL)
+    if not prefix:
+        return None, b''
+    if len(prefix) < 4:
+        prefix += recv_exactly(sock, 4 - len(prefix))
+
+    (header_size,) = struct.unpack('>I', prefix)
+    if header_size > DAEMON_MAX_HEADER_SIZE:
+        raise ValueError(f"entete trop grande: {header_size} octets")
+
+    header = json.loads(recv_exactly(sock, header_size))
+    return header, recv_exactly(sock, header.pop('size', 0))
+
+
+def request(socket_path, header, payload=b'', timeout=None):
+    '''
+    Envoie une requete au serveur et attend sa reponse
+
+    Arguments:
+        socket_path -- le chemin de la socket Unix du serveur
+        header      -- l'entete de la requete ('op': convert, health ou stats)
+        payload     -- le contenu d'un fichier envoye en ligne
+        timeout     -- le delai maximal d'attente en secondes
+
+    Retourne:
+        un tuple (entete, contenu) de la reponse
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        send_message(sock, header, payload)
+        response, content = recv_message(sock)
+
+    if response is None:
+        raise ConnectionError("le serveur a ferme la connexion sans repondre")
+    return response, content
+
+
+def warm_up():
+    '''
+    Charge une fois pour toutes, dans chaque processus du pool, les modules
+    du moteur de conversion : les conversions suivantes n'ont plus rien a importer
+    '''
+    # le processus est cree par le serveur apres l'installation de son gestionnaire
+    # de SIGTERM : herite tel quel, le processus ne pourrait plus etre termine
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    for name in DAEMON_WARM_MODULES:
+        importlib.import_module(name)
+
+
+def stop_pool(executor, timeout=0.0):
+    '''
+    Arrete un pool sans jamais rester bloque : les conversions en attente sont annulees,
+    celles en cours ont 'timeout' secondes pour finir, puis les processus du pool encore
+    en vie sont termines. Un pool casse (un processus tue) n'est pas attendu.
+    Les autres processus fils du programme ne sont pas touches
+    '''
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            process.terminate()
+            process.join(1)
+
+
+def is_pool_broken(executor):
+    '''
+    Indique si le pool est casse (un de ses processus est mort) : il refuse alors
+    toute nouvelle tache. Rien n'est soumis au pool pour le savoir
+    '''
+    return bool(executor._broken)
+
+
+def request_col_specs(options):
+    '''
+    Les colonnes demandees par le client ; sans colonnes, elles sont
+    deduites du soulignement de chaque fichier
+    '''
+    col_specs = options.get('col_specs')
+    return None if col_specs is None else [tuple(spec) for spec in col_specs]
+
+
+def convert_path_job(input_file, output_file, options):
+    '''
+    Conversion d'un fichier vers un fichier, dans un processus du pool
+
+    Retourne:
+        le resultat de 'convert_file' (statut, nombre de lignes, duree...)
+    '''
+    import txt2xls_core     # deja charge par 'warm_up' ; le client n'en a pas besoin
+    col_specs = request_col_specs(options)
+    if options.get('format', 'xlsx') == 'xlsx':
+        return txt2xls_core.convert_file(input_file, output_file, col_specs, options.get('use_cache', True))
+
+    start = time.perf_counter()
+    result = {'input': input_file, 'output': output_file, 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+    tmp_file = txt2xls_core.temporary_output(output_file)
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            result['rows'] = txt2xls_core.convert(input_file, f, col_specs, 'csv', delimiter=options.get('delimiter', ','))
+        os.replace(tmp_file, output_file)
+    except Exception as e:
+        txt2xls_core.discard_output(tmp_file)
+        result['status'] = 'erreur'
+        result['error'] = f"{type(e).__name__}: {e}"
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def convert_bytes_job(data, options):
+    '''
+    Conversion d'un contenu envoye en ligne, en memoire, dans un processus du pool
+
+    Retourne:
+        un tuple (resultat, contenu produit)
+    '''
+    import txt2xls_core
+    start = time.perf_counter()
+    col_specs = request_col_specs(options)
+    result = {'input': options.get('name', ''), 'output': '', 'status': 'ok', 'rows': 0, 'error': '', 'cached': False}
+    buffer = io.BytesIO()
+    try:
+        result['rows'] = txt2xls_core.convert(data, buffer, col_specs, options.get('format', 'xlsx'),
+                                              encoding=options.get('encoding'), delimiter=options.get('delimiter', ','))
+    except Exception as e:
+        result['status'] = 'erreur'
+        result['error'] = f"{type(e).__name__}: {e}"
+        buffer = io.BytesIO()
+
+    result['seconds'] = time.perf_counter() - start
+    return result, buffer.getvalue()
+
+
+class ConversionStats:
+    '''
+    Compteurs du serveur, partages entre les threads des clients :
+    conversions en cours et en attente, terminees, en erreur, lignes et octets
+    '''
+
+    def __init__(self, jobs):
+        self.lock = threading.Lock()
+        self.jobs = jobs
+        self.started = time.time()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rows = 0
+        self.bytes_read = 0
+        self.busy_seconds = 0.0
+
+    def begin(self, nb_bytes):
+        with self.lock:
+            self.in_flight += 1
+            self.bytes_read += nb_bytes
+
+    def end(self, result):
+        with self.lock:
+            self.in_flight -= 1
+            if result['status'] == 'ok':
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.rows += result['rows']
+            self.busy_seconds += result.get('seconds', 0.0)
+
+    def snapshot(self):
+        '''
+        Retourne:
+            les compteurs et les debits moyens depuis le demarrage
+        '''
+        with self.lock:
+            uptime = max(time.time() - self.started, 1e-9)
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'workers': self.jobs,
+                'in_flight': self.in_flight,
+                'queue_depth': max(self.in_flight - self.jobs, 0),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rows': self.rows,
+                'bytes_read': self.bytes_read,
+                'jobs_per_second': round((self.completed + self.failed) / uptime, 3),
+                'rows_per_second': round(self.rows / uptime, 1),
+                'busy_seconds': round(self.busy_seconds, 3),
+            }
+
+
+class ConversionHandler(socketserver.BaseRequestHandler):
+    '''
+    Traite les requetes d'un client, l'une apres l'autre sur la meme connexion.
+    Les conversions sont confiees au pool, les threads ne font qu'attendre
+    '''
+
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                print(f"Requete illisible: {e}")
+                return
+            if header is None:
+                return
+
+            try:
+                response, content = self.server.dispatch(header, payload)
+            except Exception as e:
+                response, content = {'status': 'erreur', 'error': f"{type(e).__name__}: {e}"}, b''
+
+            try:
+                send_message(self.request, response, content)
+            except OSError:
+                return
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''
+    Serveur de conversion residant : il ecoute sur une socket Unix et garde
+    un pool de processus dont le moteur (numpy, chardet, xlsxwriter, dates deja
+    analysees, encodages deja detectes) reste charge d'une conversion a l'autre.
+
+    Requetes ('op' dans l'entete):
+        convert -- 'input'/'output' (chemins) ou un contenu en ligne, plus les options
+                   'format', 'col_specs', 'delimiter', 'encoding', 'use_cache'
+        health  -- etat du serveur
+        stats   -- file d'attente, conversions terminees et debits
+    '''
+    daemon_threads = True
+
+    def __init__(self, socket_path, jobs=None):
+        from concurrent.futures import ProcessPoolExecutor     # importe a la demande : le client n'en a pas besoin
+
+        self.jobs = jobs or os.cpu_count() or 1
+        self.stats = ConversionStats(self.jobs)
+        self.pool_lock = threading.Lock()
+        self.pool_restarts = 0
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_up)
+        super().__init__(socket_path, ConversionHandler)
+
+    def restart_pool(self, broken):
+        '''
+        Remplace un pool casse par un nouveau pool ; plusieurs clients peuvent
+        le constater en meme temps, il n'est remplace qu'une fois
+        '''
+        from concurrent.futures import ProcessPoolExecutor     # importe a la demande
+
+        with self.pool_lock:
+            if self.executor is not broken:
+                return
+            stop_pool(broken)
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_up)
+            self.pool_restarts += 1
+        print(f"Pool de conversion casse (processus arrete brutalement), relance n°{self.pool_restarts}")
+
+    def run(self, function, *args):
+        '''
+        Execute une tache dans le pool. Un pool casse entre deux requetes est remplace
+        avant d'y soumettre la tache ; si un processus meurt pendant la tache, elle
+        echoue (BrokenProcessPool) et le pool est remplace pour les suivantes
+
+        Retourne:
+            le resultat de la tache
+        '''
+        from concurrent.futures.process import BrokenProcessPool     # importe a la demande
+
+        executor = self.executor
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            self.restart_pool(executor)
+            executor = self.executor
+            future = executor.submit(function, *args)
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self.restart_pool(executor)
+            raise
+
+    def dispatch(self, header, payload):
+        '''
+        Execute une requete
+
+        Retourne:
+            un tuple (entete, contenu) de la reponse
+        '''
+        op = header.get('op')
+        if op == 'health':
+            # un pool casse est remplace ici, sans attendre la prochaine conversion
+            executor = self.executor
+            pool = 'ok'
+            if is_pool_broken(executor):
+                self.restart_pool(executor)
+                pool = 'relance'
+            return {
+                'status': 'ok', 'pid': os.getpid(), 'uptime_seconds': self.stats.snapshot()['uptime_seconds'],
+                'pool': pool, 'pool_restarts': self.pool_restarts,
+            }, b''
+        if op == 'stats':
+            return dict(self.stats.snapshot(), status='ok', pool_restarts=self.pool_restarts), b''
+        if op != 'convert':
+            raise ValueError(f"requete inconnue: {op!r}")
+
+        options = header.get('options', {})
+        if header.get('input'):
+            input_file = header['input']
+            self.stats.begin(os.path.getsize(input_file) if os.path.exists(input_file) else 0)
+            content = b''
+            try:
+                result = self.run(convert_path_job, input_file, header['output'], options)
+            except Exception as e:
+                result = {'input': input_file, 'status': 'erreur', 'rows': 0, 'error': f"{type(e).__name__}: {e}"}
+        else:
+            self.stats.begin(len(payload))
+            try:
+                result, content = self.run(convert_bytes_job, payload, options)
+            except Exception as e:
+                result, content = {'status': 'erreur', 'rows': 0, 'error': f"{type(e).__name__}: {e}"}, b''
+
+        self.stats.end(result)
+        return result, content
+
+    def server_close(self):
+        super().server_close()
+        # les conversions en cours peuvent finir, sauf si le pool est casse
+        with self.pool_lock:
+            stop_pool(self.executor, 0.0 if is_pool_broken(self.executor) else DAEMON_SHUTDOWN_TIMEOUT)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(socket_path=DAEMON_SOCKET, jobs=None):
+    '''
+    Lance le serveur de conversion jusqu'a son arret (Ctrl-C ou SIGTERM).
+    Une socket laissee par un serveur arrete brutalement est remplacee,
+    celle d'un serveur encore en marche ne l'est pas
+
+    Arguments:
+        socket_path -- le chemin de la socket Unix
+        jobs        -- le nombre de processus du pool (par defaut: nombre de coeurs)
+    '''
+    if os.path.exists(socket_path):
+        try:
+            request(socket_path, {'op': 'health'}, timeout=1)
+        except OSError:
+            os.remove(socket_path)
+        else:
+            raise RuntimeError(f"un serveur ecoute deja sur {socket_path}")
+
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+    server = ConversionServer(socket_path, jobs)
+
+    # SIGTERM arrete le serveur comme Ctrl-C, la socket est supprimee
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Serveur de conversion a l'ecoute sur {socket_path} ({server.jobs} processus)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur de conversion residant, a l'ecoute sur une socket Unix")
+    parser.add_argument("-S", "--socket", default=DAEMON_SOCKET, help="Chemin de la socket Unix (par défaut: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Nombre de processus de conversion (par défaut: nombre de coeurs)")
+
+    args = parser.parse_args()
+    try:
+        serve(args.socket, args.jobs)
+    except (RuntimeError, OSError) as e:
+        print(f"Impossible de lancer le serveur: {e}")
+        raise SystemExit(1)